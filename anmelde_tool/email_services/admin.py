@@ -1,9 +1,11 @@
 from django.contrib import admin
 
-from anmelde_tool.email_services.models import Email, EmailAttachment, EmailPicture, StandardEmailSet, StandardEmailRegistrationSet
+from anmelde_tool.email_services.models import Email, EmailAttachment, EmailPicture, StandardEmailSet, StandardEmailRegistrationSet, \
+    EmailJob
 
 admin.site.register(Email)
 admin.site.register(EmailAttachment)
 admin.site.register(EmailPicture)
 admin.site.register(StandardEmailSet)
 admin.site.register(StandardEmailRegistrationSet)
+admin.site.register(EmailJob)
@@ -11,3 +11,10 @@ class EmailType(models.TextChoices):
     RegistrationReminder = 'RegistrationReminder', _('Bestätigungs errinerung'),
     RegistrationAccepted = 'RegistrationAccepted', _('Registrierungsbestätigung'),
     PaymentReminder = 'PaymentReminder', _('Bezahlungserrinnerung'),
+
+
+class EmailJobRecipientStatus(models.TextChoices):
+    Open = 'Open', _('Offen')
+    Sent = 'Sent', _('Gesendet')
+    Failed = 'Failed', _('Fehlgeschlagen')
+    Skipped = 'Skipped', _('Übersprungen')
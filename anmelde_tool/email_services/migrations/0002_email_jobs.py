@@ -0,0 +1,48 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0028_event_view_allow_subgroup'),
+        ('registration', '0003_registrationrating'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('email_services', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailJob',
+            fields=[
+                ('id', models.UUIDField(auto_created=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True)),
+                ('email_type', models.CharField(choices=[('StandardEmail', 'Allgemeine Email'), ('EventCreated', 'Event erstellt'), ('EventUpdated', 'Event verändert'), ('RegistrationCreated', 'Registrierung erstellt'), ('RegistrationUpdated', 'Registrierung verändert'), ('RegistrationReminder', 'Bestätigungs errinerung'), ('RegistrationAccepted', 'Registrierungsbestätigung'), ('PaymentReminder', 'Bezahlungserrinnerung')], max_length=20)),
+                ('finished', models.BooleanField(default=False)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='event.event')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='EmailJobRecipient',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False)),
+                ('email', models.EmailField(max_length=254)),
+                ('status', models.CharField(choices=[('Open', 'Offen'), ('Sent', 'Gesendet'), ('Failed', 'Fehlgeschlagen'), ('Skipped', 'Übersprungen')], default='Open', max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='email_services.emailjob')),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('registration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='registration.registration')),
+            ],
+            options={
+                'unique_together': {('job', 'registration', 'person')},
+            },
+        ),
+    ]
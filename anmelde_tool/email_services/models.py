@@ -1,10 +1,15 @@
 import uuid
 
+from django.conf import settings
 from django.db import models
+from django.db.models import Count
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 from backend.storage_backends import PublicMediaStorage, EmailAttachmentMediaStorage
 from basic import models as basic_models
 from anmelde_tool.email_services import choices as email_choices
+from anmelde_tool.email_services.template_cache import invalidate_templates
 
 
 class EmailAttachment(basic_models.TimeStampMixin):
@@ -77,3 +82,45 @@ class StandardEmailRegistrationSet(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class EmailJob(basic_models.TimeStampMixin):
+    """
+    One dispatch of a mail to the responsible persons of an event. The recipients are stored with
+    their status, so a rerun of an unfinished job only sends the mails which are still open.
+    """
+    id = models.UUIDField(auto_created=True, primary_key=True, default=uuid.uuid4, editable=False)
+    event = models.ForeignKey('event.Event', on_delete=models.CASCADE)
+    email_type = models.CharField(max_length=20, choices=email_choices.EmailType.choices)
+    finished = models.BooleanField(default=False)
+
+    @property
+    def progress(self) -> dict:
+        counts = dict(self.recipients.order_by().values_list('status').annotate(count=Count('id')))
+        return {status: counts.get(status, 0) for status in email_choices.EmailJobRecipientStatus.values}
+
+    def __str__(self):
+        return f'{self.email_type}: {self.event}'
+
+
+class EmailJobRecipient(models.Model):
+    id = models.AutoField(auto_created=True, primary_key=True)
+    job = models.ForeignKey(EmailJob, on_delete=models.CASCADE, related_name='recipients')
+    registration = models.ForeignKey('registration.Registration', on_delete=models.CASCADE)
+    person = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    email = models.EmailField()
+    status = models.CharField(max_length=10, choices=email_choices.EmailJobRecipientStatus.choices,
+                              default=email_choices.EmailJobRecipientStatus.Open)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = ('job', 'registration', 'person')
+
+    def __str__(self):
+        return f'{self.email}: {self.status}'
+
+
+@receiver(post_save, sender=Email, dispatch_uid='post_save_email_templates')
+@receiver(post_delete, sender=Email, dispatch_uid='post_delete_email_templates')
+def invalidate_email_templates(sender, instance: Email, **kwargs):
+    invalidate_templates(instance.pk)
@@ -0,0 +1,30 @@
+"""
+Per process cache of the compiled templates of an Email.
+
+Entries are keyed by the primary key and updated_at of the Email, so a changed Email is compiled
+again even if the save happened in another process. Saves and deletes in this process drop the
+entry right away.
+"""
+from datetime import datetime
+from typing import Callable, Optional
+
+from django.template import Template
+
+_templates: dict = {}
+
+
+def get_templates(email_id, updated_at: Optional[datetime],
+                  load: Callable[[], tuple[str, str]]) -> tuple[Template, Template]:
+    """
+    Returns the compiled html and plain template, `load` returns the sources on a cache miss.
+    """
+    entry = _templates.get(email_id)
+    if entry is None or entry[0] != updated_at:
+        html, plain = load()
+        entry = (updated_at, Template(html), Template(plain))
+        _templates[email_id] = entry
+    return entry[1], entry[2]
+
+
+def invalidate_templates(email_id):
+    _templates.pop(email_id, None)
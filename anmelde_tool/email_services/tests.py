@@ -1,3 +1,214 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.template.context import make_context
+from django.utils import timezone
+
+from anmelde_tool.email_services.choices import EmailType, EmailJobRecipientStatus
+from anmelde_tool.email_services.models import Email, StandardEmailRegistrationSet, EmailJob, EmailJobRecipient
+from anmelde_tool.email_services.threads import dispatch, payment_reminder
+from anmelde_tool.email_services.threads.helper import build_email, get_email
+from anmelde_tool.event.cash.models import CashIncome
+from anmelde_tool.event.models import Event, BookingOption
+from anmelde_tool.registration.models import Registration, RegistrationParticipant
+from basic.models import FrontendTheme, ScoutHierarchy, ScoutOrgaLevel
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EMAIL_SEND_RATE=1000,
+                   EMAIL_BATCH_SIZE=2)
+class SendMailsTests(SimpleTestCase):
+
+    def test_one_connection_per_batch(self):
+        messages = (EmailMessage('Betreff', 'Text', 'lager@example.com', [f'person{number}@example.com'])
+                    for number in range(5))
+        with mock.patch.object(dispatch, 'get_connection', wraps=get_connection) as connection:
+            results = dispatch.send_mails(messages)
+
+        self.assertEqual(connection.call_count, 3)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertTrue(all(result.sent for result in results))
+        self.assertEqual(dispatch.summarize(results), {'sent': 5, 'failed': []})
+
+    def test_failures_are_reported_per_recipient(self):
+        person = SimpleNamespace(id=1, email='fails@example.com')
+        failing = build_email('Betreff', 'lager@example.com', person, '<p>Text</p>', 'Text')
+        working = EmailMessage('Betreff', 'Text', 'lager@example.com', ['works@example.com'])
+
+        def send_messages(messages):
+            if messages[0] is failing:
+                raise ConnectionError('rejected')
+            return len(messages)
+
+        connection = mock.MagicMock()
+        connection.__enter__.return_value.send_messages.side_effect = send_messages
+        with mock.patch.object(dispatch, 'get_connection', return_value=connection):
+            results = dispatch.send_mails([failing, working])
+
+        self.assertEqual([(result.recipient, result.sent, result.error) for result in results],
+                         [('fails@example.com', False, 'rejected'), ('works@example.com', True, '')])
+
+
+class SharedRateLimitTests(SimpleTestCase):
+
+    def test_limit_is_shared(self):
+        cache.clear()
+        with mock.patch.object(dispatch.time, 'time', return_value=100.25), \
+                mock.patch.object(dispatch.time, 'sleep', side_effect=StopIteration) as sleep:
+            dispatch.SharedRateLimit(2).acquire()
+            dispatch.SharedRateLimit(2).acquire()
+            sleep.assert_not_called()
+            with self.assertRaises(StopIteration):
+                dispatch.SharedRateLimit(2).acquire()
+        self.assertEqual(sleep.call_args.args[0], 0.75)
+
+
+class TokenBucketTests(SimpleTestCase):
+
+    def test_waits_when_empty(self):
+        bucket = dispatch.TokenBucket(rate=10, capacity=2)
+        with mock.patch.object(dispatch.time, 'sleep', side_effect=lambda seconds: setattr(
+                bucket, 'updated', bucket.updated - seconds)) as sleep:
+            bucket.acquire()
+            bucket.acquire()
+            sleep.assert_not_called()
+            bucket.acquire()
+            sleep.assert_called_once()
+            self.assertAlmostEqual(sleep.call_args.args[0], 0.1, places=2)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EMAIL_SEND_RATE=1000)
+class PaymentReminderJobTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(payment_reminder.settings, 'EMAIL_HOST_USER', 'example.com', create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        FrontendTheme.objects.create(id=1)
+        stamm = ScoutHierarchy.objects.create(name='Adler', level=ScoutOrgaLevel.objects.create(id=5, name='Stamm'))
+        email = Email.objects.create(type=EmailType.PaymentReminder, plain='Offen: {{ open_sum }}',
+                                     html='<p>{{ booking_options }}</p>')
+        self.event = Event.objects.create(
+            name='Lager',
+            registration_deadline=timezone.make_aware(datetime(2024, 6, 1, 12)),
+            email_set=StandardEmailRegistrationSet.objects.create(name='Standard', payment_reminder=email),
+        )
+        option = BookingOption.objects.create(name='Voll', price=10, event=self.event)
+        users = [get_user_model().objects.create_user(username=f'user{number}', email=f'user{number}@example.com')
+                 for number in range(3)]
+
+        self.open_registration = Registration.objects.create(event=self.event, scout_organisation=stamm)
+        self.open_registration.responsible_persons.set(users[:2])
+        for _ in range(2):
+            RegistrationParticipant.objects.create(registration=self.open_registration, booking_option=option)
+        CashIncome.objects.create(registration=self.open_registration, amount=5)
+
+        paid_registration = Registration.objects.create(event=self.event, scout_organisation=stamm)
+        paid_registration.responsible_persons.set(users[2:])
+        RegistrationParticipant.objects.create(registration=paid_registration, booking_option=option)
+        CashIncome.objects.create(registration=paid_registration, amount=10)
+
+    def run_job(self, job_id=None):
+        with mock.patch.object(payment_reminder, 'chord') as chord:
+            payment_reminder.payment_reminder_mail(self.event.id, EmailType.PaymentReminder, job_id)
+        return [signature.args for call in chord.call_args_list for signature in call.args[0]]
+
+    def test_send_and_resume(self):
+        chunks = self.run_job()
+        job = EmailJob.objects.get()
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(job.progress['Open'], 2)
+
+        with mock.patch.object(dispatch, 'get_connection', side_effect=ConnectionError('SES down')), \
+                self.assertRaises(ConnectionError):
+            payment_reminder.send_payment_reminder_chunk(*chunks[0])
+        self.assertEqual(job.progress['Open'], 2)
+
+        payment_reminder.send_payment_reminder_chunk(*chunks[0])
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['user0@example.com', 'user1@example.com'])
+        self.assertEqual(mail.outbox[0].body, 'Offen: 15,0')
+        self.assertEqual(mail.outbox[0].alternatives[0][0], '<p>2 Voll</p>')
+        self.assertEqual(job.progress['Sent'], 2)
+
+        self.assertEqual(self.run_job(str(job.id)), [])
+        job.refresh_from_db()
+        self.assertTrue(job.finished)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_failed_mails_are_retried(self):
+        chunks = self.run_job()
+        with mock.patch.object(dispatch.MailResult, '__init__', autospec=True,
+                               side_effect=lambda result, recipient, sent, error='': result.__dict__.update(
+                                   recipient=recipient, sent=False, error='rejected')), \
+                self.assertRaises(payment_reminder.MailDispatchError):
+            payment_reminder.send_payment_reminder_chunk(*chunks[0])
+        self.assertEqual(EmailJob.objects.get().progress['Failed'], 2)
+
+    def test_rerun_resumes_unfinished_job(self):
+        with mock.patch.object(payment_reminder, 'chord') as chord:
+            payment_reminder.payment_reminder_mail(self.event.id, EmailType.PaymentReminder)
+        body = chord.return_value.call_args.args[0]
+        self.assertEqual([errback['task'] for errback in body.options['link_error']],
+                         [payment_reminder.finish_email_job.name])
+        job = EmailJob.objects.get()
+        job.recipients.filter(email='user0@example.com').update(status=EmailJobRecipientStatus.Sent)
+
+        late_registration = Registration.objects.create(
+            event=self.event, scout_organisation=self.open_registration.scout_organisation)
+        late_registration.responsible_persons.set([get_user_model().objects.create_user(
+            username='late', email='late@example.com')])
+        RegistrationParticipant.objects.create(registration=late_registration,
+                                               booking_option=BookingOption.objects.get())
+
+        chunks = self.run_job()
+        self.assertEqual(EmailJob.objects.get(), job)
+        self.assertEqual(sorted(EmailJobRecipient.objects.get(id=recipient_id).email for recipient_id in chunks[0][1]),
+                         ['late@example.com', 'user1@example.com'])
+
+    def test_stuck_job_expires(self):
+        self.run_job()
+        stuck = EmailJob.objects.get()
+        stuck.recipients.filter(email='user0@example.com').update(status=EmailJobRecipientStatus.Sent)
+        EmailJob.objects.filter(id=stuck.id).update(updated_at=timezone.now() - timedelta(hours=2))
+
+        self.run_job()
+        stuck.refresh_from_db()
+        self.assertTrue(stuck.finished)
+        job = EmailJob.objects.exclude(id=stuck.id).get()
+        self.assertEqual(sorted(job.recipients.values_list('email', flat=True)),
+                         ['user0@example.com', 'user1@example.com'])
+
+    def test_missing_template(self):
+        StandardEmailRegistrationSet.objects.update(payment_reminder=None)
+        self.assertEqual(self.run_job(), [])
+        self.assertFalse(EmailJob.objects.exists())
+
+
+class EmailTemplateCacheTests(TestCase):
+
+    def setUp(self):
+        FrontendTheme.objects.create(id=1)
+        ScoutOrgaLevel.objects.create(id=5, name='Stamm')
+        self.email = Email.objects.create(type=EmailType.PaymentReminder, plain='Hallo {{ name }}', html='<p>Hallo</p>')
+        self.event = Event.objects.create(
+            name='Lager',
+            email_set=StandardEmailRegistrationSet.objects.create(name='Standard', payment_reminder=self.email),
+        )
+
+    def test_templates_are_compiled_once(self):
+        template_html, template_plain = get_email(EmailType.PaymentReminder, self.event)
+        with self.assertNumQueries(1):
+            self.assertIs(get_email(EmailType.PaymentReminder, self.event)[1], template_plain)
+
+        self.email.plain = 'Moin {{ name }}'
+        self.email.save()
+        template_html, template_plain = get_email(EmailType.PaymentReminder, self.event)
+        self.assertEqual(template_plain.render(make_context({'name': 'Kim'})), 'Moin Kim')
+
+    def test_missing_email(self):
+        self.assertEqual(get_email(EmailType.RegistrationCreated, self.event), (None, None))
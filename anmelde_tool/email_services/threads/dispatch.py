@@ -0,0 +1,114 @@
+import threading
+import time
+from dataclasses import dataclass, asdict
+from itertools import islice
+from typing import Iterable
+
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+
+logger = get_task_logger(__name__)
+
+
+class TokenBucket:
+    """
+    Allows `rate` sends per second on average with bursts of up to `capacity` sends.
+    """
+
+    def __init__(self, rate: float, capacity: int = None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time.sleep((1 - self.tokens) / self.rate)
+
+
+class SharedRateLimit:
+    """
+    Allows `rate` sends per second across all web and celery processes, counted in one second windows
+    of the shared django cache. The token bucket of each process only smooths its own bursts.
+    """
+
+    def __init__(self, rate: float, key: str = 'email_send_rate'):
+        self.limit = max(1, int(rate))
+        self.key = key
+
+    def acquire(self):
+        while True:
+            now = time.time()
+            window = int(now)
+            key = f'{self.key}_{window}'
+            cache.add(key, 0, timeout=5)
+            try:
+                count = cache.incr(key)
+            except ValueError:
+                # expired between add and incr
+                continue
+            if count <= self.limit:
+                return
+            time.sleep(window + 1 - now)
+
+
+_bucket = None
+
+
+def get_bucket() -> TokenBucket:
+    global _bucket
+    if _bucket is None or _bucket.rate != settings.EMAIL_SEND_RATE:
+        _bucket = TokenBucket(settings.EMAIL_SEND_RATE)
+    return _bucket
+
+
+@dataclass
+class MailResult:
+    recipient: str
+    sent: bool
+    error: str = ''
+
+
+def send_mails(messages: Iterable[EmailMessage], batch_size: int = None) -> list[MailResult]:
+    """
+    Sends the messages over one mail connection per batch and returns the result of every recipient.
+    A failing message does not stop the batch.
+    """
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    bucket = get_bucket()
+    rate_limit = SharedRateLimit(settings.EMAIL_SEND_RATE)
+    results = []
+    messages = iter(messages)
+    while batch := list(islice(messages, batch_size)):
+        with get_connection(fail_silently=False) as connection:
+            for message in batch:
+                bucket.acquire()
+                rate_limit.acquire()
+                try:
+                    sent = connection.send_messages([message]) == 1
+                    error = '' if sent else 'not sent'
+                except Exception as exception:
+                    logger.warning(f'Sending mail to {message.to} failed: {exception}')
+                    sent, error = False, str(exception)
+                results.extend(MailResult(recipient, sent, error) for recipient in message.recipients())
+    return results
+
+
+def summarize(results: list[MailResult]) -> dict:
+    """
+    Celery serializable summary of send_mails, logged by the sending tasks.
+    """
+    failed = [asdict(result) for result in results if not result.sent]
+    summary = {'sent': len(results) - len(failed), 'failed': failed}
+    logger.info(f'{summary["sent"]} mails sent, {len(failed)} failed')
+    return summary
@@ -1,34 +1,44 @@
-from django.db.models import Sum, QuerySet
+from django.core.mail import EmailMultiAlternatives
+from django.db.models import Sum
 from django.template import Template
 import html
+from typing import Iterable
 
 from anmelde_tool.registration.models import Registration
 from backend import settings
 from anmelde_tool.email_services import models as email_services_models
 from anmelde_tool.email_services.choices import EmailType
+from anmelde_tool.email_services.template_cache import get_templates
 from anmelde_tool.event import models as event_models
 
 url = getattr(settings, 'FRONT_URL', '')
 
 
+EMAIL_SET_FIELDS = {
+    EmailType.RegistrationCreated: 'registration_created',
+    EmailType.RegistrationUpdated: 'registration_updated',
+    EmailType.RegistrationAccepted: 'registration_accepted',
+    EmailType.RegistrationReminder: 'registration_reminder',
+    EmailType.PaymentReminder: 'payment_reminder',
+    EmailType.StandardEmail: 'custom_mail',
+}
+
+
 def get_email(email_type: EmailType, event: event_models.Event) -> [Template, Template]:
-    if event.email_set is None:
+    """
+    Returns the compiled templates of the email of the given type in the email set of the event.
+    Only the id and version of the email are queried, the templates come from the template cache.
+    """
+    if event.email_set_id is None:
+        return None, None
+    field = EMAIL_SET_FIELDS.get(email_type, 'registration_created')
+    emails = email_services_models.Email.objects.filter(**{f'{field}__id': event.email_set_id})
+    email = emails.values('id', 'updated_at').first()
+    if email is None:
         return None, None
-    email_type_mapping = {
-        EmailType.RegistrationCreated: event.email_set.registration_created,
-        EmailType.RegistrationUpdated: event.email_set.registration_updated,
-        EmailType.RegistrationAccepted: event.email_set.registration_accepted,
-        EmailType.RegistrationReminder: event.email_set.registration_reminder,
-        EmailType.PaymentReminder: event.email_set.payment_reminder,
-        EmailType.StandardEmail: event.email_set.custom_mail
-    }
-    files: email_services_models.Email = email_type_mapping.get(email_type, event.email_set.registration_created)
 
-    html_body_template = files.html
-    plain_body_template = files.plain
-    template_html = Template(html_body_template)
-    template_plain = Template(plain_body_template)
-    return template_html, template_plain
+    return get_templates(email['id'], email['updated_at'],
+                         lambda: emails.filter(id=email['id']).values_list('html', 'plain').get())
 
 
 def get_headers(person, sender):
@@ -39,6 +49,17 @@ def get_headers(person, sender):
     return headers
 
 
+def build_email(subject: str, sender: str, person, html_rendered: str, plain_rendered: str) -> EmailMultiAlternatives:
+    email = EmailMultiAlternatives(subject=subject,
+                                   body=plain_rendered,
+                                   from_email=sender,
+                                   to=[person.email, ],
+                                   headers=get_headers(person, sender),
+                                   reply_to=[sender, ])
+    email.attach_alternative(html_rendered, "text/html")
+    return email
+
+
 def get_event_pronoun(event_name: str) -> str:
     name_lower = event_name.lower()
     if any(tmp in name_lower for tmp in ['lager', 'busife']):
@@ -69,18 +90,20 @@ def get_participant_count(registration: Registration) -> [int, int]:
     return count, participant_sum
 
 
-def get_booking_options(booking_options: QuerySet) -> str:
+def get_booking_options(booking_options: Iterable[dict]) -> str:
     result: str = ''
-    for index, option in enumerate(booking_options.all()):
+    for index, option in enumerate(booking_options):
         if index > 0:
             result += ', '
         result += f'{option["sum"]} {option["booking_options"]}'
     return result
 
 
-def get_scout_organisation_text(registration):
+def get_scout_organisation_text(registration, participant_count: int = None):
     scout_orga_unit_name = 'Stamm' if registration.scout_organisation.level.id == 5 else ''
-    if registration.registrationparticipant_set.count() > 1:
+    if participant_count is None:
+        participant_count = registration.registrationparticipant_set.count()
+    if participant_count > 1:
         scout_organisation = f'{scout_orga_unit_name} {html.escape(registration.scout_organisation.name)}'
     else:
         scout_organisation = f'Einzelpersonen aus dem {scout_orga_unit_name} {html.escape(registration.scout_organisation.name)}'
@@ -1,14 +1,14 @@
 import html
 
 from celery import shared_task
-from django.core.mail import EmailMultiAlternatives
 from django.db.models import QuerySet
 from django.template.context import make_context
 from rest_framework.generics import get_object_or_404
 
 from backend import settings
 from anmelde_tool.email_services.choices import EmailType
-from anmelde_tool.email_services.threads.helper import get_email, get_headers, get_scout_organisation_text, \
+from anmelde_tool.email_services.threads.dispatch import send_mails, summarize
+from anmelde_tool.email_services.threads.helper import get_email, build_email, get_scout_organisation_text, \
     get_event_pronoun
 from anmelde_tool.event import models as event_models
 
@@ -52,35 +52,31 @@ def news_mail(evend_id: str, data: dict, email_type: EmailType):
         unconfirmed_registrations = all_registrations.filter(is_confirmed=False)
         registrations = registrations | unconfirmed_registrations
 
-    for registration in registrations.all():
-        scout_organisation = get_scout_organisation_text(registration)
-
-        for person in registration.responsible_persons.all():
-            if person.email is None or len(person.email) == 0:
-                continue
-
-            receiver = [person.email, ]
-
-            data = {
-                # 'responsible_persons': html.escape(person.userextended.scout_name) or '',
-                # 'unsubscribe': person.userextended.id,
-                'scout_organisation': scout_organisation,
-                'event_name': event_name,
-                'event_pronoun': event_pronoun,
-                'custom_text': data['body'],
-                'header': header
-            }
-
-            headers = get_headers(person, sender)
-
-            html_rendered = template_html.render(make_context(data, autoescape=False))
-            plain_rendered = template_plain.render(make_context(data, autoescape=False))
-
-            email = EmailMultiAlternatives(subject=subject,
-                                           body=plain_rendered,
-                                           from_email=sender,
-                                           to=receiver,
-                                           headers=headers,
-                                           reply_to=[sender, ])
-            email.attach_alternative(html_rendered, "text/html")
-            email.send(fail_silently=False)
+    return summarize(send_mails(
+        build_news_mails(registrations, subject, sender, template_html, template_plain, {
+            'event_name': event_name,
+            'event_pronoun': event_pronoun,
+            'custom_text': data['body'],
+            'header': header
+        })
+    ))
+
+
+def build_news_mails(registrations, subject, sender, template_html, template_plain, event_data: dict):
+    for registration in registrations.all() \
+            .select_related('scout_organisation__level').prefetch_related('responsible_persons'):
+        persons = [person for person in registration.responsible_persons.all() if person.email]
+        if not persons:
+            continue
+
+        data = {
+            # 'responsible_persons': html.escape(person.userextended.scout_name) or '',
+            # 'unsubscribe': person.userextended.id,
+            **event_data,
+            'scout_organisation': get_scout_organisation_text(registration),
+        }
+        html_rendered = template_html.render(make_context(data, autoescape=False))
+        plain_rendered = template_plain.render(make_context(data, autoescape=False))
+
+        for person in persons:
+            yield build_email(subject, sender, person, html_rendered, plain_rendered)
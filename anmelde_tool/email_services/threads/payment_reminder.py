@@ -1,132 +1,206 @@
 import html
 from datetime import timedelta
 
-from celery import shared_task
-from django.core.mail import EmailMultiAlternatives
+from celery import chord, shared_task
+from celery.utils.log import get_task_logger
+from django.db import transaction
 from django.template.context import make_context
+from django.utils import timezone
 from rest_framework.generics import get_object_or_404
 
 from backend import settings
-from anmelde_tool.email_services.choices import EmailType
-from anmelde_tool.email_services.threads.helper import get_email, get_headers, get_booking_options, get_scout_organisation_text, \
-    get_event_pronoun
+from anmelde_tool.email_services.choices import EmailType, EmailJobRecipientStatus
+from anmelde_tool.email_services.models import EmailJob, EmailJobRecipient
+from anmelde_tool.email_services.threads.dispatch import send_mails, summarize
+from anmelde_tool.email_services.threads.helper import get_email, build_email, get_booking_options, \
+    get_scout_organisation_text, get_event_pronoun
 from anmelde_tool.event import models as event_models
-from anmelde_tool.event.summary.serializers import RegistrationCashSummarySerializer
+from anmelde_tool.event.cash.helper import annotate_payment, get_booking_option_summary, get_payment_ref_id
 from anmelde_tool.registration.models import Registration
 
 url = getattr(settings, 'FRONT_URL', '')
 
+logger = get_task_logger(__name__)
 
-@shared_task
-def payment_reminder_mail(evend_id: str, email_type: EmailType):
-    event: event_models.Event = get_object_or_404(event_models.Event, id=evend_id)
 
-    technical_name = event.technical_name or 'info'
-    sender = f'{event.name} <{technical_name}@{getattr(settings, "EMAIL_HOST_USER")}>'
-    subject = f'Zahlungserinnerung für: {event.name}'
+class MailDispatchError(Exception):
+    pass
 
-    template_html, template_plain = get_email(email_type, event)
 
-    event_name = html.escape(event.name)
-    event_pronoun = get_event_pronoun(event_name)
-    payment_deadline = event.registration_deadline.date() + timedelta(days=3)
+def get_registrations(registrations):
+    """
+    Registrations with their payment figures, ready for PaymentReminderMails.
+    """
+    return annotate_payment(registrations) \
+        .select_related('event', 'scout_organisation__level') \
+        .prefetch_related('responsible_persons')
 
-    for registration in event.registration_set.all():
-        serializer = RegistrationCashSummarySerializer(registration)
-        booking_options = get_booking_options(serializer.data['booking_options'])
-        scout_organisation = get_scout_organisation_text(registration)
 
-        if serializer.data['payment']['open'] <= 0:
-            continue
+def get_open_amount(registration: Registration) -> float:
+    return registration.open
 
-        for person in registration.responsible_persons.all():
-            if person.email is None or len(person.email) == 0:
-                continue
 
-            receiver = [person.email, ]
-
-            data = {
-                # 'responsible_persons': html.escape(person.userextended.scout_name) or '',
-                # 'unsubscribe': person.userextended.id,
-                'participant_count': serializer.data['participant_count'],
-                'booking_options': booking_options,
-                'sum': serializer.data['payment']['price'],
-                'received_sum': serializer.data['payment']['paid'],
-                'open_sum': serializer.data['payment']['open'],
-                'payment_id': serializer.data['ref_id'],
-                'scout_organisation': scout_organisation,
-                'event_name': event_name,
-                'event_pronoun': event_pronoun,
-                'payment_deadline': payment_deadline
-            }
-
-            headers = get_headers(person, sender)
-
-            html_rendered = template_html.render(make_context(data, autoescape=False))
-            plain_rendered = template_plain.render(make_context(data, autoescape=False))
-
-            email = EmailMultiAlternatives(subject=subject,
-                                           body=plain_rendered,
-                                           from_email=sender,
-                                           to=receiver,
-                                           headers=headers,
-                                           reply_to=[sender, ])
-            email.attach_alternative(html_rendered, "text/html")
-            email.send(fail_silently=False)
+class PaymentReminderMails:
+    """
+    Builds the payment reminders of an event from registrations loaded with get_registrations.
+    The templates are rendered once per registration and shared by all of its responsible persons.
+    """
 
-@shared_task
-def single_payment_reminder_mail(registration_id: str, email_type: EmailType):
-    registration: Registration = get_object_or_404(Registration, id=registration_id)
-    event: event_models.Event = get_object_or_404(event_models.Event, id=registration.event.id)
+    def __init__(self, event: event_models.Event, email_type: EmailType):
+        technical_name = event.technical_name or 'info'
+        self.sender = f'{event.name} <{technical_name}@{getattr(settings, "EMAIL_HOST_USER")}>'
+        self.subject = f'Zahlungserinnerung für: {event.name}'
+        self.template_html, self.template_plain = get_email(email_type, event)
+        self.event_name = html.escape(event.name)
+        self.event_pronoun = get_event_pronoun(self.event_name)
+        self.payment_deadline = event.registration_deadline.date() + timedelta(days=3)
 
-    technical_name = event.technical_name or 'info'
-    sender = f'{event.name} <{technical_name}@{getattr(settings, "EMAIL_HOST_USER")}>'
-    subject = f'Zahlungserinnerung für: {event.name}'
+    def build(self, registration: Registration, booking_options: list[dict], persons) -> list:
+        data = {
+            # 'responsible_persons': html.escape(person.userextended.scout_name) or '',
+            # 'unsubscribe': person.userextended.id,
+            'participant_count': registration.participant_count,
+            'booking_options': get_booking_options(booking_options),
+            'sum': registration.price,
+            'received_sum': registration.paid,
+            'open_sum': get_open_amount(registration),
+            'payment_id': get_payment_ref_id(registration),
+            'scout_organisation': get_scout_organisation_text(registration, registration.participant_count),
+            'event_name': self.event_name,
+            'event_pronoun': self.event_pronoun,
+            'payment_deadline': self.payment_deadline
+        }
+        html_rendered = self.template_html.render(make_context(data, autoescape=False))
+        plain_rendered = self.template_plain.render(make_context(data, autoescape=False))
+        return [build_email(self.subject, self.sender, person, html_rendered, plain_rendered) for person in persons]
+
+
+def create_payment_reminder_recipients(job: EmailJob):
+    """
+    Adds the responsible persons of the open registrations which are not yet recipients of the job
+    and did not get the mail from another unfinished job of the event.
+    """
+    registrations = get_registrations(job.event.registration_set.all())
+    sent = set(EmailJobRecipient.objects
+               .filter(job__event=job.event, job__email_type=job.email_type, job__finished=False,
+                       status=EmailJobRecipientStatus.Sent)
+               .exclude(job=job)
+               .values_list('registration_id', 'person_id'))
+    EmailJobRecipient.objects.bulk_create([
+        EmailJobRecipient(job=job, registration=registration, person=person, email=person.email)
+        for registration in registrations if get_open_amount(registration) > 0
+        for person in registration.responsible_persons.all()
+        if person.email and (registration.id, person.id) not in sent
+    ], ignore_conflicts=True)
+
+
+def expire_stuck_email_jobs(jobs):
+    """
+    Closes the unfinished jobs whose chunks stopped reporting, e.g. because a worker was killed.
+    """
+    deadline = timezone.now() - timedelta(seconds=settings.EMAIL_JOB_TIMEOUT)
+    jobs.filter(finished=False, updated_at__lt=deadline).update(finished=True, updated_at=timezone.now())
 
-    template_html, template_plain = get_email(email_type, event)
 
-    event_name = html.escape(event.name)
-    event_pronoun = get_event_pronoun(event_name)
-    payment_deadline = event.registration_deadline.date() + timedelta(days=3)
+@shared_task
+def payment_reminder_mail(evend_id: str, email_type: EmailType, job_id: str = None):
+    """
+    Sends the payment reminders of an event in chunks of EMAIL_BATCH_SIZE recipients, each chunk
+    in its own task. A rerun resumes the unfinished job of the event, so mails which were already
+    sent are not sent again, and only a finished job starts a new one.
+    """
+    event: event_models.Event = get_object_or_404(event_models.Event, id=evend_id)
+    if None in get_email(email_type, event):
+        logger.warning(f'Event {evend_id} has no {email_type} email, no reminders sent')
+        return None
+
+    jobs = EmailJob.objects.filter(event=event, email_type=email_type)
+    with transaction.atomic():
+        # locks the event, so concurrent triggers share one job
+        event_models.Event.objects.select_for_update().filter(id=event.id).first()
+        if job_id:
+            job = get_object_or_404(jobs, id=job_id)
+        else:
+            expire_stuck_email_jobs(jobs)
+            job = jobs.filter(finished=False).order_by('-created_at').first() \
+                or EmailJob.objects.create(event=event, email_type=email_type)
+        create_payment_reminder_recipients(job)
+        jobs.filter(id=job.id).update(updated_at=timezone.now())
+
+    recipient_ids = list(job.recipients.exclude(status=EmailJobRecipientStatus.Sent).values_list('id', flat=True))
+    size = settings.EMAIL_BATCH_SIZE
+    chunks = [recipient_ids[index:index + size] for index in range(0, len(recipient_ids), size)]
+    if chunks:
+        # a chunk which runs out of retries breaks the chord, the job is closed anyway
+        finish = finish_email_job.si(str(job.id))
+        chord([send_payment_reminder_chunk.s(str(job.id), chunk) for chunk in chunks])(
+            finish.on_error(finish_email_job.si(str(job.id))))
+    else:
+        finish_email_job(str(job.id))
+    return str(job.id)
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=60, retry_jitter=True, max_retries=5)
+def send_payment_reminder_chunk(job_id: str, recipient_ids: list[int]):
+    """
+    Sends the open mails of the given recipients and stores their status. Failed mails raise
+    afterwards, so the chunk is retried with backoff and only the failed recipients are sent again.
+    """
+    job = EmailJob.objects.select_related('event__email_set').get(id=job_id)
+    mails = PaymentReminderMails(job.event, job.email_type)
+
+    with transaction.atomic():
+        # rows locked by a concurrent run of the same chunk are skipped instead of sent twice
+        recipients = list(job.recipients
+                          .filter(id__in=recipient_ids)
+                          .exclude(status=EmailJobRecipientStatus.Sent)
+                          .select_related('person')
+                          .select_for_update(skip_locked=True, of=('self',))
+                          .order_by('registration_id', 'id'))
+        registrations = get_registrations(Registration.objects.filter(
+            id__in={recipient.registration_id for recipient in recipients})).in_bulk()
+        booking_options = get_booking_option_summary(list(registrations))
+
+        sending, messages = [], []
+        for recipient in recipients:
+            registration = registrations.get(recipient.registration_id)
+            if registration is None or get_open_amount(registration) <= 0:
+                recipient.status = EmailJobRecipientStatus.Skipped
+                continue
+            sending.append(recipient)
+            messages.extend(mails.build(registration, booking_options[registration.id], [recipient.person]))
 
-    serializer = RegistrationCashSummarySerializer(registration)
-    booking_options = get_booking_options(serializer.data['booking_options'])
-    scout_organisation = get_scout_organisation_text(registration)
+        for recipient, result in zip(sending, send_mails(messages)):
+            recipient.status = EmailJobRecipientStatus.Sent if result.sent else EmailJobRecipientStatus.Failed
+            recipient.error = result.error
+        EmailJobRecipient.objects.bulk_update(recipients, ['status', 'error'])
+        EmailJob.objects.filter(id=job_id).update(updated_at=timezone.now())
 
-    if serializer.data['payment']['open'] <= 0:
-        return
+    failed = [recipient.email for recipient in recipients if recipient.status == EmailJobRecipientStatus.Failed]
+    if failed:
+        raise MailDispatchError(f'Sending to {len(failed)} recipients of job {job_id} failed')
+    return len(sending)
 
-    for person in registration.responsible_persons.all():
-        if person.email is None or len(person.email) == 0:
-            continue
 
-        receiver = [person.email, ]
+@shared_task
+def finish_email_job(job_id: str):
+    job = EmailJob.objects.get(id=job_id)
+    job.finished = True
+    job.save()
+    logger.info(f'Email job {job_id} finished: {job.progress}')
 
-        data = {
-            # 'responsible_persons': html.escape(person.scout_name) or '',
-            # 'unsubscribe': person.id,
-            'participant_count': serializer.data['participant_count'],
-            'booking_options': booking_options,
-            'sum': serializer.data['payment']['price'],
-            'received_sum': serializer.data['payment']['paid'],
-            'open_sum': serializer.data['payment']['open'],
-            'payment_id': serializer.data['ref_id'],
-            'scout_organisation': scout_organisation,
-            'event_name': event_name,
-            'event_pronoun': event_pronoun,
-            'payment_deadline': payment_deadline
-        }
 
-        headers = get_headers(person, sender)
+@shared_task
+def single_payment_reminder_mail(registration_id: str, email_type: EmailType):
+    registration: Registration = get_object_or_404(get_registrations(Registration.objects.all()), id=registration_id)
+    if get_open_amount(registration) <= 0:
+        return
 
-        html_rendered = template_html.render(make_context(data, autoescape=False))
-        plain_rendered = template_plain.render(make_context(data, autoescape=False))
+    mails = PaymentReminderMails(registration.event, email_type)
+    if mails.template_html is None:
+        logger.warning(f'Event {registration.event_id} has no {email_type} email, no reminder sent')
+        return
 
-        email = EmailMultiAlternatives(subject=subject,
-                                        body=plain_rendered,
-                                        from_email=sender,
-                                        to=receiver,
-                                        headers=headers,
-                                        reply_to=[sender, ])
-        email.attach_alternative(html_rendered, "text/html")
-        email.send(fail_silently=False)
+    persons = [person for person in registration.responsible_persons.all() if person.email]
+    booking_options = get_booking_option_summary([registration.id])
+    return summarize(send_mails(mails.build(registration, booking_options[registration.id], persons)))
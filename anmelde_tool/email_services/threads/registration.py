@@ -2,7 +2,6 @@ import html
 
 from celery import shared_task
 from django.contrib.auth import get_user_model
-from django.core.mail import EmailMultiAlternatives
 from django.template.context import make_context
 from rest_framework.generics import get_object_or_404
 
@@ -10,7 +9,8 @@ from anmelde_tool.registration.models import Registration
 from authentication.models import CustomUser
 from backend import settings
 from anmelde_tool.email_services.choices import EmailType
-from anmelde_tool.email_services.threads.helper import get_email, get_headers, get_event_pronoun, \
+from anmelde_tool.email_services.threads.dispatch import send_mails, summarize
+from anmelde_tool.email_services.threads.helper import get_email, build_email, get_event_pronoun, \
     get_html_participant_list, \
     get_participant_count, get_scout_organisation_text
 from anmelde_tool.event import models as event_models
@@ -46,10 +46,9 @@ def registration_confirmed_mail(registration_id: str, email_type: EmailType):
 
     scout_organisation = get_scout_organisation_text(registration)
 
-    person : User
+    emails = []
+    person: User
     for person in registration.responsible_persons.all():
-        receiver = [person.email, ]
-
         data = {
             'event_name': event_name,
             'event_pronoun': event_pronoun,
@@ -61,16 +60,8 @@ def registration_confirmed_mail(registration_id: str, email_type: EmailType):
             'scout_organisation': scout_organisation
         }
 
-        headers = get_headers(person, sender)
-
         html_rendered = template_html.render(make_context(data, autoescape=False))
         plain_rendered = template_plain.render(make_context(data, autoescape=False))
+        emails.append(build_email(subject, sender, person, html_rendered, plain_rendered))
 
-        email = EmailMultiAlternatives(subject=subject,
-                                       body=plain_rendered,
-                                       from_email=sender,
-                                       to=receiver,
-                                       headers=headers,
-                                       reply_to=[sender, ])
-        email.attach_alternative(html_rendered, "text/html")
-        email.send(fail_silently=False)
+    return summarize(send_mails(emails))
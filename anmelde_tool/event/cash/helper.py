@@ -0,0 +1,55 @@
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import QuerySet, Count, DecimalField, ExpressionWrapper, F, FloatField, OuterRef, Subquery, \
+    Sum, Value
+from django.db.models.functions import Cast, Coalesce
+
+from anmelde_tool.event.cash.models import CashIncome
+from anmelde_tool.registration.models import Registration, RegistrationParticipant
+
+
+def annotate_payment(registrations: QuerySet[Registration]) -> QuerySet[Registration]:
+    """
+    Adds participant_count, price, paid and open to every registration as correlated subqueries, so
+    the payment figures of all registrations are loaded together with the registrations and can be
+    used in filters and orderings.
+    """
+    participants = RegistrationParticipant.objects \
+        .filter(registration=OuterRef('pk')) \
+        .order_by() \
+        .values('registration')
+    incomes = CashIncome.objects \
+        .filter(registration=OuterRef('pk')) \
+        .order_by() \
+        .values('registration')
+    return registrations.annotate(
+        participant_count=Coalesce(Subquery(participants.annotate(count=Count('id')).values('count')), 0),
+        price=Coalesce(Subquery(participants.annotate(sum=Sum('booking_option__price')).values('sum')),
+                       Value(Decimal(0)), output_field=DecimalField(max_digits=10, decimal_places=2)),
+        paid=Coalesce(Subquery(incomes.annotate(sum=Sum('amount')).values('sum')), Value(0.0)),
+    ).annotate(
+        open=ExpressionWrapper(Cast('price', FloatField()) - F('paid'), output_field=FloatField()),
+    )
+
+
+def get_booking_option_summary(registration_ids) -> dict[uuid.UUID, list[dict]]:
+    """
+    Number and price sum of the participants per booking option for every given registration.
+    """
+    summary = defaultdict(list)
+    rows = RegistrationParticipant.objects \
+        .filter(registration_id__in=registration_ids) \
+        .order_by() \
+        .values('registration_id', booking_options=F('booking_option__name')) \
+        .annotate(sum=Count('booking_option__name'), price=Sum('booking_option__price'))
+    for row in rows:
+        summary[row.pop('registration_id')].append(row)
+    return summary
+
+
+def get_payment_ref_id(registration: Registration) -> str:
+    return f'{registration.event.name.replace(" ", "")[:10]}' \
+           f'-{registration.scout_organisation.name.replace(" ", "")[:10]}' \
+           f'-{str(registration.created_at.timestamp())[:10]}'
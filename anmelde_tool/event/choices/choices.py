@@ -49,6 +49,7 @@ class FileGenerationStatus(models.TextChoices):
     Processing = 'P', _('Dokument wird erstellt.')
     FinishedSuccessfully = 'FS', _('Dokument erfolgreich erstellt.')
     FinishedFailed = 'FF', _('Dokumenten Erstellung Fehlgeschlagen.')
+    Cancelled = 'C', _('Dokumenten Erstellung abgebrochen.')
 
 
 class FileType(models.TextChoices):
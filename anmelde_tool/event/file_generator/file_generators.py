@@ -1,11 +1,16 @@
 import os
 import time
 import traceback
+from datetime import timedelta
 from tempfile import NamedTemporaryFile
 
 from celery import shared_task
+from celery.exceptions import SoftTimeLimitExceeded
 from celery.utils.log import get_task_logger
+from django.conf import settings
 from django.core.files.base import File
+from django.db.models import QuerySet
+from django.utils import timezone
 from anmelde_tool.event.file_generator.generators.attribute_generator import AttributeGenerator
 from anmelde_tool.event.file_generator.generators.kjp_generator_v2 import KjpGeneratorV2
 from anmelde_tool.event.file_generator.generators.kjp_generator_v3 import KjpGeneratorV3
@@ -13,64 +18,105 @@ from anmelde_tool.event.file_generator.generators.kjr_generator import KjrGenera
 from anmelde_tool.event.file_generator.generators.travel_matrix_generator import TravelMatrixGenerator
 
 from anmelde_tool.event.choices.choices import FileGenerationStatus, FileType, FileExtension
-from anmelde_tool.event.file_generator.generators.abstract_generator import AbstractGenerator
+from anmelde_tool.event.file_generator.generators.abstract_generator import AbstractGenerator, GenerationCancelled
 from anmelde_tool.event.file_generator.generators.invoice_generator import InvoiceGenerator
 from anmelde_tool.event.file_generator.generators.kjp_generator import KjpGenerator
 from anmelde_tool.event.file_generator.generators.participant_generator import ParticipantGenerator
+from anmelde_tool.event.file_generator.fingerprint import get_fingerprint
 from anmelde_tool.event.file_generator.models import GeneratedFiles
 
 logger = get_task_logger(__name__)
 
 
-@shared_task()
-def generate_file(instance_id):
-    file_wrapper = GeneratedFiles.objects.get(pk=instance_id)
-    file_wrapper.status = FileGenerationStatus.Processing
-    file_wrapper.save()
-    try:
-        generator: AbstractGenerator = None
-        if file_wrapper.template.type == FileType.Kjp and file_wrapper.extension == FileExtension.Excel:
-            if file_wrapper.template.version == 1:
-                generator = KjpGenerator(file_wrapper)
-            elif file_wrapper.template.version == 2:
-                generator = KjpGeneratorV2(file_wrapper)
-            elif file_wrapper.template.version == 3:
-                generator = KjpGeneratorV3(file_wrapper)
+GENERATORS: dict[tuple[str, str, int], type[AbstractGenerator]] = {
+    (FileType.Kjp, FileExtension.Excel, 1): KjpGenerator,
+    (FileType.Kjp, FileExtension.Excel, 2): KjpGeneratorV2,
+    (FileType.Kjp, FileExtension.Excel, 3): KjpGeneratorV3,
+    (FileType.Invoice, FileExtension.Excel, 1): InvoiceGenerator,
+    (FileType.ParticipantList, FileExtension.Excel, 1): ParticipantGenerator,
+    (FileType.AttributeList, FileExtension.Excel, 1): AttributeGenerator,
+    (FileType.TravelMatrix, FileExtension.Excel, 1): TravelMatrixGenerator,
+    (FileType.KJR, FileExtension.Excel, 1): KjrGenerator,
+}
+
+
+def get_generator_class(file_wrapper: GeneratedFiles) -> type[AbstractGenerator] | None:
+    if file_wrapper.template is None:
+        return None
+    return GENERATORS.get((file_wrapper.template.type, file_wrapper.extension, file_wrapper.template.version))
 
-        elif file_wrapper.template.type == FileType.Invoice \
-                and file_wrapper.extension == FileExtension.Excel \
-                and file_wrapper.template.version == 1:
-            generator = InvoiceGenerator(file_wrapper)
 
-        elif file_wrapper.template.type == FileType.ParticipantList \
-                and file_wrapper.extension == FileExtension.Excel \
-                and file_wrapper.template.version == 1:
-            generator = ParticipantGenerator(file_wrapper)
+def reuse_generated_file(file_wrapper: GeneratedFiles) -> bool:
+    """
+    Takes over the file of an earlier generated file with the same fingerprint, the inputs have not
+    changed since it was generated.
+    """
+    fingerprint = get_fingerprint(file_wrapper, get_generator_class(file_wrapper))
+    if not fingerprint:
+        return False
+    cached = GeneratedFiles.objects \
+        .filter(event=file_wrapper.event_id,
+                fingerprint=fingerprint,
+                status=FileGenerationStatus.FinishedSuccessfully) \
+        .exclude(pk=file_wrapper.pk) \
+        .exclude(file='') \
+        .exclude(file__isnull=True) \
+        .order_by('-created_at') \
+        .first()
+    if cached is None:
+        return False
+    file_wrapper.file = cached.file.name
+    file_wrapper.fingerprint = fingerprint
+    file_wrapper.progress = 100
+    file_wrapper.status = FileGenerationStatus.FinishedSuccessfully
+    file_wrapper.save()
+    return True
 
-        elif file_wrapper.template.type == FileType.AttributeList \
-                and file_wrapper.extension == FileExtension.Excel \
-                and file_wrapper.template.version == 1:
-            generator = AttributeGenerator(file_wrapper)
 
-        elif file_wrapper.template.type == FileType.TravelMatrix \
-                and file_wrapper.extension == FileExtension.Excel \
-                and file_wrapper.template.version == 1:
-            generator = TravelMatrixGenerator(file_wrapper)
+def expire_dead_generations(files: QuerySet[GeneratedFiles]) -> int:
+    """
+    Generations killed by the hard time limit or a worker restart stay in Processing. Once their row was not
+    updated for longer than a generation may take, they are marked as failed, or cancelled if that was requested.
+    """
+    now = timezone.now()
+    dead = files.filter(status=FileGenerationStatus.Processing,
+                        updated_at__lt=now - timedelta(seconds=settings.FILE_GENERATION_TIME_LIMIT + 30))
+    dead.filter(cancel_requested=True).update(status=FileGenerationStatus.Cancelled, updated_at=now)
+    return dead.update(status=FileGenerationStatus.FinishedFailed, updated_at=now,
+                       error_msg='Die Erstellung wurde unterbrochen.')
 
-        elif file_wrapper.template.type == FileType.KJR \
-                and file_wrapper.extension == FileExtension.Excel \
-                and file_wrapper.template.version == 1:
-            generator = KjrGenerator(file_wrapper)
 
-        if generator is not None:
-            wb = generator.generate()
+@shared_task(soft_time_limit=settings.FILE_GENERATION_TIME_LIMIT, time_limit=settings.FILE_GENERATION_TIME_LIMIT + 30)
+def generate_file(instance_id):
+    # claims the queued file, files which were cancelled or are already taken by another worker are skipped
+    claimed = GeneratedFiles.objects \
+        .filter(pk=instance_id, status=FileGenerationStatus.Queued, cancel_requested=False) \
+        .update(status=FileGenerationStatus.Processing, progress=0, updated_at=timezone.now())
+    if not claimed:
+        return False
+    file_wrapper = GeneratedFiles.objects.get(pk=instance_id)
+    fingerprint = ''
+    try:
+        generator_class = get_generator_class(file_wrapper)
+        if generator_class is not None:
+            # taken before the data is read, changes made during the generation leave the file stale
+            fingerprint = get_fingerprint(file_wrapper, generator_class)
+            wb = generator_class(file_wrapper).generate()
+            file_wrapper.progress = 100
             save_file_excel(file_wrapper, wb)
         else:
             logger.debug(f'No suitable template found for generated file {file_wrapper.id}: {file_wrapper.template}')
+    except GenerationCancelled:
+        file_wrapper.cancel_requested = True
+        file_wrapper.status = FileGenerationStatus.Cancelled
+    except SoftTimeLimitExceeded:
+        file_wrapper.error_msg = f'Die Erstellung hat länger als {settings.FILE_GENERATION_TIME_LIMIT} Sekunden gedauert.'
+        file_wrapper.status = FileGenerationStatus.FinishedFailed
     except Exception as e:
         file_wrapper.error_msg = f'{e}\n{traceback.format_exc()}'
         file_wrapper.status = FileGenerationStatus.FinishedFailed
     else:
+        file_wrapper.fingerprint = fingerprint
         file_wrapper.status = FileGenerationStatus.FinishedSuccessfully
     file_wrapper.save()
     return True
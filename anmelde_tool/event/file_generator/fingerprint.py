@@ -0,0 +1,73 @@
+import hashlib
+
+from django.db.models import Count, Max
+
+from anmelde_tool.event import models as event_models
+from anmelde_tool.event.file_generator.generators.abstract_generator import AbstractGenerator
+from anmelde_tool.event.file_generator.models import GeneratedFiles
+from anmelde_tool.registration import models as registration_models
+
+
+def get_data_version(event: event_models.Event) -> str:
+    """
+    Hash of everything the generators read from the database about an event. It changes with every saved,
+    added or deleted registration and participant, with every change of the event, its location or its
+    booking options, with saved scout organisations and zip codes in use and with changed responsible persons.
+    """
+    location = event_models.Event.objects \
+        .filter(pk=event.pk) \
+        .values_list('location__updated_at', 'location__zip_code__updated_at') \
+        .first()
+    registrations = registration_models.Registration.objects \
+        .filter(event=event) \
+        .aggregate(count=Count('id'), updated_at=Max('updated_at'),
+                   scout_organisations=Max('scout_organisation__updated_at'))
+    participants = registration_models.RegistrationParticipant.objects \
+        .filter(registration__event=event) \
+        .aggregate(count=Count('id'), updated_at=Max('updated_at'), zip_codes=Max('zip_code__updated_at'))
+    booking_options = event_models.BookingOption.objects \
+        .filter(event=event) \
+        .order_by('id') \
+        .values_list('id', 'name', 'price', 'start_date', 'end_date')
+    # the m2m rows and the users have no timestamps, their printed fields are hashed instead
+    responsible_persons = registration_models.Registration.responsible_persons.through.objects \
+        .filter(registration__event=event) \
+        .order_by('registration_id', 'customuser_id') \
+        .values_list('registration_id', 'customuser__first_name', 'customuser__last_name', 'customuser__email')
+
+    value = '|'.join([
+        str(event.updated_at),
+        str(location),
+        str(registrations['count']),
+        str(registrations['updated_at']),
+        str(registrations['scout_organisations']),
+        str(participants['count']),
+        str(participants['updated_at']),
+        str(participants['zip_codes']),
+        str(list(booking_options)),
+        str(list(responsible_persons)),
+    ])
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def get_fingerprint(file_wrapper: GeneratedFiles, generator_class: type[AbstractGenerator],
+                    data_version: str = None) -> str:
+    """
+    Fingerprint of the inputs of a generated file, empty if the file of the generator can not be reused.
+    """
+    if generator_class is None or not generator_class.cacheable:
+        return ''
+    value = '|'.join([
+        str(file_wrapper.event_id),
+        str(file_wrapper.template_id),
+        str(file_wrapper.template.version),
+        # a replaced template file keeps the template and its version
+        file_wrapper.template.file.name,
+        generator_class.__name__,
+        str(generator_class.version),
+        str(file_wrapper.extension),
+        str(file_wrapper.bund_id),
+        str(file_wrapper.bund and file_wrapper.bund.updated_at),
+        data_version or get_data_version(file_wrapper.event),
+    ])
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
@@ -1,10 +1,23 @@
 from abc import ABC, abstractmethod
+from typing import Iterable, Iterator
+
+from django.utils import timezone
 from openpyxl import Workbook
 
 from anmelde_tool.event.file_generator.models import GeneratedFiles
 
 
+class GenerationCancelled(Exception):
+    pass
+
+
 class AbstractGenerator(ABC):
+    # part of the fingerprint of the generated files, increase it whenever the output changes
+    version = 1
+    # generated files are reused while the fingerprint of their event data matches
+    cacheable = True
+    # the progress of the generated file is saved every `progress_step` items
+    progress_step = 100
 
     def __init__(self, generated_file: GeneratedFiles):
         super().__init__()
@@ -13,3 +26,22 @@ class AbstractGenerator(ABC):
     @abstractmethod
     def generate(self) -> Workbook:
         pass
+
+    def track(self, items: Iterable, total: int) -> Iterator:
+        """
+        Yields the items and saves the progress of the generated file every `progress_step` items.
+        Raises `GenerationCancelled` once the cancellation of the generated file was requested.
+        """
+        for index, item in enumerate(items):
+            if index and index % self.progress_step == 0:
+                self.report_progress(index, total)
+            yield item
+
+    def report_progress(self, done: int, total: int):
+        # 100 percent is only reached once the file is saved
+        progress = min(done * 100 // total, 99) if total else 0
+        self.generated_file.progress = progress
+        files = GeneratedFiles.objects.filter(pk=self.generated_file.pk)
+        files.update(progress=progress, updated_at=timezone.now())
+        if files.filter(cancel_requested=True).exists():
+            raise GenerationCancelled()
@@ -15,6 +15,8 @@ from anmelde_tool.event.file_generator.models import FileTemplate
 
 
 class AttributeGenerator(AbstractGenerator):
+    # the attributes have no timestamps, changes would not show in the fingerprint
+    cacheable = False
 
     def generate(self) -> Workbook:
         event: event_models.Event = self.generated_file.event
@@ -50,7 +52,8 @@ class AttributeGenerator(AbstractGenerator):
 
         index: int = 3
         registration: event_models.Registration
-        for registration in registrations.all().order_by('scout_organisation__name'):
+        for registration in self.track(registrations.all().order_by('scout_organisation__name'),
+                                       registrations.count()):
             travel_tag: basic_models.TravelAttribute = registration.tags \
                 .instance_of(basic_models.TravelAttribute).first()
             tent_small_tag: basic_models.IntegerAttribute = registration.tags.filter(template_id=17).first()
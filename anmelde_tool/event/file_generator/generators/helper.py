@@ -162,9 +162,23 @@ def get_participant_registration_scout_organisation_name(participant: Registrati
 def get_participants_by_event(event: event_models.Event) -> QuerySet[RegistrationParticipant]:
     registrations = get_registrations(event).values_list('id', flat=True)
     return RegistrationParticipant.objects.filter(registration__in=registrations) \
+        .select_related('zip_code', 'booking_option', 'registration__scout_organisation') \
         .order_by('registration__scout_organisation__name', 'last_name')
 
 
+def get_participants_grouped_by_registration(event: event_models.Event) \
+        -> list[tuple[Registration, list[RegistrationParticipant]]]:
+    """
+    The registrations of the event with their participants ordered by last name, loaded with two queries.
+    """
+    registrations = list(get_registrations(event).select_related('scout_organisation'))
+    participants = {registration.id: [] for registration in registrations}
+    for participant in RegistrationParticipant.objects.filter(registration__in=registrations) \
+            .select_related('zip_code', 'booking_option').order_by('last_name'):
+        participants[participant.registration_id].append(participant)
+    return [(registration, participants[registration.id]) for registration in registrations]
+
+
 def get_booking_options_name(event: event_models.Event):
     return list(event.bookingoption_set.exclude(name__contains='Tagesgast').values_list('name', flat=True))
 
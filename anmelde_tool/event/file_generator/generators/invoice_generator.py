@@ -41,7 +41,7 @@ class InvoiceGenerator(AbstractGenerator):
 
         index: int = 1
         registration: event_models.Registration
-        for registration in registrations.all():
+        for registration in self.track(registrations.all(), registrations.count()):
             serialized = RegistrationCashSummarySerializer(registration).data
             person_1: User = registration.responsible_persons.first()
             person_2: User = None
@@ -1,56 +1,76 @@
-from django.db.models import QuerySet
-from openpyxl import load_workbook, Workbook
+from openpyxl import Workbook
 
 from anmelde_tool.event.file_generator.generators import helper
-from anmelde_tool.event.file_generator.generators.abstract_generator import AbstractGenerator
-from anmelde_tool.event.file_generator.models import FileTemplate
+from anmelde_tool.event.file_generator.generators.streaming import StreamingGenerator
 from anmelde_tool.event.models import Event
-from anmelde_tool.registration.models import Registration, RegistrationParticipant
+from anmelde_tool.registration.models import RegistrationParticipant
 
 
-class KjpGenerator(AbstractGenerator):
+def chunks(participants: list, size: int) -> list[list]:
+    return [participants[index:index + size] for index in range(0, len(participants), size)]
 
-    def generate(self) -> Workbook:
+
+class KjpGenerator(StreamingGenerator):
+    """
+    Fills one copy of the KJP form for every ten participants of a registration, the participants are
+    numbered throughout. The form is streamed into a new sheet per page instead of copying the worksheet.
+    """
+    form = 'L_1_DPBM'
+    participants_per_page = 10
+    first_row = 17
+    row_step = 3
+    # number, name and address, gender, state, below 27, days
+    columns = ('A', 'C', 'T', 'V', 'Z', 'AQ')
+    # pages of ten participants
+    progress_step = 10
+
+    def get_pages(self, event: Event) -> list[tuple[str, list[RegistrationParticipant]]]:
+        pages = []
+        for registration, participants in helper.get_participants_grouped_by_registration(event):
+            for index, chunk in enumerate(chunks(participants, self.participants_per_page)):
+                pages.append((f'{registration.scout_organisation.name}_{index + 1}', chunk))
+        return pages
+
+    def get_header(self, event: Event) -> dict:
+        return {
+            'A9': event.name,
+            'T9': helper.get_event_short_description(event),
+            'AH9': helper.get_event_location(event),
+            'AP9': helper.get_event_date(event),
+            'AW9': helper.get_event_days(event),
+        }
+
+    def get_page_header(self, page_number: int, page_count: int) -> dict:
+        return {'AZ1': page_number}
+
+    def write(self, template: Workbook):
         event: Event = self.generated_file.event
-        registrations: QuerySet[Registration] = helper.get_registrations(event)
+        form = template[self.form]
+        for worksheet in template.worksheets:
+            if worksheet is not form:
+                template_sheet = self.template_sheet(worksheet)
+                template_sheet.write(template_sheet.create(self.workbook))
 
-        file: FileTemplate = self.generated_file.template
-        wb: Workbook = load_workbook(file.file)
-        original = wb.get_sheet_by_name('L_1_DPBM')
+        form_sheet = self.template_sheet(form)
+        pages = self.get_pages(event)
+        if not pages and len(template.worksheets) == 1:
+            form_sheet.write(form_sheet.create(self.workbook))
+            return
 
-        sheets_count = 0
+        header = self.get_header(event)
+        number_column, name_column, gender_column, state_column, below_27_column, days_column = self.columns
         participants_count = 0
-        registration: Registration
-        for registration in registrations:
-            participants = registration.registrationparticipant_set.all().order_by('last_name')
-            participant_count = participants.count()
-            registration_index: int
-            chunked_registration_indices: int
-            for registration_index, chunked_registration_indices in enumerate(range(0, participant_count, 10)):
-                registration_chunk = participants[chunked_registration_indices:chunked_registration_indices + 10]
-                sheet = wb.copy_worksheet(original)
-                sheets_count += 1
-                sheet.title = f'{registration.scout_organisation.name}_{registration_index + 1}'
-
-                sheet['A9'] = event.name
-                sheet['T9'] = helper.get_event_short_description(event)
-                sheet['AH9'] = helper.get_event_location(event)
-                sheet['AP9'] = helper.get_event_date(event)
-                sheet['AW9'] = helper.get_event_days(event)
-                sheet['AZ1'] = sheets_count
-
-                participant: RegistrationParticipant
-                for participant_index, participant in enumerate(registration_chunk):
-                    cell = participant_index * 3 + 17
-                    participants_count += 1
-                    sheet[f'A{cell}'] = participants_count
-                    sheet[f'C{cell}'] = f'{helper.get_participant_full_name(participant)}' \
-                                        f'\n{helper.get_participant_adress(participant)}'
-                    sheet[f'T{cell}'] = helper.get_participant_gender(participant)
-                    sheet[f'V{cell}'] = helper.get_participant_state(participant)
-                    sheet[f'Z{cell}'] = helper.get_participant_below_27(event, participant)
-                    sheet[f'AQ{cell}'] = helper.get_participant_days(event, participant)
-
-        if len(wb.worksheets) > 1:
-            wb.remove(original)
-        return wb
+        for page_number, (title, participants) in enumerate(self.track(pages, len(pages)), start=1):
+            values = {**header, **self.get_page_header(page_number, len(pages))}
+            participant: RegistrationParticipant
+            for participant_index, participant in enumerate(participants):
+                cell = participant_index * self.row_step + self.first_row
+                participants_count += 1
+                values[f'{number_column}{cell}'] = participants_count
+                values[f'{name_column}{cell}'] = f'{helper.get_participant_full_name(participant)}' \
+                                                 f'\n{helper.get_participant_adress(participant)}'
+                values[f'{gender_column}{cell}'] = helper.get_participant_gender(participant)
+                values[f'{state_column}{cell}'] = helper.get_participant_state(participant)
+                values[f'{below_27_column}{cell}'] = helper.get_participant_below_27(event, participant)
+                values[f'{days_column}{cell}'] = helper.get_participant_days(event, participant)
+            form_sheet.write(form_sheet.create(self.workbook, title), values=values)
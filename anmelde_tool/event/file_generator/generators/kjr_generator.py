@@ -1,57 +1,50 @@
-import string
-
-from openpyxl import load_workbook, Workbook
+from openpyxl import Workbook
 from openpyxl.styles import Alignment, Font
 from openpyxl.styles.borders import Border, Side
 
 from anmelde_tool.event import models as event_models
 from anmelde_tool.event.file_generator.generators import helper
-from anmelde_tool.event.file_generator.generators.abstract_generator import AbstractGenerator
 from anmelde_tool.event.file_generator.generators.helper import get_participants_by_event
-from anmelde_tool.event.file_generator.models import FileTemplate
+from anmelde_tool.event.file_generator.generators.streaming import StreamingGenerator
 
 
-class KjrGenerator(AbstractGenerator):
+class KjrGenerator(StreamingGenerator):
 
-    def generate(self) -> Workbook:
+    def write(self, template: Workbook):
         event: event_models.Event = self.generated_file.event
-
-        file: FileTemplate = self.generated_file.template
-        wb: Workbook = load_workbook(file.file)
-
-        original = wb.active
-
-        original['G1'] = event.name
-        original['U1'] = helper.get_event_date(event)
         participants = get_participants_by_event(event)
+        participants_count = participants.count()
 
         thin_border = Border(left=Side(style='thin'),
                              right=Side(style='thin'),
                              top=Side(style='thin'),
                              bottom=Side(style='thin'))
         alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        font_style = Font(size="11", name='Calibri')
-        font_style_index = Font(size="11", name='Calibri', bold=True)
-
-        participant: event_models.RegistrationParticipant
-
-        for index, participant in enumerate(participants.all()):
-            original[f'C{index + 5}'] = index
-            original[f'C{index + 5}'].font = font_style_index
-            original[f'C{index + 5}'].border = thin_border
-            original[f'C{index + 5}'].alignment = alignment
-
-            original[f'D{index + 5}'] = helper.get_participant_full_name(participant)
-            original[f'E{index + 5}'] = helper.get_participant_age(event, participant)
-            original[f'F{index + 5}'] = helper.get_participant_adress(participant)
-
-            days: int = int(helper.get_participant_days(event, participant))
-            for letter in string.ascii_uppercase[6: 6 + days]:
-                original[f'{letter}{index + 5}'] = '/'
-
-            for letter in string.ascii_uppercase[3: 21]:
-                original[f'{letter}{index + 5}'].border = thin_border
-                original[f'{letter}{index + 5}'].alignment = alignment
-                original[f'{letter}{index + 5}'].font = font_style
-
-        return wb
+        style = self.styles.add('kjr', border=thin_border, alignment=alignment, font=Font(size="11", name='Calibri'))
+        style_index = self.styles.add('kjr_index', border=thin_border, alignment=alignment,
+                                      font=Font(size="11", name='Calibri', bold=True))
+
+        def rows():
+            participant: event_models.RegistrationParticipant
+            for index, participant in enumerate(self.track(participants.iterator(chunk_size=500), participants_count)):
+                row = {
+                    3: index,
+                    4: helper.get_participant_full_name(participant),
+                    5: helper.get_participant_age(event, participant),
+                    6: helper.get_participant_adress(participant),
+                }
+                days: int = int(helper.get_participant_days(event, participant) or 0)
+                row.update({column: '/' for column in range(7, min(7 + days, 27))})
+                yield row
+
+        template_sheet = self.template_sheet(template.active)
+        template_sheet.write(
+            template_sheet.create(self.workbook),
+            values={
+                'G1': event.name,
+                'U1': helper.get_event_date(event),
+            },
+            rows=rows(),
+            first_row=5,
+            row_styles={3: style_index, **{column: style for column in range(4, 22)}},
+        )
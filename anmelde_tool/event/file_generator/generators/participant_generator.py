@@ -1,53 +1,57 @@
-import string
-
-from openpyxl import load_workbook, Workbook
+from openpyxl import Workbook
 from openpyxl.styles import Alignment, Font
+from openpyxl.worksheet.worksheet import Worksheet
 
 from anmelde_tool.event import models as event_models
 from anmelde_tool.event.file_generator.generators import helper
-from anmelde_tool.event.file_generator.generators.abstract_generator import AbstractGenerator
 from anmelde_tool.event.file_generator.generators.helper import get_participants_by_event
-from anmelde_tool.event.file_generator.models import FileTemplate
+from anmelde_tool.event.file_generator.generators.streaming import StreamingGenerator
 
 
-class ParticipantGenerator(AbstractGenerator):
+class ParticipantGenerator(StreamingGenerator):
 
-    def generate(self) -> Workbook:
+    def write(self, template: Workbook):
         event: event_models.Event = self.generated_file.event
         participants = get_participants_by_event(event)
-        file: FileTemplate = self.generated_file.template
-        wb: Workbook = load_workbook(file.file)
-
-        original = wb.active
-        original.sheet_format.defaultRowHeight = 25.0
-        original.set_printer_settings(paper_size=original.PAPERSIZE_A4, orientation='landscape')
-
-        table = original.tables['Teilnehmer']
-        table.ref = f'A3:J{participants.count() + 3}'
-
-        original['C1'] = f'{event.name} \n{helper.get_event_location(event)}'
-        original['G1'] = helper.get_event_date(event)
-        original['J1'] = participants.count()
-
-        alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        font_style = Font(size="10", name='Calibri')
-
-        participant: event_models.RegistrationParticipant
-        for index, participant in enumerate(participants.all()):
-            original[f'A{index + 4}'] = helper.get_participant_first_name(participant)
-            original[f'B{index + 4}'] = helper.get_participant_last_name(participant)
-            original[f'C{index + 4}'] = helper.get_participant_scout_name(participant)
-            original[f'D{index + 4}'] = helper.get_participant_age(event, participant)
-            original[f'E{index + 4}'] = helper.get_participant_gender(participant)
-            original[f'F{index + 4}'] = helper.get_participant_mobile_numer(participant)
-            original[f'G{index + 4}'] = helper.get_participant_email(participant)
-            original[f'H{index + 4}'] = helper.get_participant_registration_scout_organisation_name(participant)
-            original[f'I{index + 4}'] = helper.get_participant_address(participant)
-            original[f'J{index + 4}'] = helper.get_participant_zip_city(participant)
-
-            original.row_dimensions[index + 4].height = 25
-            for letter in string.ascii_uppercase[:10]:
-                original[f'{letter}{index + 4}'].alignment = alignment
-                original[f'{letter}{index + 4}'].font = font_style
-
-        return wb
+        participants_count = participants.count()
+
+        style = self.styles.add(
+            'participant',
+            alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+            font=Font(size="10", name='Calibri')
+        )
+
+        def rows():
+            participant: event_models.RegistrationParticipant
+            for participant in self.track(participants.iterator(chunk_size=500), participants_count):
+                yield {
+                    1: helper.get_participant_first_name(participant),
+                    2: helper.get_participant_last_name(participant),
+                    3: helper.get_participant_scout_name(participant),
+                    4: helper.get_participant_age(event, participant),
+                    5: helper.get_participant_gender(participant),
+                    6: helper.get_participant_mobile_numer(participant),
+                    7: helper.get_participant_email(participant),
+                    8: helper.get_participant_registration_scout_organisation_name(participant),
+                    9: helper.get_participant_address(participant),
+                    10: helper.get_participant_zip_city(participant),
+                }
+
+        template_sheet = self.template_sheet(template.active)
+        sheet = template_sheet.create(self.workbook, tables={'Teilnehmer': f'A3:J{participants_count + 3}'})
+        sheet.sheet_format.defaultRowHeight = 25.0
+        sheet.page_setup.paperSize = Worksheet.PAPERSIZE_A4
+        sheet.page_setup.orientation = 'landscape'
+
+        template_sheet.write(
+            sheet,
+            values={
+                'C1': f'{event.name} \n{helper.get_event_location(event)}',
+                'G1': helper.get_event_date(event),
+                'J1': participants_count,
+            },
+            rows=rows(),
+            first_row=4,
+            row_styles={column: style for column in range(1, 11)},
+            row_height=25,
+        )
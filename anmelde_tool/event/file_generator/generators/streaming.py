@@ -0,0 +1,207 @@
+import warnings
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from copy import copy, deepcopy
+from io import BytesIO
+from typing import Any, Iterable
+
+from openpyxl import load_workbook, Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.drawing.image import Image
+from openpyxl.styles import NamedStyle
+from openpyxl.utils.cell import coordinate_to_tuple
+from openpyxl.worksheet.dimensions import ColumnDimension, RowDimension
+from openpyxl.worksheet.worksheet import Worksheet
+
+from anmelde_tool.event.file_generator.generators.abstract_generator import AbstractGenerator
+
+PAGE_SETUP_FIELDS = ('orientation', 'paperSize', 'scale', 'fitToHeight', 'fitToWidth', 'pageOrder', 'useFirstPageNumber',
+                     'firstPageNumber')
+
+
+class StyleRegistry:
+    """
+    Named styles of a workbook. Every style is registered once and the cells only reference it by name.
+    """
+
+    def __init__(self, workbook: Workbook):
+        self.workbook = workbook
+        self.template_styles = {}
+        self.style_arrays = {}
+
+    def add(self, name: str, **kwargs) -> str:
+        if name not in self.workbook.named_styles:
+            self.workbook.add_named_style(NamedStyle(name=name, **kwargs))
+        return name
+
+    def apply(self, cell, name: str):
+        """
+        Same as `cell.style = name`, but the named style is only looked up once. The cells share the
+        style array, which is fine as long as they are only written and not styled further.
+        """
+        if name not in self.style_arrays:
+            cell.style = name
+            self.style_arrays[name] = cell._style
+        cell._style = self.style_arrays[name]
+
+    def from_cell(self, cell) -> str | None:
+        if not cell.has_style:
+            return None
+        key = tuple(cell._style)
+        if key not in self.template_styles:
+            self.template_styles[key] = self.add(
+                f'template_{len(self.template_styles) + 1}',
+                font=copy(cell.font),
+                fill=copy(cell.fill),
+                border=copy(cell.border),
+                alignment=copy(cell.alignment),
+                number_format=cell.number_format,
+                protection=copy(cell.protection),
+            )
+        return self.template_styles[key]
+
+
+class TemplateSheet:
+    """
+    A worksheet of a template which can be streamed into write-only sheets any number of times.
+
+    The cells of the template are read once. Every sheet created from it gets the layout of the
+    template (column widths, row heights, merged cells, images, tables and print settings) and
+    its cells, which are written row by row together with the generated rows.
+    """
+
+    def __init__(self, worksheet: Worksheet, styles: StyleRegistry):
+        self.worksheet = worksheet
+        self.styles = styles
+        self.tables_added = False
+        self.cells = defaultdict(dict)
+        for row in worksheet.iter_rows():
+            for cell in row:
+                style = styles.from_cell(cell)
+                if cell.value is not None or style:
+                    self.cells[cell.row][cell.column] = (cell.value, style)
+        self.max_row = max(self.cells, default=0)
+        self.images = [(image._data(), image.anchor) for image in worksheet._images]
+
+    def create(self, workbook: Workbook, title: str = None, tables: dict[str, str] = None):
+        """
+        New write-only sheet with the layout of the template, `tables` maps the names of the template
+        tables to their new ref. The layout has to be changed before the first row is written.
+        """
+        sheet = workbook.create_sheet(title or self.worksheet.title)
+        self.copy_layout(sheet, tables or {})
+        return sheet
+
+    def write(self, sheet, values: dict[str, Any] = None, rows: Iterable[dict] = (), first_row: int = None,
+              row_styles: dict[int, str] = None, row_height: float = None):
+        """
+        Writes the template cells with `values` (coordinates like 'A1' to their new value) put in and the
+        `rows` (dicts of column index to value) from `first_row` on. `row_styles` maps column indices to
+        the named style of these rows.
+        """
+        values_by_row = defaultdict(dict)
+        for coordinate, value in (values or {}).items():
+            row_index, column_index = coordinate_to_tuple(coordinate)
+            values_by_row[row_index][column_index] = value
+        last_template_row = max([self.max_row, *values_by_row])
+        row_styles = row_styles or {}
+
+        rows = iter(rows)
+        row_index = 0
+        while True:
+            row_index += 1
+            data = next(rows, None) if first_row and row_index >= first_row else None
+            if data is None and row_index > last_template_row:
+                break
+
+            cells = dict(self.cells.get(row_index, {}))
+            for column_index, value in values_by_row.get(row_index, {}).items():
+                cells[column_index] = (value, cells.get(column_index, (None, None))[1])
+            if data is not None:
+                for column_index, style in row_styles.items():
+                    cells[column_index] = (data.get(column_index), style)
+                for column_index, value in data.items():
+                    style = row_styles.get(column_index) or cells.get(column_index, (None, None))[1]
+                    cells[column_index] = (value, style)
+                if row_height:
+                    sheet.row_dimensions[row_index] = RowDimension(sheet, index=row_index, ht=row_height,
+                                                                   customHeight=True)
+            sheet.append(self.build_row(sheet, cells))
+
+    def build_row(self, sheet, cells: dict[int, tuple]) -> list:
+        row = [None] * max(cells, default=0)
+        for column_index, (value, style) in cells.items():
+            if style:
+                cell = WriteOnlyCell(sheet, value)
+                self.styles.apply(cell, style)
+                row[column_index - 1] = cell
+            else:
+                row[column_index - 1] = value
+        return row
+
+    def copy_layout(self, sheet, tables: dict[str, str]):
+        template = self.worksheet
+        for key, dimension in template.column_dimensions.items():
+            sheet.column_dimensions[key] = ColumnDimension(
+                sheet, index=dimension.index, width=dimension.width, bestFit=dimension.bestFit,
+                hidden=dimension.hidden, outlineLevel=dimension.outlineLevel, collapsed=dimension.collapsed,
+                min=dimension.min, max=dimension.max, customWidth=dimension.customWidth)
+        for index, dimension in template.row_dimensions.items():
+            if dimension.ht is not None or dimension.hidden:
+                sheet.row_dimensions[index] = RowDimension(
+                    sheet, index=index, ht=dimension.ht, customHeight=dimension.customHeight, hidden=dimension.hidden)
+
+        for merged_range in template.merged_cells.ranges:
+            sheet.merged_cells.add(merged_range.coord)
+
+        sheet.sheet_format = copy(template.sheet_format)
+        sheet.sheet_properties = copy(template.sheet_properties)
+        sheet.page_margins = copy(template.page_margins)
+        sheet.print_options = copy(template.print_options)
+        sheet.views = deepcopy(template.views)
+        for field in PAGE_SETUP_FIELDS:
+            setattr(sheet.page_setup, field, getattr(template.page_setup, field))
+        if template._print_area:
+            sheet.print_area = [cell_range.coord for cell_range in template._print_area.ranges]
+        sheet.conditional_formatting = template.conditional_formatting
+        sheet.data_validations = template.data_validations
+
+        for data, anchor in self.images:
+            image = Image(BytesIO(data))
+            image.anchor = deepcopy(anchor)
+            sheet.add_image(image)
+
+        # table names are unique within a workbook, only the first sheet gets the tables
+        if self.tables_added:
+            return
+        self.tables_added = True
+        for table in template.tables.values():
+            table = deepcopy(table)
+            if table.name in tables:
+                table.ref = tables[table.name]
+                if table.autoFilter:
+                    table.autoFilter.ref = tables[table.name]
+            with warnings.catch_warnings():
+                # the template tables bring their columns along
+                warnings.simplefilter('ignore')
+                sheet.add_table(table)
+
+
+class StreamingGenerator(AbstractGenerator, ABC):
+    """
+    Base of the generators which write their file in openpyxl's write-only mode. The rows are streamed
+    to disk while they are generated, so the memory needed does not grow with the number of participants.
+    """
+
+    def generate(self) -> Workbook:
+        self.workbook = Workbook(write_only=True)
+        self.styles = StyleRegistry(self.workbook)
+        self.write(load_workbook(self.generated_file.template.file))
+        return self.workbook
+
+    def template_sheet(self, worksheet: Worksheet) -> TemplateSheet:
+        return TemplateSheet(worksheet, self.styles)
+
+    @abstractmethod
+    def write(self, template: Workbook):
+        pass
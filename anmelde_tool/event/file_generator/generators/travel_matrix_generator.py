@@ -9,6 +9,8 @@ from anmelde_tool.event.file_generator.models import FileTemplate
 
 
 class TravelMatrixGenerator(AbstractGenerator):
+    # the attributes have no timestamps, changes would not show in the fingerprint
+    cacheable = False
 
     def generate(self) -> Workbook:
         event: event_models.Event = self.generated_file.event
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_generator', '0002_generatedfiles_bund_alter_filetemplate_extension_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedfiles',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_generator', '0003_generatedfiles_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedfiles',
+            name='cancel_requested',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='generatedfiles',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='generatedfiles',
+            name='status',
+            field=models.CharField(choices=[('Q', 'In der Warteschlange.'), ('P', 'Dokument wird erstellt.'), ('FS', 'Dokument erfolgreich erstellt.'), ('FF', 'Dokumenten Erstellung Fehlgeschlagen.'), ('C', 'Dokumenten Erstellung abgebrochen.')], default='Q', max_length=2),
+        ),
+    ]
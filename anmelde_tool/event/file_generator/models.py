@@ -28,3 +28,6 @@ class GeneratedFiles(basic_models.TimeStampMixin):
     extension = models.CharField(max_length=1, choices=FileExtension.choices, default=FileExtension.Excel)
     template = models.ForeignKey(FileTemplate, on_delete=models.SET_NULL, null=True)
     bund = models.ForeignKey(ScoutHierarchy, on_delete=models.SET_NULL, null=True, blank=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    cancel_requested = models.BooleanField(default=False)
+    fingerprint = models.CharField(max_length=64, blank=True, default='', db_index=True, editable=False)
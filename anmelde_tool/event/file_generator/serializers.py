@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from anmelde_tool.event.file_generator.file_generators import get_generator_class
+from anmelde_tool.event.file_generator.fingerprint import get_data_version, get_fingerprint
 from anmelde_tool.event.file_generator.models import GeneratedFiles, FileTemplate
 from anmelde_tool.registration.serializers import CurrentUserSerializer
 
@@ -17,19 +19,46 @@ class GeneratedFilesGetSerializer(serializers.ModelSerializer):
     user = CurrentUserSerializer(many=False, read_only=True)
     extension = serializers.CharField(source='get_extension_display', read_only=True)
     template = FileTemplateSerializer(many=False, read_only=True)
+    stale = serializers.SerializerMethodField()
 
     class Meta:
         model = GeneratedFiles
         fields = '__all__'
 
+    def get_stale(self, obj: GeneratedFiles) -> bool | None:
+        """
+        Whether the inputs of the file changed since it was generated, `None` if the file has no fingerprint.
+        """
+        if not obj.fingerprint:
+            return None
+        # computed once per event for the whole list
+        data_versions = self.context.setdefault('data_versions', {})
+        if obj.event_id not in data_versions:
+            data_versions[obj.event_id] = get_data_version(obj.event)
+        fingerprint = get_fingerprint(obj, get_generator_class(obj), data_versions[obj.event_id])
+        return fingerprint != obj.fingerprint
+
 
 class GeneratedFilesPostSerializer(serializers.ModelSerializer):
     class Meta:
         model = GeneratedFiles
         fields = (
+            'id',
             'extension',
             'event',
             'user',
             'template',
             'bund'
         )
+
+
+class GeneratedFilesProgressSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GeneratedFiles
+        fields = (
+            'id',
+            'status',
+            'progress',
+            'cancel_requested',
+            'updated_at',
+        )
@@ -1,5 +1,7 @@
+from django.db import transaction
+
 from anmelde_tool.event.file_generator.models import FileTemplate, GeneratedFiles
-from anmelde_tool.event.file_generator.file_generators import generate_file
+from anmelde_tool.event.file_generator.file_generators import generate_file, reuse_generated_file
 
 
 def pre_delete_file_template(sender, instance: FileTemplate, **kwargs):
@@ -10,6 +12,9 @@ def pre_delete_file_template(sender, instance: FileTemplate, **kwargs):
 
 
 def pre_delete_generate_files(sender, instance: GeneratedFiles, **kwargs):
+    # reused files are shared between generated files with the same fingerprint
+    if instance.file and GeneratedFiles.objects.filter(file=instance.file.name).exclude(pk=instance.pk).exists():
+        return
     try:
         instance.file.delete(save=False)
     except GeneratedFiles.DoesNotExist:
@@ -31,5 +36,6 @@ def pre_save_file_template(sender, instance: FileTemplate, **kwargs):
 
 
 def post_save_generate_files(sender, instance: GeneratedFiles, created, **kwargs):
-    if created:
-        generate_file.delay(instance.pk)
+    if created and not reuse_generated_file(instance):
+        # the worker has to find the committed file
+        transaction.on_commit(lambda: generate_file.delay(instance.pk))
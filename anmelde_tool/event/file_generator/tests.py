@@ -1,3 +1,265 @@
+from datetime import datetime, timedelta
+from io import BytesIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import File
 from django.test import TestCase
+from django.utils import timezone
+from openpyxl import load_workbook, Workbook
+from openpyxl.styles import Font
+from openpyxl.worksheet.table import Table
+from rest_framework.test import APIClient
+
+from anmelde_tool.event.choices.choices import FileGenerationStatus, FileType
+
+from anmelde_tool.event.file_generator.generators.kjp_generator_v3 import KjpGeneratorV3
+from anmelde_tool.event.file_generator.generators.kjr_generator import KjrGenerator
+from anmelde_tool.event.file_generator.generators.participant_generator import ParticipantGenerator
+from anmelde_tool.event.file_generator.file_generators import generate_file
+from anmelde_tool.event.file_generator.fingerprint import get_fingerprint
+from anmelde_tool.event.file_generator.generators.abstract_generator import AbstractGenerator, GenerationCancelled
+from anmelde_tool.event.file_generator.models import FileTemplate, GeneratedFiles
+from anmelde_tool.event.file_generator.serializers import GeneratedFilesGetSerializer
+from anmelde_tool.event.models import Event, BookingOption
+from anmelde_tool.registration.models import Registration, RegistrationParticipant
+from basic.models import ScoutOrgaLevel, FrontendTheme, ScoutHierarchy, ZipCode
+
+
+def template_file(workbook: Workbook) -> File:
+    content = BytesIO()
+    workbook.save(content)
+    content.seek(0)
+    return File(content, name='template.xlsx')
+
+
+def generate(generator_class, event: Event, workbook: Workbook) -> Workbook:
+    generated_file = GeneratedFiles(event=event, template=FileTemplate(file=template_file(workbook)))
+    content = BytesIO()
+    generator_class(generated_file).generate().save(content)
+    content.seek(0)
+    return load_workbook(content)
+
+
+class StreamingGeneratorTests(TestCase):
+
+    def setUp(self):
+        FrontendTheme.objects.create(id=1)
+        level = ScoutOrgaLevel.objects.create(id=5, name='Stamm')
+        self.event = Event.objects.create(
+            name='Lager',
+            start_date=timezone.make_aware(datetime(2024, 7, 20, 12)),
+            end_date=timezone.make_aware(datetime(2024, 7, 23, 12))
+        )
+        option = BookingOption.objects.create(name='Voll', price=10, event=self.event)
+        zip_code = ZipCode.objects.create(zip_code='01067', city='Dresden', state='SN')
+        for name, count in [('Adler', 13), ('Biber', 10)]:
+            registration = Registration.objects.create(
+                event=self.event, scout_organisation=ScoutHierarchy.objects.create(name=name, level=level))
+            for index in range(count):
+                RegistrationParticipant.objects.create(
+                    registration=registration, first_name=f'{name} {index}', last_name=f'{name}{index:02}',
+                    birthday=timezone.make_aware(datetime(2012, 1, 1)), booking_option=option,
+                    zip_code=zip_code, address='Weg 1', gender='F')
+
+    def test_participant_list(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.merge_cells('C1:F1')
+        sheet['A3'], sheet['B3'] = 'Vorname', 'Nachname'
+        sheet['A3'].font = Font(bold=True)
+        for column in 'CDEFGHIJ':
+            sheet[f'{column}3'] = column
+        sheet.add_table(Table(displayName='Teilnehmer', ref='A3:J4'))
+
+        with self.assertNumQueries(2):
+            result = generate(ParticipantGenerator, self.event, workbook).active
+
+        self.assertEqual(result['C1'].value, 'Lager \n')
+        self.assertEqual(result['J1'].value, 23)
+        self.assertEqual(result['A3'].value, 'Vorname')
+        self.assertTrue(result['A3'].font.b)
+        self.assertEqual([result[f'{column}4'].value for column in 'ABDEH'], ['Adler 0', 'Adler00', 12, 'F', 'Adler'])
+        self.assertEqual(result['J26'].value, '01067 Dresden')
+        self.assertEqual(result['A4'].style, 'participant')
+        self.assertEqual(result.tables['Teilnehmer'].ref, 'A3:J26')
+        self.assertIn('C1:F1', result.merged_cells)
+
+    def test_kjr_list(self):
+        workbook = Workbook()
+        workbook.active['C4'] = 'Nr'
+
+        result = generate(KjrGenerator, self.event, workbook).active
+        self.assertEqual(result['G1'].value, 'Lager')
+        self.assertEqual((result['C5'].value, result['D5'].value, result['F5'].value), (0, 'Adler 0 Adler00', 'Weg 1, 01067 Dresden'))
+        self.assertEqual([result[f'{column}5'].value for column in 'GHIJK'], ['/', '/', '/', '/', None])
+        self.assertEqual((result['C5'].style, result['U27'].style), ('kjr_index', 'kjr'))
+
+    def test_kjp_pages(self):
+        workbook = Workbook()
+        form = workbook.active
+        form.title = 'Vorlage'
+        form.merge_cells('C19:O20')
+        form['A18'] = 'Nr.'
+        form.column_dimensions['C'].width = 40
+
+        with self.assertNumQueries(1):
+            result = generate(KjpGeneratorV3, self.event, workbook)
+
+        self.assertEqual(result.sheetnames, ['Blatt 1', 'Blatt 2', 'Blatt 3'])
+        last = result['Blatt 3']
+        self.assertEqual((last['AP3'].value, last['AR3'].value, last['R11'].value), (3, 3, 'Lager'))
+        self.assertEqual((last['A19'].value, last['A23'].value, last['A25'].value), (21, 23, None))
+        self.assertEqual(result['Blatt 1']['C19'].value, 'Adler 0 Adler00\nWeg 1, 01067 Dresden')
+        self.assertEqual(result['Blatt 1']['R19'].value, 'SN')
+        self.assertEqual(last['A18'].value, 'Nr.')
+        self.assertEqual(last.column_dimensions['C'].width, 40)
+        self.assertIn('C19:O20', last.merged_cells)
+
+
+@patch('anmelde_tool.event.file_generator.signals.generate_file.delay')
+class GeneratedFileReuseTests(TestCase):
+
+    def setUp(self):
+        FrontendTheme.objects.create(id=1)
+        ScoutOrgaLevel.objects.create(id=5, name='Stamm')
+        self.event = Event.objects.create(name='Lager')
+        self.participant = RegistrationParticipant.objects.create(
+            registration=Registration.objects.create(event=self.event), first_name='Anna', last_name='Berg')
+        self.template = FileTemplate.objects.create(file='participants.xlsx', type=FileType.ParticipantList)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='foo'))
+        self.url = f'/event/event/{self.event.id}/files/generate/'
+
+    def generated_file(self) -> GeneratedFiles:
+        generated_file = GeneratedFiles(event=self.event, template=self.template, file='generate-files/list.xlsx',
+                                        status=FileGenerationStatus.FinishedSuccessfully)
+        generated_file.fingerprint = get_fingerprint(generated_file, ParticipantGenerator)
+        generated_file.save()
+        return generated_file
+
+    def stale(self) -> list:
+        serializer = GeneratedFilesGetSerializer(context={})
+        return [serializer.get_stale(file) for file in GeneratedFiles.objects.order_by('-created_at')]
+
+    def test_unchanged_inputs_reuse_file(self, delay):
+        cached = self.generated_file()
+        delay.reset_mock()
+
+        response = self.client.post(self.url, {'template': str(self.template.id)}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        delay.assert_not_called()
+        reused = GeneratedFiles.objects.exclude(pk=cached.pk).get()
+        self.assertEqual(reused.file.name, cached.file.name)
+        self.assertEqual(reused.fingerprint, cached.fingerprint)
+        self.assertEqual(reused.status, FileGenerationStatus.FinishedSuccessfully)
+
+        self.assertEqual(self.stale(), [False, False])
+
+        # the shared file stays in the storage
+        with patch('django.db.models.fields.files.FieldFile.delete') as delete:
+            reused.delete()
+        delete.assert_not_called()
+
+    def test_fingerprint_covers_printed_relations(self, delay):
+        cached = self.generated_file()
+        user = get_user_model().objects.create_user(username='leitung', email='leitung@example.com')
+        self.participant.registration.responsible_persons.add(user)
+        self.assertEqual(self.stale(), [True])
+
+        cached.fingerprint = get_fingerprint(cached, ParticipantGenerator)
+        cached.save()
+        self.template.file = 'participants_v2.xlsx'
+        with patch('django.db.models.fields.files.FieldFile.delete'):
+            self.template.save()
+        self.assertEqual(self.stale(), [True])
+
+    def test_changed_participant_generates_file(self, delay):
+        self.generated_file()
+        self.participant.first_name = 'Anne'
+        self.participant.save()
+        delay.reset_mock()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {'template': str(self.template.id)}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        delay.assert_called_once()
+        self.assertEqual(GeneratedFiles.objects.filter(file='generate-files/list.xlsx').count(), 1)
+
+        self.assertEqual(self.stale(), [None, True])
+
+
+class CancelledGenerator(AbstractGenerator):
+    cacheable = False
+    progress_step = 10
+
+    def generate(self) -> Workbook:
+        for index in self.track(range(100), 100):
+            if index == 25:
+                GeneratedFiles.objects.filter(pk=self.generated_file.pk).update(cancel_requested=True)
+        return Workbook()
+
+
+@patch('anmelde_tool.event.file_generator.signals.generate_file.delay')
+class GeneratedFileJobTests(TestCase):
+
+    def setUp(self):
+        FrontendTheme.objects.create(id=1)
+        ScoutOrgaLevel.objects.create(id=5, name='Stamm')
+        self.event = Event.objects.create(name='Lager')
+        self.template = FileTemplate.objects.create(file='participants.xlsx', type=FileType.ParticipantList)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='foo'))
+        self.url = f'/event/event/{self.event.id}/files/generate/'
+
+    def test_double_request_follows_running_generation(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.post(self.url, {'template': str(self.template.id)}, format='json')
+            second = self.client.post(self.url, {'template': str(self.template.id)}, format='json')
+        self.assertEqual(first.status_code, 201, first.data)
+        self.assertEqual(second.status_code, 200, second.data)
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(GeneratedFiles.objects.count(), 1)
+        delay.assert_called_once()
+
+    def test_dead_generation_is_not_followed(self, delay):
+        dead = GeneratedFiles.objects.create(event=self.event, template=self.template)
+        GeneratedFiles.objects.filter(pk=dead.pk).update(
+            status=FileGenerationStatus.Processing, updated_at=timezone.now() - timedelta(hours=1))
+
+        response = self.client.post(self.url, {'template': str(self.template.id)}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertNotEqual(response.data['id'], str(dead.id))
+        dead.refresh_from_db()
+        self.assertEqual(dead.status, FileGenerationStatus.FinishedFailed)
+
+    def test_progress_and_cancel_queued_file(self, delay):
+        generated_file = GeneratedFiles.objects.create(event=self.event, template=self.template)
+
+        response = self.client.get(f'{self.url}{generated_file.id}/progress/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['status'], response.data['progress']), (FileGenerationStatus.Queued, 0))
+
+        response = self.client.post(f'{self.url}{generated_file.id}/cancel/')
+        self.assertEqual(response.data['status'], FileGenerationStatus.Cancelled)
+        self.assertFalse(generate_file(generated_file.id))
+
+    @patch('anmelde_tool.event.file_generator.file_generators.get_generator_class', return_value=CancelledGenerator)
+    def test_running_generation_stops_at_progress_update(self, get_generator_class, delay):
+        generated_file = GeneratedFiles.objects.create(event=self.event, template=self.template)
+        generator = CancelledGenerator(generated_file)
+        tracked = generator.track(range(100), 100)
+        for _ in range(21):
+            next(tracked)
+        generated_file.refresh_from_db()
+        self.assertEqual(generated_file.progress, 20)
+
+        self.assertTrue(generate_file(generated_file.id))
+        generated_file.refresh_from_db()
+        self.assertEqual(generated_file.status, FileGenerationStatus.Cancelled)
+        self.assertEqual(generated_file.progress, 30)
 
-# Create your tests here.
+        with self.assertRaises(GenerationCancelled):
+            list(tracked)
@@ -1,10 +1,17 @@
+from django.db import transaction
 from django.db.models import QuerySet
-from rest_framework import mixins, viewsets
+from django.shortcuts import get_object_or_404
+from rest_framework import mixins, viewsets, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
+from anmelde_tool.event.choices.choices import FileGenerationStatus, FileExtension
+from anmelde_tool.event.file_generator.file_generators import expire_dead_generations
 from anmelde_tool.event.file_generator.models import GeneratedFiles, FileTemplate
 from anmelde_tool.event.file_generator.serializers import GeneratedFilesGetSerializer, GeneratedFilesPostSerializer, \
-    FileTemplateSerializer
+    FileTemplateSerializer, GeneratedFilesProgressSerializer
+from anmelde_tool.event.models import Event
 from anmelde_tool.event.permissions import IsSubEventResponsiblePerson
 
 
@@ -15,16 +22,64 @@ class GenerateFilesViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, views
     def create(self, request, *args, **kwargs):
         request.data['event'] = kwargs.get("event_pk", None)
         request.data['user'] = request.user.id
-        queryset = self.get_queryset()
-        if queryset.count() > 10:
-            queryset.last().delete()
-        return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            # serializes concurrent requests for the same event, a double click must not start a second generation
+            get_object_or_404(Event.objects.select_for_update(), pk=serializer.validated_data['event'].pk)
+            expire_dead_generations(GeneratedFiles.objects.filter(event=serializer.validated_data['event']))
+            running = GeneratedFiles.objects.filter(
+                event=serializer.validated_data['event'],
+                template=serializer.validated_data.get('template'),
+                extension=serializer.validated_data.get('extension', FileExtension.Excel),
+                bund=serializer.validated_data.get('bund'),
+                status__in=(FileGenerationStatus.Queued, FileGenerationStatus.Processing),
+                cancel_requested=False
+            ).first()
+            if running:
+                return Response(self.get_serializer(running).data, status=status.HTTP_200_OK)
+
+            queryset = self.get_queryset()
+            if queryset.count() > 10:
+                queryset.last().delete()
+            self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def get_progress_object(self) -> GeneratedFiles:
+        queryset = GeneratedFiles.objects.filter(event=self.kwargs.get("event_pk", None))
+        expire_dead_generations(queryset.filter(pk=self.kwargs.get("pk", None)))
+        queryset = queryset.only(*GeneratedFilesProgressSerializer.Meta.fields)
+        return get_object_or_404(queryset, pk=self.kwargs.get("pk", None))
+
+    @action(detail=True, methods=["get"])
+    def progress(self, request, *args, **kwargs) -> Response:
+        """
+        Status and progress of a generated file for polling, neither the file nor its relations are loaded.
+        """
+        serializer = GeneratedFilesProgressSerializer(self.get_progress_object())
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["post"])
+    def cancel(self, request, *args, **kwargs) -> Response:
+        """
+        Queued files are cancelled right away, running generations stop at their next progress update
+        and dead ones are cancelled as well.
+        """
+        generated_file = self.get_progress_object()
+        files = GeneratedFiles.objects.filter(pk=generated_file.pk)
+        files.filter(status=FileGenerationStatus.Queued).update(
+            status=FileGenerationStatus.Cancelled, cancel_requested=True)
+        files.filter(status=FileGenerationStatus.Processing).update(cancel_requested=True)
+        expire_dead_generations(files)
+        serializer = GeneratedFilesProgressSerializer(self.get_progress_object())
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
     def get_queryset(self) -> QuerySet[GeneratedFiles]:
         event_id = self.kwargs.get("event_pk", None)
         file_type = self.request.query_params.getlist('file-type')
         status = self.request.query_params.getlist('status')
-        generated = GeneratedFiles.objects.filter(event=event_id)
+        generated = GeneratedFiles.objects.filter(event=event_id).select_related('event', 'template')
         if file_type:
             generated = generated.filter(template__in=file_type)
         if status:
@@ -32,7 +87,9 @@ class GenerateFilesViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, views
         return generated.order_by('-created_at', '-updated_at')
 
     def get_serializer_class(self, *args, **kwargs):
-        if self.request.method == 'POST':
+        if self.action in ('progress', 'cancel'):
+            return GeneratedFilesProgressSerializer
+        elif self.request.method == 'POST':
             return GeneratedFilesPostSerializer
         else:
             return GeneratedFilesGetSerializer
@@ -1,10 +1,10 @@
 from __future__ import annotations  # we use a python 3.10 Feature in line 14
 
-from datetime import datetime
+from collections import Counter, defaultdict
+from datetime import date
 import uuid
-import pytz
 from django.contrib.auth import get_user_model
-from django.db.models import QuerySet, Q
+from django.db.models import QuerySet, Count
 
 from anmelde_tool.event.api_exceptions import NoUUID
 from anmelde_tool.registration.models import Registration, RegistrationParticipant
@@ -28,13 +28,9 @@ def get_bund_or_ring(obj: basic_models.ScoutHierarchy, get_bund = True) -> [basi
     level_id = 3
     if not get_bund:
         level_id = 4
-    iterator: basic_models.ScoutHierarchy = obj
-    while iterator is not None:
-        if iterator.level.id == level_id:
-            return iterator
-        iterator = iterator.parent
-
-    return None
+    if obj is None:
+        return None
+    return obj.get_ancestor(level_id=level_id)
 
 
 def filter_registration_by_leadership(request, event_id: str, registrations: QuerySet[Registration]) \
@@ -53,10 +49,7 @@ def filter_registration_by_leadership(request, event_id: str, registrations: Que
             return Registration.objects.none()
 
         registrations = registrations.filter(
-            Q(scout_organisation=scout_orga)
-            | Q(scout_organisation__parent=scout_orga)
-            | Q(scout_organisation__parent__parent=scout_orga)
-            | Q(scout_organisation__parent__parent__parent=scout_orga))
+            basic_models.ScoutHierarchy.subtree_filter([scout_orga], 'scout_organisation__'))
     return registrations
 
 
@@ -101,32 +94,86 @@ def to_snake_case(ordering, order_desc, ordering_fields, default_case: str = 'cr
     return camel_case
 
 
+class ParticipantStatistics:
+    """
+    Counts participants grouped by birth date, gender and leader type with a single grouped query.
+    Every age group, gender and leader figure of the summary endpoints is then derived from this
+    in-memory histogram instead of running one COUNT(*) per figure.
+    """
+
+    def __init__(self, participants: QuerySet[RegistrationParticipant], event: event_models.Event = None):
+        self.event = event
+        self.histogram: Counter = Counter()
+        rows = participants \
+            .order_by() \
+            .values('birthday__date', 'gender', 'leader') \
+            .annotate(count=Count('id'))
+        for row in rows:
+            self.histogram[(row['birthday__date'], row['gender'], row['leader'])] += row['count']
+
+    def _birthday_range(self, min_age, max_age) -> tuple[date, date]:
+        time = self.event.start_date
+        return date(time.year - max_age, time.month, time.day), date(time.year - min_age, time.month, time.day)
+
+    def age_range(self, min_age, max_age, gender: str = None, leader: bool = None) -> int:
+        """
+        Number of participants born between the event start minus max_age and min_age years (both inclusive).
+        leader=True only counts participants with a leader role, leader=False only those without one.
+        """
+        min_date, max_date = self._birthday_range(min_age, max_age)
+        total = 0
+        for (birthday, participant_gender, leader_type), count in self.histogram.items():
+            if birthday is None or not min_date <= birthday <= max_date:
+                continue
+            if gender is not None and participant_gender != gender:
+                continue
+            if leader is not None and (leader_type != 'N') != leader:
+                continue
+            total += count
+        return total
+
+    def leader_type(self, leader_type: str) -> int:
+        return sum(count for (_, _, leader), count in self.histogram.items() if leader == leader_type)
+
+
+def get_eat_habit_summary(participants: QuerySet[RegistrationParticipant]) -> list[dict]:
+    """
+    Histogram of the eat habit combinations of the given participants, most frequent first.
+    Reads the eat habit through table once instead of querying the M2M relation per participant.
+    """
+    habits_by_participant = defaultdict(list)
+    rows = RegistrationParticipant.eat_habit.through.objects \
+        .filter(registrationparticipant__in=participants.values('id')) \
+        .order_by('registrationparticipant_id', 'eathabit_id') \
+        .values_list('registrationparticipant_id', 'eathabit_id')
+    for participant_id, eat_habit_id in rows:
+        habits_by_participant[participant_id].append(eat_habit_id)
+
+    combinations = Counter(tuple(habit_ids) for habit_ids in habits_by_participant.values())
+    without_eat_habit = participants.count() - len(habits_by_participant)
+    if without_eat_habit > 0:
+        combinations[()] += without_eat_habit
+
+    habit_ids = {habit_id for combination in combinations for habit_id in combination}
+    names = dict(basic_models.EatHabit.objects.filter(id__in=habit_ids).values_list('id', 'name'))
+
+    return [
+        {
+            'sum': count,
+            'food': ', '.join(names[habit_id] for habit_id in combination) or 'Normal',
+        }
+        for combination, count in combinations.most_common()
+    ]
+
+
 def age_range(min_age, max_age, participants: QuerySet[RegistrationParticipant],
               event: event_models.Event) -> int:
-    time = event.start_date
-    max_date = datetime(time.year - min_age, time.month, time.day,
-                        tzinfo=pytz.timezone('Europe/Berlin'))
-    min_date = datetime(time.year - max_age, time.month, time.day,
-                        tzinfo=pytz.timezone('Europe/Berlin'))
-
-    return participants.filter(birthday__date__range=[min_date, max_date]).count()
+    return ParticipantStatistics(participants, event).age_range(min_age, max_age)
 
 
 def get_count_by_age_gender_leader(min_age, max_age, gender, leader, participants: QuerySet[RegistrationParticipant],
               event: event_models.Event) -> int:
-    time = event.start_date
-    max_date = datetime(time.year - min_age, time.month, time.day,
-                        tzinfo=pytz.timezone('Europe/Berlin'))
-    min_date = datetime(time.year - max_age, time.month, time.day,
-                        tzinfo=pytz.timezone('Europe/Berlin'))
-
-    participants = participants.filter(birthday__date__range=[min_date, max_date]).filter(gender=gender)
-    if leader == True:
-        participants = participants.exclude(leader="N")
-    else:
-        participants = participants.filter(leader="N")
-
-    return participants.count()
+    return ParticipantStatistics(participants, event).age_range(min_age, max_age, gender, leader)
 
 
 def filter_registrations_by_query_params(request,
@@ -136,23 +183,10 @@ def filter_registrations_by_query_params(request,
     stamm_list = request.query_params.getlist('stamm')
     ring_list = request.query_params.getlist('ring')
     bund_list = request.query_params.getlist('bund')
-    if stamm_list:
-        registrations = registrations.filter(
-            Q(scout_organisation__id__in=stamm_list, scout_organisation__level__id=5) |
-            Q(scout_organisation__parent__id__in=stamm_list, scout_organisation__parent__level__id=5))
-    if ring_list:
-        registrations = registrations.filter(
-            Q(scout_organisation__id__in=ring_list, scout_organisation__level__id=4) |
-            Q(scout_organisation__parent__id__in=ring_list, scout_organisation__parent__level__id=4) |
-            Q(scout_organisation__parent__parent__id__in=ring_list,
-              scout_organisation__parent__parent__level__id=4))
-    if bund_list:
-        registrations = registrations.filter(
-            Q(scout_organisation__id__in=bund_list, scout_organisation__level__id=3) |
-            Q(scout_organisation__parent__id__in=bund_list, scout_organisation__parent__level__id=3) |
-            Q(scout_organisation__parent__parent__id__in=bund_list,
-              scout_organisation__parent__parent__level__id=3) |
-            Q(scout_organisation__parent__parent__parent__id__in=bund_list,
-              scout_organisation__parent__parent__parent__level__id=3))
+    for id_list, level_id in [(stamm_list, 5), (ring_list, 4), (bund_list, 3)]:
+        if id_list:
+            organisations = basic_models.ScoutHierarchy.objects.filter(id__in=id_list, level__id=level_id)
+            registrations = registrations.filter(
+                basic_models.ScoutHierarchy.subtree_filter(organisations, 'scout_organisation__'))
     registrations = filter_registration_by_leadership(request, event_id, registrations)
     return registrations
@@ -10,7 +10,7 @@ from anmelde_tool.event.api_exceptions import RequiredGroupNotFound
 from anmelde_tool.event.helper import get_event, get_registration, custom_get_or_404
 from anmelde_tool.event.models import Event
 from anmelde_tool.registration.models import Registration
-from keycloak_auth.helper import get_groups_of_user
+from keycloak_auth.helper import get_groups_of_request_user
 
 CREATE_METHOD = 'POST'
 UPDATE_METHODS = ('UPDATE', 'PATCH')
@@ -43,8 +43,7 @@ def check_event_permission(event_id: [str, Event], request, admin_only=False) ->
     if user.is_superuser:
         return EventRole.ADMIN_ROLE
     event = get_event(event_id)
-    token = request.META.get('HTTP_AUTHORIZATION')
-    child_ids = get_groups_of_user(token, user.keycloak_id)
+    child_ids = get_groups_of_request_user(request)
     if not admin_only and event.view_group and any(event.view_group.keycloak_id == child_id for child_id in child_ids):
         return EventRole.VIEW_ROLE
     if event.admin_group and any(event.admin_group.keycloak_id == child_id for child_id in child_ids):
@@ -1,6 +1,6 @@
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth import get_user_model
-from django.db.models import Sum, Count, F, QuerySet, Q
+from django.db.models import Sum, Count, F, Manager, QuerySet
 from django.utils import timezone
 from rest_framework import serializers
 import uuid
@@ -21,13 +21,14 @@ from authentication import serializers as auth_serializers
 from anmelde_tool.event import serializers as event_serializer
 from anmelde_tool.event import permissions as event_permissions
 from anmelde_tool.event.cash import serializers as cash_serializers
+from anmelde_tool.event.cash.helper import get_booking_option_summary, get_payment_ref_id
 from anmelde_tool.event.helper import get_bund_or_ring
 from anmelde_tool.registration import serializers as registration_serializers
 from anmelde_tool.registration.models import Registration, RegistrationParticipant
 from anmelde_tool.registration.serializers import RegistrationGetSerializer
 from anmelde_tool.workshop.models import Workshop
 from basic import serializers as basic_serializers
-from basic.models import EatHabit
+from basic.models import EatHabit, ScoutHierarchy
 
 User = get_user_model()
 
@@ -221,7 +222,24 @@ class RegistrationAttributeGetSerializer(serializers.ModelSerializer):
         fields = ("scout_organisation", "is_confirmed", "responsible_persons")
 
 
+class RegistrationCashSummaryListSerializer(serializers.ListSerializer):
+    """
+    Loads the booking options of all registrations of the list with one grouped query.
+    """
+
+    def to_representation(self, data):
+        registrations = list(data.all() if isinstance(data, Manager) else data)
+        self.child.context["booking_options"] = get_booking_option_summary(
+            [registration.id for registration in registrations]
+        )
+        return super().to_representation(registrations)
+
+
 class RegistrationCashSummarySerializer(serializers.ModelSerializer):
+    """
+    Uses the figures of annotate_payment if the registration was loaded with them.
+    """
+
     responsible_persons = registration_serializers.CurrentUserSerializer(
         many=True, read_only=True
     )
@@ -238,6 +256,7 @@ class RegistrationCashSummarySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Registration
+        list_serializer_class = RegistrationCashSummaryListSerializer
         fields = (
             "id",
             "is_confirmed",
@@ -253,9 +272,17 @@ class RegistrationCashSummarySerializer(serializers.ModelSerializer):
         )
 
     def get_participant_count(self, registration: Registration) -> int:
+        if hasattr(registration, "participant_count"):
+            return registration.participant_count
         return registration.registrationparticipant_set.count()
 
     def get_payment(self, registration: Registration) -> dict:
+        if hasattr(registration, "open"):
+            return {
+                "price": registration.price,
+                "paid": registration.paid,
+                "open": registration.open,
+            }
         total_price = (
             registration.registrationparticipant_set.aggregate(
                 sum=Sum("booking_option__price")
@@ -272,6 +299,9 @@ class RegistrationCashSummarySerializer(serializers.ModelSerializer):
         }
 
     def get_booking_options(self, registration: Registration) -> dict:
+        booking_options = self.context.get("booking_options")
+        if booking_options is not None:
+            return booking_options.get(registration.id, [])
         return (
             registration.registrationparticipant_set.values(
                 booking_options=F("booking_option__name")
@@ -281,11 +311,7 @@ class RegistrationCashSummarySerializer(serializers.ModelSerializer):
         )
 
     def get_ref_id(self, registration: Registration) -> str:
-        return (
-            f'{registration.event.name.replace(" ", "")[:10]}'
-            f'-{registration.scout_organisation.name.replace(" ", "")[:10]}'
-            f"-{str(registration.created_at.timestamp())[:10]}"
-        )
+        return get_payment_ref_id(registration)
 
 
 class CashSummarySerializer(serializers.ModelSerializer):
@@ -391,10 +417,7 @@ class AttributeSummarySerializer(serializers.ModelSerializer):
                 return BooleanAttribute.objects.none()
 
             attributes = attributes.filter(
-                Q(registration__scout_organisation=scout_orga)
-                | Q(registration__scout_organisation__parent=scout_orga)
-                | Q(registration__scout_organisation__parent__parent=scout_orga)
-                | Q(registration__scout_organisation__parent__parent__parent=scout_orga)
+                ScoutHierarchy.subtree_filter([scout_orga], "registration__scout_organisation__")
             )
         return attributes
 
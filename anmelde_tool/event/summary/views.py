@@ -22,14 +22,16 @@ from anmelde_tool.attributes.models import (
 )
 from anmelde_tool.event import models as event_models
 from anmelde_tool.event import permissions as event_permissions
+from anmelde_tool.event.cash.helper import annotate_payment
+from anmelde_tool.event.cash.models import CashIncome
 from anmelde_tool.event.helper import (
     filter_registration_by_leadership,
     get_bund_or_ring,
     to_snake_case,
     get_event,
-    age_range,
     filter_registrations_by_query_params,
-    get_count_by_age_gender_leader,
+    get_eat_habit_summary,
+    ParticipantStatistics,
 )
 from anmelde_tool.event.models import EventModule
 from anmelde_tool.event.summary import serializers as summary_serializers
@@ -70,13 +72,10 @@ class WorkshopEventSummaryViewSet(mixins.ListModelMixin, viewsets.GenericViewSet
                 self.request.user.userextended.scout_organisation,
                 leader_ship == event_permissions.LeadershipRole.BUND_LEADER,
             )
+            if not orga:
+                return event_models.Workshop.objects.none()
             workshops = workshops.filter(
-                Q(registration__scout_organisation__parent=orga)
-                | Q(registration__scout_organisation__parent__parent=orga)
-                | Q(registration__scout_organisation__parent__parent__parent=orga)
-                | Q(
-                    registration__scout_organisation__parent__parent__parent__parent=orga
-                )
+                ScoutHierarchy.subtree_filter([orga], "registration__scout_organisation__")
             )
         return workshops
 
@@ -143,11 +142,9 @@ class EventSummaryViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         )
         if scout_organisation_list:
             registrations = registrations.filter(
-                Q(scout_organisation__id__in=scout_organisation_list)
-                | Q(scout_organisation__parent__id__in=scout_organisation_list)
-                | Q(scout_organisation__parent__parent__id__in=scout_organisation_list)
-                | Q(
-                    scout_organisation__parent__parent__parent__id__in=scout_organisation_list
+                ScoutHierarchy.subtree_filter(
+                    ScoutHierarchy.objects.filter(id__in=scout_organisation_list),
+                    "scout_organisation__",
                 )
             )
 
@@ -227,11 +224,9 @@ class EventDetailedSummaryViewSet(mixins.ListModelMixin, viewsets.GenericViewSet
         )
         if scout_organisation_list:
             regs = registrations.filter(
-                Q(scout_organisation__id__in=scout_organisation_list)
-                | Q(scout_organisation__parent__id__in=scout_organisation_list)
-                | Q(scout_organisation__parent__parent__id__in=scout_organisation_list)
-                | Q(
-                    scout_organisation__parent__parent__parent__id__in=scout_organisation_list
+                ScoutHierarchy.subtree_filter(
+                    ScoutHierarchy.objects.filter(id__in=scout_organisation_list),
+                    "scout_organisation__",
                 )
             )
             participants = participants.filter(registration__in=regs)
@@ -274,40 +269,19 @@ class EventFoodSummaryViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     def list(self, request, *args, **kwargs) -> Response:
         participants: QuerySet[RegistrationParticipant] = self.get_queryset()
 
-        eat_habits_sum = {}
-        eat_habits = {}
-        for participant in participants.all():
-            key = tuple(participant.eat_habit.values_list("id", flat=True))
-            if key in eat_habits_sum:
-                eat_habits_sum[key] += 1
-            else:
-                eat_habits_sum[key] = 1
-                eat_habits[key] = participant.eat_habit.all()
-
-        formatted_eat_habits = []
-        for key in eat_habits:
-            food = ", ".join(eat_habits[key].values_list("name", flat=True))
-            if food is None or food == "":
-                food = "Normal"
-            result = {
-                "sum": eat_habits_sum[key],
-                "food": food,
-            }
-            formatted_eat_habits.append(result)
-
-        norm_persons_low = 0
-        norm_persons_high = 0
-        norm_person_count = 0
-        for participant in participants.all():
-
-            age = relativedelta(timezone.now(), participant.birthday).years
-            norm_persons_low += NormPerson().get_norm_person(
-                participant.gender, age, 1.3
-            )
-            norm_persons_high += NormPerson().get_norm_person(
-                participant.gender, age, 1.7
-            )
-            norm_person_count += 1
+        formatted_eat_habits = get_eat_habit_summary(participants)
+
+        now = timezone.now()
+        genders = []
+        ages = []
+        for gender, birthday in participants.values_list("gender", "birthday"):
+            genders.append(gender)
+            ages.append(relativedelta(now, birthday).years)
+
+        norm_person = NormPerson()
+        norm_persons_low = norm_person.get_norm_person_sum(genders, ages, 1.3)
+        norm_persons_high = norm_person.get_norm_person_sum(genders, ages, 1.7)
+        norm_person_count = len(genders)
 
         result = {
             "eat_habits": formatted_eat_habits,
@@ -347,13 +321,13 @@ class EventFoodSummaryViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
 
 class EventLeaderTypesSummaryViewSet(EventFoodSummaryViewSet):
     def list(self, request, *args, **kwargs) -> Response:
-        all_participants: QuerySet[RegistrationParticipant] = self.get_queryset()
+        statistics = ParticipantStatistics(self.get_queryset())
 
-        n = self.get_leder_type_count("N", all_participants)
-        staFue = self.get_leder_type_count("StaFue", all_participants)
-        siFue = self.get_leder_type_count("SiFue", all_participants)
-        roFue = self.get_leder_type_count("RoFue", all_participants)
-        meuFue = self.get_leder_type_count("MeuFue", all_participants)
+        n = statistics.leader_type("N")
+        staFue = statistics.leader_type("StaFue")
+        siFue = statistics.leader_type("SiFue")
+        roFue = statistics.leader_type("RoFue")
+        meuFue = statistics.leader_type("MeuFue")
 
         result = {
             "n": n,
@@ -365,11 +339,6 @@ class EventLeaderTypesSummaryViewSet(EventFoodSummaryViewSet):
 
         return Response(result, status=status.HTTP_200_OK)
 
-    def get_leder_type_count(
-        self, leader_type, participants: QuerySet[RegistrationParticipant]
-    ):
-        return participants.filter(leader=leader_type).count()
-
 
 class EventAgeGroupsSummaryViewSet(EventFoodSummaryViewSet):
     def list(self, request, *args, **kwargs) -> Response:
@@ -387,10 +356,11 @@ class EventAgeGroupsSummaryViewSet(EventFoodSummaryViewSet):
         if registration:
             all_participants = all_participants.filter(registration=registration)
 
-        woelfling = age_range(0, 11, all_participants, event)
-        pfadfinder = age_range(11, 16, all_participants, event)
-        rover = age_range(16, 25, all_participants, event)
-        alt_rover = age_range(25, 999, all_participants, event)
+        statistics = ParticipantStatistics(all_participants, event)
+        woelfling = statistics.age_range(0, 11)
+        pfadfinder = statistics.age_range(11, 16)
+        rover = statistics.age_range(16, 25)
+        alt_rover = statistics.age_range(25, 999)
 
         result = {
             "woelfling": woelfling,
@@ -412,171 +382,63 @@ class EventAgeGroupsSummaryDetailViewSet(EventFoodSummaryViewSet):
         """
         event_id = self.kwargs.get("event_pk", None)
         event = get_event(event_id)
-        all_participants: QuerySet[RegistrationParticipant] = self.get_queryset()
+        statistics = ParticipantStatistics(self.get_queryset(), event)
 
         result = {
-            "p_6-_m_no": get_count_by_age_gender_leader(
-                0, 7, "M", False, all_participants, event
-            ),
-            "p_07_m_no": get_count_by_age_gender_leader(
-                7, 8, "M", False, all_participants, event
-            ),
-            "p_08_m_no": get_count_by_age_gender_leader(
-                8, 9, "M", False, all_participants, event
-            ),
-            "p_09_m_no": get_count_by_age_gender_leader(
-                9, 10, "M", False, all_participants, event
-            ),
-            "p_10_m_no": get_count_by_age_gender_leader(
-                10, 11, "M", False, all_participants, event
-            ),
-            "p_11_m_no": get_count_by_age_gender_leader(
-                11, 12, "M", False, all_participants, event
-            ),
-            "p_12_m_no": get_count_by_age_gender_leader(
-                12, 13, "M", False, all_participants, event
-            ),
-            "p_13_m_no": get_count_by_age_gender_leader(
-                13, 14, "M", False, all_participants, event
-            ),
-            "p_14_m_no": get_count_by_age_gender_leader(
-                14, 15, "M", False, all_participants, event
-            ),
-            "p_15_m_no": get_count_by_age_gender_leader(
-                15, 16, "M", False, all_participants, event
-            ),
-            "p_16_m_no": get_count_by_age_gender_leader(
-                16, 17, "M", False, all_participants, event
-            ),
-            "p_17_m_no": get_count_by_age_gender_leader(
-                17, 18, "M", False, all_participants, event
-            ),
-            "p_18_m_no": get_count_by_age_gender_leader(
-                18, 19, "M", False, all_participants, event
-            ),
-            "p_19_m_no": get_count_by_age_gender_leader(
-                19, 20, "M", False, all_participants, event
-            ),
-            "p_20_m_no": get_count_by_age_gender_leader(
-                20, 21, "M", False, all_participants, event
-            ),
-            "p_21_m_no": get_count_by_age_gender_leader(
-                21, 22, "M", False, all_participants, event
-            ),
-            "p_22_m_no": get_count_by_age_gender_leader(
-                22, 23, "M", False, all_participants, event
-            ),
-            "p_23_m_no": get_count_by_age_gender_leader(
-                23, 24, "M", False, all_participants, event
-            ),
-            "p_24_m_no": get_count_by_age_gender_leader(
-                24, 25, "M", False, all_participants, event
-            ),
-            "p_25_m_no": get_count_by_age_gender_leader(
-                25, 26, "M", False, all_participants, event
-            ),
-            "p_26_m_no": get_count_by_age_gender_leader(
-                26, 27, "M", False, all_participants, event
-            ),
-            "p_26+_m_no": get_count_by_age_gender_leader(
-                27, 100, "M", False, all_participants, event
-            ),
-            "p_6-_f_no": get_count_by_age_gender_leader(
-                0, 7, "F", False, all_participants, event
-            ),
-            "p_07_f_no": get_count_by_age_gender_leader(
-                7, 8, "F", False, all_participants, event
-            ),
-            "p_08_f_no": get_count_by_age_gender_leader(
-                8, 9, "F", False, all_participants, event
-            ),
-            "p_09_f_no": get_count_by_age_gender_leader(
-                9, 10, "F", False, all_participants, event
-            ),
-            "p_10_f_no": get_count_by_age_gender_leader(
-                10, 11, "F", False, all_participants, event
-            ),
-            "p_11_f_no": get_count_by_age_gender_leader(
-                11, 12, "F", False, all_participants, event
-            ),
-            "p_12_f_no": get_count_by_age_gender_leader(
-                12, 13, "F", False, all_participants, event
-            ),
-            "p_13_f_no": get_count_by_age_gender_leader(
-                13, 14, "F", False, all_participants, event
-            ),
-            "p_14_f_no": get_count_by_age_gender_leader(
-                14, 15, "F", False, all_participants, event
-            ),
-            "p_15_f_no": get_count_by_age_gender_leader(
-                15, 16, "F", False, all_participants, event
-            ),
-            "p_16_f_no": get_count_by_age_gender_leader(
-                16, 17, "F", False, all_participants, event
-            ),
-            "p_17_f_no": get_count_by_age_gender_leader(
-                17, 18, "F", False, all_participants, event
-            ),
-            "p_18_f_no": get_count_by_age_gender_leader(
-                18, 19, "F", False, all_participants, event
-            ),
-            "p_19_f_no": get_count_by_age_gender_leader(
-                19, 20, "F", False, all_participants, event
-            ),
-            "p_20_f_no": get_count_by_age_gender_leader(
-                20, 21, "F", False, all_participants, event
-            ),
-            "p_21_f_no": get_count_by_age_gender_leader(
-                21, 22, "F", False, all_participants, event
-            ),
-            "p_22_f_no": get_count_by_age_gender_leader(
-                22, 23, "F", False, all_participants, event
-            ),
-            "p_23_f_no": get_count_by_age_gender_leader(
-                23, 24, "F", False, all_participants, event
-            ),
-            "p_24_f_no": get_count_by_age_gender_leader(
-                24, 25, "F", False, all_participants, event
-            ),
-            "p_25_f_no": get_count_by_age_gender_leader(
-                25, 26, "F", False, all_participants, event
-            ),
-            "p_26_f_no": get_count_by_age_gender_leader(
-                26, 27, "F", False, all_participants, event
-            ),
-            "p_26+_f_no": get_count_by_age_gender_leader(
-                27, 1000, "F", False, all_participants, event
-            ),
-            "p_16-_m_yes": get_count_by_age_gender_leader(
-                1, 16, "M", True, all_participants, event
-            ),
-            "p_16-_f_yes": get_count_by_age_gender_leader(
-                1, 16, "F", True, all_participants, event
-            ),
-            "p_16-17_m_yes": get_count_by_age_gender_leader(
-                16, 17, "M", True, all_participants, event
-            ),
-            "p_16-17_f_yes": get_count_by_age_gender_leader(
-                16, 17, "F", True, all_participants, event
-            ),
-            "p_18-26_m_yes": get_count_by_age_gender_leader(
-                18, 26, "M", True, all_participants, event
-            ),
-            "p_18-26_f_yes": get_count_by_age_gender_leader(
-                18, 26, "F", True, all_participants, event
-            ),
-            "p_27-44_m_yes": get_count_by_age_gender_leader(
-                27, 44, "M", True, all_participants, event
-            ),
-            "p_27-44_f_yes": get_count_by_age_gender_leader(
-                27, 44, "F", True, all_participants, event
-            ),
-            "p_45+_m_yes": get_count_by_age_gender_leader(
-                45, 1000, "M", True, all_participants, event
-            ),
-            "p_45+_f_yes": get_count_by_age_gender_leader(
-                45, 1000, "F", True, all_participants, event
-            ),
+            "p_6-_m_no": statistics.age_range(0, 7, "M", False),
+            "p_07_m_no": statistics.age_range(7, 8, "M", False),
+            "p_08_m_no": statistics.age_range(8, 9, "M", False),
+            "p_09_m_no": statistics.age_range(9, 10, "M", False),
+            "p_10_m_no": statistics.age_range(10, 11, "M", False),
+            "p_11_m_no": statistics.age_range(11, 12, "M", False),
+            "p_12_m_no": statistics.age_range(12, 13, "M", False),
+            "p_13_m_no": statistics.age_range(13, 14, "M", False),
+            "p_14_m_no": statistics.age_range(14, 15, "M", False),
+            "p_15_m_no": statistics.age_range(15, 16, "M", False),
+            "p_16_m_no": statistics.age_range(16, 17, "M", False),
+            "p_17_m_no": statistics.age_range(17, 18, "M", False),
+            "p_18_m_no": statistics.age_range(18, 19, "M", False),
+            "p_19_m_no": statistics.age_range(19, 20, "M", False),
+            "p_20_m_no": statistics.age_range(20, 21, "M", False),
+            "p_21_m_no": statistics.age_range(21, 22, "M", False),
+            "p_22_m_no": statistics.age_range(22, 23, "M", False),
+            "p_23_m_no": statistics.age_range(23, 24, "M", False),
+            "p_24_m_no": statistics.age_range(24, 25, "M", False),
+            "p_25_m_no": statistics.age_range(25, 26, "M", False),
+            "p_26_m_no": statistics.age_range(26, 27, "M", False),
+            "p_26+_m_no": statistics.age_range(27, 100, "M", False),
+            "p_6-_f_no": statistics.age_range(0, 7, "F", False),
+            "p_07_f_no": statistics.age_range(7, 8, "F", False),
+            "p_08_f_no": statistics.age_range(8, 9, "F", False),
+            "p_09_f_no": statistics.age_range(9, 10, "F", False),
+            "p_10_f_no": statistics.age_range(10, 11, "F", False),
+            "p_11_f_no": statistics.age_range(11, 12, "F", False),
+            "p_12_f_no": statistics.age_range(12, 13, "F", False),
+            "p_13_f_no": statistics.age_range(13, 14, "F", False),
+            "p_14_f_no": statistics.age_range(14, 15, "F", False),
+            "p_15_f_no": statistics.age_range(15, 16, "F", False),
+            "p_16_f_no": statistics.age_range(16, 17, "F", False),
+            "p_17_f_no": statistics.age_range(17, 18, "F", False),
+            "p_18_f_no": statistics.age_range(18, 19, "F", False),
+            "p_19_f_no": statistics.age_range(19, 20, "F", False),
+            "p_20_f_no": statistics.age_range(20, 21, "F", False),
+            "p_21_f_no": statistics.age_range(21, 22, "F", False),
+            "p_22_f_no": statistics.age_range(22, 23, "F", False),
+            "p_23_f_no": statistics.age_range(23, 24, "F", False),
+            "p_24_f_no": statistics.age_range(24, 25, "F", False),
+            "p_25_f_no": statistics.age_range(25, 26, "F", False),
+            "p_26_f_no": statistics.age_range(26, 27, "F", False),
+            "p_26+_f_no": statistics.age_range(27, 1000, "F", False),
+            "p_16-_m_yes": statistics.age_range(1, 16, "M", True),
+            "p_16-_f_yes": statistics.age_range(1, 16, "F", True),
+            "p_16-17_m_yes": statistics.age_range(16, 17, "M", True),
+            "p_16-17_f_yes": statistics.age_range(16, 17, "F", True),
+            "p_18-26_m_yes": statistics.age_range(18, 26, "M", True),
+            "p_18-26_f_yes": statistics.age_range(18, 26, "F", True),
+            "p_27-44_m_yes": statistics.age_range(27, 44, "M", True),
+            "p_27-44_f_yes": statistics.age_range(27, 44, "F", True),
+            "p_45+_m_yes": statistics.age_range(45, 1000, "M", True),
+            "p_45+_f_yes": statistics.age_range(45, 1000, "F", True),
         }
 
         return Response(result, status=status.HTTP_200_OK)
@@ -586,11 +448,11 @@ class EventAlcoholAgeGroupsSummaryViewSet(EventFoodSummaryViewSet):
     def list(self, request, *args, **kwargs) -> Response:
         event_id = self.kwargs.get("event_pk", None)
         event = get_event(event_id)
-        all_participants: QuerySet[RegistrationParticipant] = self.get_queryset()
+        statistics = ParticipantStatistics(self.get_queryset(), event)
 
-        young = age_range(0, 16, all_participants, event)
-        teen = age_range(16, 18, all_participants, event)
-        adult = age_range(18, 999, all_participants, event)
+        young = statistics.age_range(0, 16)
+        teen = statistics.age_range(16, 18)
+        adult = statistics.age_range(18, 999)
 
         result = {"child": young, "teen": teen, "adult": adult}
 
@@ -629,30 +491,19 @@ class CashSummaryViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
 
 
 class CashSummaryListViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    pagination_class = LimitedResultsSetPagination
     permission_classes = [
         event_permissions.IsSubEventResponsiblePerson | event_permissions.IsLeaderPerson
     ]
     serializer_class = summary_serializers.RegistrationCashSummarySerializer
-
-    def list(self, request, *args, **kwargs) -> Response:
-        registrations: QuerySet[Registration] = self.get_queryset()
-        serializer = summary_serializers.RegistrationCashSummarySerializer(
-            registrations, many=True, read_only=True
-        )
-
-        returnData = []
-        paid = request.GET.get("paid", None)
-
-        if paid is not None:
-            for item in serializer.data:
-                if item["payment"].get("open") <= 0 and (paid == "true"):
-                    returnData.append(item)
-                if item["payment"].get("open") > 0 and (paid == "false"):
-                    returnData.append(item)
-        else:
-            returnData = serializer.data
-
-        return Response(returnData, status=status.HTTP_200_OK)
+    ordering_fields = (
+        "scout_organisation__name",
+        "created_at",
+        "participant_count",
+        "price",
+        "paid",
+        "open",
+    )
 
     def get_queryset(self) -> QuerySet[registration_models.Registration]:
         event_id = self.kwargs.get("event_pk", None)
@@ -668,11 +519,9 @@ class CashSummaryListViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
 
         if scout_organisation_list:
             registrations = registrations.filter(
-                Q(scout_organisation__id__in=scout_organisation_list)
-                | Q(scout_organisation__parent__id__in=scout_organisation_list)
-                | Q(scout_organisation__parent__parent__id__in=scout_organisation_list)
-                | Q(
-                    scout_organisation__parent__parent__parent__id__in=scout_organisation_list
+                ScoutHierarchy.subtree_filter(
+                    ScoutHierarchy.objects.filter(id__in=scout_organisation_list),
+                    "scout_organisation__",
                 )
             )
 
@@ -689,7 +538,30 @@ class CashSummaryListViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         registrations = filter_registration_by_leadership(
             request=self.request, event_id=event_id, registrations=registrations
         )
-        return registrations.order_by("scout_organisation__name")
+        registrations = annotate_payment(registrations)
+
+        paid = self.request.query_params.get("paid", None)
+        if paid == "true":
+            registrations = registrations.filter(open__lte=0)
+        elif paid == "false":
+            registrations = registrations.filter(open__gt=0)
+
+        ordering: str = self.request.query_params.get("ordering", None)
+        order_desc: bool = (
+            self.request.query_params.get("order-desc", "false") == "true"
+        )
+        camel_case = to_snake_case(
+            ordering, order_desc, self.ordering_fields, "scout_organisation__name"
+        )
+
+        return registrations \
+            .select_related("event", "scout_organisation__level", "scout_organisation__zip_code") \
+            .prefetch_related(
+                Prefetch("responsible_persons", queryset=User.objects.select_related("person")),
+                Prefetch("cashincome_set",
+                         queryset=CashIncome.objects.select_related("transfer_person__person")),
+            ) \
+            .order_by(camel_case, "id")
 
 
 class CashDetailViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
@@ -698,7 +570,7 @@ class CashDetailViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
 
     def get_queryset(self) -> QuerySet[registration_models.Registration]:
         registration_id = self.kwargs.get("registration_pk", None)
-        return registration_models.Registration.objects.filter(id=registration_id)
+        return annotate_payment(registration_models.Registration.objects.filter(id=registration_id))
 
 
 class EmailResponsiblePersonsViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
@@ -785,14 +657,13 @@ class RegistrationParentViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         registrations = filter_registration_by_leadership(
             self.request, event_id, registrations
         )
-        ids = registrations.values_list("scout_organisation__id", flat=True)
+        organisations = ScoutHierarchy.objects.filter(
+            id__in=registrations.values_list("scout_organisation__id", flat=True)
+        )
 
         return (
             ScoutHierarchy.objects.filter(
-                Q(id__in=ids)
-                | Q(parent__id__in=ids)
-                | Q(parent__parent__id__in=ids)
-                | Q(parent__parent__parent__id__in=ids),
+                ScoutHierarchy.subtree_filter(organisations),
                 level__id=level_id,
             )
             .distinct()
@@ -827,6 +698,8 @@ class MergeRegistrationsViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet
             # move all items from secondary to primary
             secondary_list = model.objects.filter(registration=reg_id_secondary)
             secondary_list.update(registration=reg_id_primary)
+        # queryset updates skip auto_now, the generated files have to notice the merge
+        reg_primary.save(update_fields=['updated_at'])
 
         # copy responsible persons from secondary to primary
         if data["copy_responsible_persons"]:
@@ -1,3 +1,219 @@
+import io
+import json
+import tempfile
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from anmelde_tool.event.helper import ParticipantStatistics, age_range, get_bund_or_ring, get_eat_habit_summary
+from anmelde_tool.event.cash.models import CashIncome
+from anmelde_tool.event.models import Event, BookingOption
+from anmelde_tool.registration.models import Registration, RegistrationParticipant
+from basic.helper.tree_snapshot import get_tree_snapshot
+from basic.models import ScoutOrgaLevel, FrontendTheme, EatHabit, ScoutHierarchy
+from basic.serializers import ScoutHierarchyDetailedSerializer
+
+
+class ParticipantStatisticsTests(TestCase):
+
+    def setUp(self):
+        ScoutOrgaLevel.objects.create(id=5, name='Stamm')
+        FrontendTheme.objects.create(id=1)
+        self.event = Event.objects.create(
+            name='Lager',
+            start_date=timezone.make_aware(datetime(2024, 7, 20, 12))
+        )
+        registration = Registration.objects.create(event=self.event)
+
+        def participant(year, month, day, gender, leader='N'):
+            RegistrationParticipant.objects.create(
+                registration=registration,
+                birthday=timezone.make_aware(datetime(year, month, day, 12)),
+                gender=gender,
+                leader=leader
+            )
+
+        participant(2015, 1, 1, 'M')
+        participant(2015, 3, 1, 'F')
+        participant(2013, 7, 20, 'F')
+        participant(2000, 1, 1, 'M', 'StaFue')
+        participant(1990, 1, 1, 'F', 'SiFue')
+        self.participants = RegistrationParticipant.objects.filter(registration__event=self.event)
+
+    def test_age_range_matches_single_count(self):
+        statistics = ParticipantStatistics(self.participants, self.event)
+        for min_age, max_age in [(0, 11), (11, 16), (16, 25), (25, 999), (9, 10), (0, 7)]:
+            self.assertEqual(statistics.age_range(min_age, max_age),
+                             self.participants.filter(
+                                 birthday__date__range=[
+                                     datetime(2024 - max_age, 7, 20).date(),
+                                     datetime(2024 - min_age, 7, 20).date()
+                                 ]).count())
+
+    def test_age_range_boundaries_are_inclusive(self):
+        statistics = ParticipantStatistics(self.participants, self.event)
+        self.assertEqual(statistics.age_range(0, 11), 3)
+        self.assertEqual(statistics.age_range(11, 16), 1)
+        self.assertEqual(age_range(0, 11, self.participants, self.event), 3)
+
+    def test_gender_and_leader_filter(self):
+        statistics = ParticipantStatistics(self.participants, self.event)
+        self.assertEqual(statistics.age_range(0, 100, 'F', False), 2)
+        self.assertEqual(statistics.age_range(0, 100, 'F', True), 1)
+        self.assertEqual(statistics.age_range(18, 26, 'M', True), 1)
+        self.assertEqual(statistics.age_range(18, 26, 'M', False), 0)
+
+    def test_leader_type(self):
+        statistics = ParticipantStatistics(self.participants)
+        self.assertEqual(statistics.leader_type('N'), 3)
+        self.assertEqual(statistics.leader_type('StaFue'), 1)
+        self.assertEqual(statistics.leader_type('MeuFue'), 0)
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            statistics = ParticipantStatistics(self.participants, self.event)
+            statistics.age_range(0, 11)
+            statistics.age_range(11, 16, 'M', True)
+            statistics.leader_type('N')
+
+
+class EatHabitSummaryTests(TestCase):
+
+    def setUp(self):
+        ScoutOrgaLevel.objects.create(id=5, name='Stamm')
+        FrontendTheme.objects.create(id=1)
+        registration = Registration.objects.create(event=Event.objects.create(name='Lager'))
+        vegan = EatHabit.objects.create(name='Vegan')
+        gluten = EatHabit.objects.create(name='Glutenfrei')
+        for habits in [[vegan], [vegan], [gluten, vegan], [vegan, gluten], [], []]:
+            participant = RegistrationParticipant.objects.create(registration=registration)
+            participant.eat_habit.set(habits)
+        RegistrationParticipant.objects.create()
+        self.participants = RegistrationParticipant.objects.filter(registration=registration)
+
+    def test_combinations(self):
+        with self.assertNumQueries(3):
+            summary = get_eat_habit_summary(self.participants)
+        self.assertCountEqual(summary, [
+            {'sum': 2, 'food': 'Vegan'},
+            {'sum': 2, 'food': 'Vegan, Glutenfrei'},
+            {'sum': 2, 'food': 'Normal'},
+        ])
+
+
+class ScoutHierarchyPathTests(TestCase):
+
+    def setUp(self):
+        levels = {level_id: ScoutOrgaLevel.objects.create(id=level_id, name=name)
+                  for level_id, name in [(2, 'Verband'), (3, 'Bund'), (4, 'Ring/Regional'), (5, 'Stamm')]}
+        FrontendTheme.objects.create(id=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.verband = ScoutHierarchy.objects.create(name='DPV', level=levels[2])
+            self.bund = ScoutHierarchy.objects.create(name='Bund A', level=levels[3], parent=self.verband)
+            self.other_bund = ScoutHierarchy.objects.create(name='Bund B', level=levels[3], parent=self.verband)
+            self.ring = ScoutHierarchy.objects.create(name='Ring', level=levels[4], parent=self.bund)
+            self.stamm = ScoutHierarchy.objects.create(name='Stamm', level=levels[5], parent=self.ring)
+
+    def test_path_and_ancestors(self):
+        stamm = ScoutHierarchy.objects.get(id=self.stamm.id)
+        self.assertEqual(stamm.path_ids, [self.verband.id, self.bund.id, self.ring.id, self.stamm.id])
+        with self.assertNumQueries(1):
+            self.assertEqual(get_bund_or_ring(stamm), self.bund)
+            self.assertEqual(get_bund_or_ring(stamm, False), self.ring)
+            self.assertEqual(stamm.verband, 'DPV')
+        self.assertEqual(stamm.keycloak_group_name, '/DPV/Bünde/Bund A/Ringe/Ring/Stämme/Stamm')
+        self.assertEqual(stamm.keycloak_role_name, 'dpv_bund a_ring_stamm_role')
+
+    def test_moving_a_subtree(self):
+        self.ring.parent = self.other_bund
+        self.ring.save()
+        stamm = ScoutHierarchy.objects.get(id=self.stamm.id)
+        self.assertEqual(stamm.path_ids, [self.verband.id, self.other_bund.id, self.ring.id, self.stamm.id])
+        self.assertEqual(get_bund_or_ring(stamm), self.other_bund)
+
+    def test_loaddata_with_children_before_parents(self):
+        rows = [(903, 'Stamm X', 902), (901, 'Bund X', 900), (900, 'Verband X', None), (902, 'Ring X', 901)]
+        fixture = [{'model': 'basic.scouthierarchy', 'pk': obj_id, 'fields': {'name': name, 'parent': parent_id}}
+                   for obj_id, name, parent_id in rows]
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+            json.dump(fixture, file)
+            file.flush()
+            call_command('loaddata', file.name, verbosity=0)
+
+        paths = dict(ScoutHierarchy.objects.filter(id__gte=900).values_list('id', 'path'))
+        expected = {900: '/900/', 901: '/900/901/', 902: '/900/901/902/', 903: '/900/901/902/903/'}
+        self.assertEqual(paths, expected)
+
+        ScoutHierarchy.objects.filter(id__gte=900).update(path='')
+        call_command('rebuild_scout_hierarchy_paths', stdout=io.StringIO())
+        self.assertEqual(dict(ScoutHierarchy.objects.filter(id__gte=900).values_list('id', 'path')), expected)
+
+    def test_snapshot(self):
+        get_tree_snapshot()
+        stamm = ScoutHierarchy.objects.select_related('level').get(id=self.stamm.id)
+        with self.assertNumQueries(0):
+            data = ScoutHierarchyDetailedSerializer(stamm).data
+        self.assertEqual((data['bund'], data['ring'], data['stamm']), ('Bund A', 'Ring', 'Stamm'))
+        self.assertEqual(data['display_name'], 'Stamm (Bund A)')
+
+        self.ring.parent = self.other_bund
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ring.save()
+        self.assertEqual(ScoutHierarchyDetailedSerializer(stamm).data['bund'], 'Bund B')
+
+    def test_registrations_below_organisation(self):
+        event = Event.objects.create(name='Lager')
+        registration = Registration.objects.create(event=event, scout_organisation=self.stamm)
+        Registration.objects.create(event=event, scout_organisation=self.other_bund)
+        registrations = Registration.objects.filter(
+            ScoutHierarchy.subtree_filter([self.bund], 'scout_organisation__'))
+        self.assertEqual(list(registrations), [registration])
+        self.assertEqual(Registration.objects.filter(
+            ScoutHierarchy.subtree_filter([self.verband], 'scout_organisation__')).count(), 2)
+        self.assertFalse(Registration.objects.filter(ScoutHierarchy.subtree_filter([], 'scout_organisation__')))
+
+
+class CashSummaryListTests(TestCase):
+
+    def setUp(self):
+        FrontendTheme.objects.create(id=1)
+        stamm = ScoutHierarchy.objects.create(name='Adler', level=ScoutOrgaLevel.objects.create(id=5, name='Stamm'))
+        self.event = Event.objects.create(name='Lager')
+        option = BookingOption.objects.create(name='Voll', price=10, event=self.event)
+        for amount in [0, 10, 25, 30]:
+            registration = Registration.objects.create(event=self.event, scout_organisation=stamm)
+            registration.responsible_persons.add(get_user_model().objects.create_user(
+                username=f'user{amount}', email=f'user{amount}@example.com'))
+            for _ in range(3):
+                RegistrationParticipant.objects.create(registration=registration, booking_option=option)
+            if amount:
+                CashIncome.objects.create(registration=registration, amount=amount)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='foo'))
+        self.url = f'/event/event/{self.event.id}/summary/cash-list/'
+
+    def test_paid_filter_and_ordering(self):
+        response = self.client.get(self.url, {'paid': 'false', 'ordering': 'open', 'order-desc': 'true'})
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([item['payment']['open'] for item in response.data['results']], [30.0, 20.0, 5.0])
+        first = response.data['results'][0]
+        self.assertEqual(first['participant_count'], 3)
+        self.assertEqual(list(first['booking_options']), [{'booking_options': 'Voll', 'sum': 3, 'price': 30}])
+
+        response = self.client.get(self.url, {'paid': 'true'})
+        self.assertEqual([item['payment']['paid'] for item in response.data['results']], [30.0])
 
-# Create your tests here.
+    def test_constant_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(6):
+            self.client.get(self.url)
+        registration = Registration.objects.create(event=self.event, scout_organisation=ScoutHierarchy.objects.get())
+        CashIncome.objects.create(registration=registration, amount=5)
+        with self.assertNumQueries(6):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 5)
@@ -1,5 +1,4 @@
 from copy import deepcopy
-from queue import Queue
 
 from django.db.models import Q, QuerySet
 from django.utils import timezone
@@ -19,8 +18,8 @@ from anmelde_tool.event import serializers as event_serializers
 from anmelde_tool.event.models import StandardEventTemplate, Event, EventModule, EventLocation
 from anmelde_tool.event.permissions import EventRole, check_event_permission
 from basic.helper.get_property_ids import get_zipcode
-from keycloak_auth.helper import get_groups_of_user
-from keycloak_auth.models import KeycloakGroup
+from basic.helper.tree_snapshot import get_tree_snapshot
+from keycloak_auth.helper import get_groups_of_request_user
 
 
 def add_event_attribute(attribute_module: AttributeModule, event_module: EventModule) -> AttributeModule:
@@ -82,22 +81,10 @@ class MyInvitationsViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = event_serializers.MyInvitationsSerializer
 
     def get_queryset(self):
-        token = self.request.META.get('HTTP_AUTHORIZATION')
-        child_ids = get_groups_of_user(token, self.request.user.keycloak_id)
+        child_ids = get_groups_of_request_user(self.request)
         if self.request.user.person.scout_group and self.request.user.person.scout_group.keycloak:
             child_ids += [self.request.user.person.scout_group.keycloak.keycloak_id]
-        child_groups = KeycloakGroup.objects.filter(keycloak_id__in=child_ids).prefetch_related('parent')
-
-        q = Queue()
-        for group in child_groups:
-            q.put(group)
-
-        parent_ids = set()
-        while not q.empty():
-            group = q.get()
-            parent_ids.add(group.id)
-            if group.parent:
-                q.put(group.parent)
+        parent_ids = get_tree_snapshot().get_keycloak_group_ancestor_ids(child_ids)
 
         return Event.objects \
             .filter((Q(invited_groups__in=parent_ids) | Q(invited_groups=None)) & Q(is_public=True)) \
@@ -303,8 +290,7 @@ class EventOverviewViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = event_serializers.EventOverviewSerializer
 
     def get_queryset(self) -> QuerySet:
-        token = self.request.META.get('HTTP_AUTHORIZATION')
-        child_ids = get_groups_of_user(token, self.request.user.keycloak_id)
+        child_ids = get_groups_of_request_user(self.request)
 
         queryset = Event.objects.filter(
             Q(admin_group__keycloak_id__in=child_ids)
@@ -5,3 +5,9 @@ class ParticipantAlreadyExists(APIException):
     status_code = 400
     default_detail = 'Teilnehmer ist bereits für diese Veranstaltung angemeldet. Eventuell von einem anderem Stamm.'
     default_code = 'bad request'
+
+
+class ParticipantImportInvalid(APIException):
+    status_code = 400
+    default_detail = 'Bitte eine Liste von Teilnehmern oder eine CSV- oder XLSX-Datei hochladen.'
+    default_code = 'bad request'
@@ -8,6 +8,7 @@ from anmelde_tool.event.models import Event, BookingOption
 from authentication.models import CustomUser
 from basic import choices as basic_choices
 from basic import models as basic_models
+from basic.helper.duplicate_key import get_duplicate_key
 from authentication import models as auth_models
 
 User: CustomUser = get_user_model()
@@ -75,10 +76,15 @@ class RegistrationParticipant(basic_models.TimeStampMixin):
     person = models.ForeignKey(
         auth_models.Person, on_delete=models.PROTECT, null=True, blank=True
     )
+    duplicate_key = models.CharField(max_length=40, blank=True, default="", db_index=True, editable=False)
 
     def __str__(self):
         return f"{self.registration}: {self.last_name}, {self.first_name}"
 
+    def save(self, *args, **kwargs):
+        self.duplicate_key = get_duplicate_key(self.first_name, self.last_name, self.birthday)
+        super().save(*args, **kwargs)
+
 
 class RegistrationRating(models.Model):
     id = models.AutoField(auto_created=True, primary_key=True)
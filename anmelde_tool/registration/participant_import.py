@@ -0,0 +1,246 @@
+import csv
+import io
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+import openpyxl
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from djangorestframework_camel_case.util import camel_to_underscore
+
+from anmelde_tool.event.api_exceptions import EatHabitTooLong
+from anmelde_tool.registration.api_exceptions import ParticipantImportInvalid, ParticipantAlreadyExists
+from anmelde_tool.registration.models import Registration, RegistrationParticipant
+from anmelde_tool.registration.serializers import RegistrationParticipantImportSerializer
+from basic.choices import Gender
+from basic.helper.duplicate_key import get_duplicate_key
+from basic.models import ZipCode, ScoutHierarchy, EatHabit
+
+
+def read_rows(request) -> list[tuple[int, dict]]:
+    """
+    Rows of a bulk import with their row number, either from a json array or from an uploaded
+    csv/xlsx file whose header row names the participant fields.
+    """
+    file = request.FILES.get('file')
+    if file is None:
+        data = request.data
+        if isinstance(data, dict):
+            data = data.get('participants')
+        if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+            raise ParticipantImportInvalid
+        return list(enumerate(data, start=1))
+
+    if file.name.endswith('.xlsx'):
+        sheet = openpyxl.load_workbook(file, read_only=True, data_only=True).worksheets[0]
+        lines = sheet.iter_rows(values_only=True)
+    elif file.name.endswith('.csv'):
+        text = io.StringIO(file.read().decode('utf-8-sig'))
+        try:
+            dialect = csv.Sniffer().sniff(text.read(2048), delimiters=',;\t')
+        except csv.Error:
+            dialect = 'excel'
+        text.seek(0)
+        lines = csv.reader(text, dialect)
+    else:
+        raise ParticipantImportInvalid
+
+    header = [camel_to_underscore(str(name or '').strip()) for name in next(lines, [])]
+    rows = []
+    for number, line in enumerate(lines, start=2):
+        row = {name: clean_cell(value) for name, value in zip(header, line) if name and clean_cell(value) is not None}
+        if 'zip_code' in row:
+            # spreadsheets turn zip codes into numbers and drop their leading zeros
+            row['zip_code'] = str(row['zip_code']).zfill(5)
+        if row:
+            rows.append((number, row))
+    return rows
+
+
+def clean_cell(value):
+    if isinstance(value, str):
+        return value.strip() or None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def split_eat_habits(eat_habits) -> list[str]:
+    if isinstance(eat_habits, str):
+        eat_habits = [eat_habits]
+    result = []
+    for habit in eat_habits or []:
+        if len(habit) > 100:
+            raise ValueError(habit)
+        result.extend(split.strip().title() for split in re.split(",|;", habit) if split.strip())
+    return result
+
+
+def lookup_key(value):
+    """
+    zip_code, scout_group and booking_option can be given as id, as dict with id or as plain value.
+    """
+    if isinstance(value, dict):
+        return value.get('id') or value.get('zip_code') or value.get('name')
+    return value
+
+
+@dataclass
+class ParticipantImportResult:
+    participants: list[RegistrationParticipant] = field(default_factory=list)
+    errors: list[dict] = field(default_factory=list)
+
+
+class ParticipantImport:
+    """
+    Creates the participants of a registration from many rows at once.
+
+    All rows are validated before anything is written. Zip codes, scout groups, booking options,
+    eat habits and the participants already registered for the event are loaded with one query
+    each, so the number of queries does not grow with the number of rows. Only if every row is
+    valid the participants are inserted with bulk_create in one transaction, otherwise the errors
+    are returned by row number.
+    """
+
+    def __init__(self, registration: Registration, user):
+        self.registration = registration
+        self.event = registration.event
+        self.default_scout_group = getattr(getattr(user, 'person', None), 'scout_group', None)
+
+    def run(self, rows: list[tuple[int, dict]]) -> ParticipantImportResult:
+        result = ParticipantImportResult()
+        rows = [(number, *self.prepare(row)) for number, row in rows]
+
+        zip_codes = self.load_zip_codes([row.get('zip_code') for _, row, _ in rows])
+        scout_group_ids = {str(lookup_key(row.get('scout_group'))) for _, row, _ in rows}
+        scout_groups = {str(scout_group.id): scout_group for scout_group in ScoutHierarchy.objects.filter(
+            id__in=[int(scout_group_id) for scout_group_id in scout_group_ids if scout_group_id.isdigit()])}
+        event_booking_options = list(self.event.bookingoption_set.order_by('id'))
+        booking_options = {}
+        for booking_option in reversed(event_booking_options):
+            booking_options[str(booking_option.id)] = booking_options[booking_option.name] = booking_option
+        default_booking_option = event_booking_options[0] if event_booking_options else None
+
+        generated_number = self.registration.registrationparticipant_set.count()
+
+        participants = []
+        for number, row, errors in rows:
+            serializer = RegistrationParticipantImportSerializer(data=row)
+            if not serializer.is_valid():
+                errors.update(serializer.errors)
+
+            participant = RegistrationParticipant(registration=self.registration, **serializer.validated_data)
+            generated = 'first_name' not in row and 'last_name' not in row
+            if generated:
+                generated_number += 1
+                participant.first_name = 'Teilnehmer'
+                participant.last_name = str(generated_number)
+
+            zip_code = lookup_key(row.get('zip_code'))
+            if zip_code:
+                participant.zip_code = zip_codes.get(zip_code)
+                if participant.zip_code is None:
+                    errors['zip_code'] = ['Postleitzahl nicht gefunden.']
+
+            scout_group = lookup_key(row.get('scout_group'))
+            participant.scout_group = scout_groups.get(str(scout_group)) if scout_group else self.default_scout_group
+            if scout_group and participant.scout_group is None:
+                errors['scout_group'] = ['Stamm nicht gefunden.']
+
+            booking_option = lookup_key(row.get('booking_option'))
+            participant.booking_option = booking_options.get(str(booking_option)) if booking_option \
+                else default_booking_option
+            if booking_option and participant.booking_option is None:
+                errors['booking_option'] = ['Buchungsoption nicht gefunden.']
+
+            participant.duplicate_key = get_duplicate_key(
+                participant.first_name, participant.last_name, participant.birthday)
+            participants.append((number, participant, row['eat_habit'], generated, errors))
+
+        # rows without a name get placeholder names, which are no duplicates of anyone
+        keys = set(RegistrationParticipant.objects
+                   .filter(registration__event=self.event,
+                           duplicate_key__in={participant.duplicate_key
+                                              for _, participant, _, generated, _ in participants if not generated})
+                   .values_list('duplicate_key', flat=True))
+        for number, participant, _, generated, errors in participants:
+            if not generated:
+                if participant.duplicate_key in keys:
+                    errors['non_field_errors'] = [ParticipantAlreadyExists.default_detail]
+                keys.add(participant.duplicate_key)
+            if errors:
+                result.errors.append({'row': number, 'errors': errors})
+
+        if not result.errors:
+            result.participants = self.create(
+                [(participant, eat_habits) for _, participant, eat_habits, _, _ in participants])
+        return result
+
+    def prepare(self, row: dict) -> tuple[dict, dict]:
+        row, errors = dict(row), {}
+
+        gender = str(row.get('gender') or Gender.Nothing)
+        if len(gender) > 1:
+            gender = next((value for value, label in Gender.choices if label == gender), Gender.Nothing)
+        row['gender'] = gender
+
+        if row.get('age'):
+            try:
+                row['birthday'] = timezone.now() - relativedelta(years=int(row['age']))
+            except (TypeError, ValueError):
+                errors['age'] = ['Ungültiges Alter.']
+        birthday = row.get('birthday')
+        if isinstance(birthday, str) and re.fullmatch(r'\d{1,2}\.\d{1,2}\.\d{4}', birthday):
+            birthday = datetime.strptime(birthday, '%d.%m.%Y')
+        elif isinstance(birthday, date) and not isinstance(birthday, datetime):
+            birthday = datetime(birthday.year, birthday.month, birthday.day)
+        if isinstance(birthday, datetime) and timezone.is_naive(birthday):
+            row['birthday'] = timezone.make_aware(birthday)
+
+        try:
+            row['eat_habit'] = split_eat_habits(row.get('eat_habit'))
+        except (TypeError, ValueError):
+            errors['eat_habit'] = [EatHabitTooLong.default_detail]
+            row['eat_habit'] = []
+        return row, errors
+
+    @staticmethod
+    def load_zip_codes(values) -> dict:
+        ids, codes = set(), set()
+        for value in values:
+            if isinstance(value, dict) and value.get('id'):
+                ids.add(value['id'])
+            elif isinstance(value, int) and not isinstance(value, bool):
+                ids.add(value)
+            elif lookup_key(value):
+                codes.add(str(lookup_key(value)))
+        if not ids and not codes:
+            return {}
+
+        zip_codes = {}
+        # the first zip code wins like in get_zipcode, several cities can share one
+        for zip_code in ZipCode.objects.filter(Q(id__in=ids) | Q(zip_code__in=codes)).order_by('-id'):
+            if zip_code.id in ids:
+                zip_codes[zip_code.id] = zip_code
+            zip_codes[zip_code.zip_code] = zip_code
+        return zip_codes
+
+    @transaction.atomic
+    def create(self, participants: list[tuple[RegistrationParticipant, list[str]]]) -> list[RegistrationParticipant]:
+        names = {name for _, eat_habits in participants for name in eat_habits}
+        eat_habits = {eat_habit.name: eat_habit for eat_habit in EatHabit.objects.filter(name__in=names)}
+        eat_habits.update({eat_habit.name: eat_habit for eat_habit in EatHabit.objects.bulk_create(
+            [EatHabit(name=name) for name in names if name not in eat_habits])})
+
+        created = RegistrationParticipant.objects.bulk_create([participant for participant, _ in participants])
+
+        through = RegistrationParticipant.eat_habit.through
+        through.objects.bulk_create([
+            through(registrationparticipant_id=participant.id, eathabit_id=eat_habits[name].id)
+            for participant, names in participants
+            for name in dict.fromkeys(names)
+        ])
+        return created
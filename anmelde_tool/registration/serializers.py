@@ -98,6 +98,16 @@ class RegistrationParticipantSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class RegistrationParticipantImportSerializer(serializers.ModelSerializer):
+    """
+    Validates the plain fields of a bulk import row, the related objects are looked up by ParticipantImport.
+    """
+
+    class Meta:
+        model = RegistrationParticipant
+        exclude = ('registration', 'zip_code', 'scout_group', 'booking_option', 'eat_habit', 'person', 'generated')
+
+
 class RegistrationParticipantReadSerializer(serializers.ModelSerializer):
     eat_habit = serializers.SlugRelatedField(
         many=True,
@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from anmelde_tool.event.models import Event, BookingOption
+from anmelde_tool.registration.models import Registration, RegistrationParticipant
+from basic.helper.duplicate_key import get_duplicate_key
+from basic.models import ScoutOrgaLevel, FrontendTheme, EatHabit, ZipCode
+
+
+class ParticipantBulkImportTests(TestCase):
+
+    def setUp(self):
+        ScoutOrgaLevel.objects.create(id=5, name='Stamm')
+        FrontendTheme.objects.create(id=1)
+        self.event = Event.objects.create(name='Lager')
+        self.full = BookingOption.objects.create(name='Voll', price=10, event=self.event)
+        self.weekend = BookingOption.objects.create(name='Wochenende', price=5, event=self.event)
+        self.registration = Registration.objects.create(event=self.event)
+        ZipCode.objects.create(zip_code='01067', city='Dresden')
+        EatHabit.objects.create(name='Vegan')
+        RegistrationParticipant.objects.create(
+            registration=Registration.objects.create(event=self.event),
+            first_name='Anna', last_name='Berg', birthday='2012-05-01T00:00:00Z')
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='foo'))
+        self.url = f'/event/registration/{self.registration.id}/single-participant/bulk/'
+
+    def participants(self):
+        return RegistrationParticipant.objects.filter(registration=self.registration)
+
+    def test_json_import(self):
+        rows = [
+            {'firstName': f'Kind {number}', 'lastName': 'Muster', 'birthday': f'2013-01-{number:02}T00:00:00Z',
+             'gender': 'Männlich', 'zipCode': '01067', 'eatHabit': ['vegan, Glutenfrei']}
+            for number in range(1, 21)
+        ]
+        rows.append({'firstName': 'Karl', 'lastName': 'Muster', 'bookingOption': 'Wochenende', 'gender': 'F'})
+
+        with self.assertNumQueries(15):
+            response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data), 21)
+
+        participants = self.participants()
+        self.assertEqual(participants.filter(booking_option=self.full, gender='M', zip_code__city='Dresden').count(), 20)
+        self.assertEqual(participants.get(first_name='Karl').booking_option, self.weekend)
+        self.assertEqual(EatHabit.objects.filter(name='Glutenfrei').count(), 1)
+        self.assertEqual(participants.filter(eat_habit__name='Vegan').count(), 20)
+
+    def test_invalid_rows_create_nothing(self):
+        rows = [
+            {'firstName': 'Anna', 'lastName': 'Berg', 'birthday': '2012-05-01T00:00:00Z'},
+            {'firstName': 'Ben', 'lastName': 'Berg', 'zipCode': '99999'},
+            {'firstName': 'Ben', 'lastName': 'Berg', 'bookingOption': 'Tagesgast'},
+            {'firstName': 'Ida', 'lastName': 'Berg', 'email': 'no mail'},
+            {'firstName': 'Ole', 'lastName': 'Berg'},
+        ]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 2, 3, 4])
+        self.assertIn('zip_code', response.data['errors'][1]['errors'])
+        self.assertIn('booking_option', response.data['errors'][2]['errors'])
+        self.assertIn('non_field_errors', response.data['errors'][2]['errors'])
+        self.assertFalse(self.participants().exists())
+
+    def test_csv_import(self):
+        content = 'firstName;lastName;birthday;zipCode;eatHabit\n' \
+                  'Lena;Fuchs;01.02.2014;1067;Vegan\n' \
+                  ';;;;\n' \
+                  'Tom;Fuchs;2014-03-04;;\n'
+        file = SimpleUploadedFile('teilnehmer.csv', content.encode('utf-8'), content_type='text/csv')
+        response = self.client.post(self.url, {'file': file}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        lena = self.participants().get(first_name='Lena')
+        self.assertEqual(lena.zip_code.city, 'Dresden')
+        self.assertEqual(timezone.localtime(lena.birthday).date().isoformat(), '2014-02-01')
+        self.assertEqual(list(lena.eat_habit.values_list('name', flat=True)), ['Vegan'])
+        self.assertEqual(self.participants().count(), 2)
+
+    def test_duplicates_ignore_spelling(self):
+        anna = RegistrationParticipant.objects.get(first_name='Anna')
+        self.assertEqual(anna.duplicate_key, get_duplicate_key(' ánna ', 'BERG', '2012-05-01'))
+
+        rows = [
+            {'firstName': 'Änna', 'lastName': 'berg', 'birthday': '2012-05-01T10:00:00Z'},
+            {'firstName': 'Jörg', 'lastName': 'Berg', 'birthday': '2013-06-01T00:00:00Z'},
+            {'firstName': 'Jorg', 'lastName': 'Berg  ', 'birthday': '2013-06-01T00:00:00Z'},
+        ]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 3])
+
+    def test_unnamed_rows_are_no_duplicates(self):
+        RegistrationParticipant.objects.create(
+            registration=Registration.objects.create(event=self.event), first_name='Teilnehmer', last_name='1')
+        response = self.client.post(self.url, [{'gender': 'M'}, {'gender': 'F'}], format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(list(self.participants().order_by('last_name').values_list('last_name', flat=True)),
+                         ['1', '2'])
@@ -9,6 +9,7 @@ from django.db.models import QuerySet
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from rest_framework import mixins, viewsets, status
+from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -49,9 +50,11 @@ from anmelde_tool.registration.models import (
     RegistrationParticipant,
     RegistrationRating,
 )
+from anmelde_tool.registration.participant_import import ParticipantImport, read_rows
 from authentication import models as auth_models
 from basic import models as basic_models
 from basic.choices import Gender
+from basic.helper.duplicate_key import get_duplicate_key
 from basic.helper.get_property_ids import get_zipcode, get_scout_group
 from basic.models import ZipCode, ScoutHierarchy
 
@@ -89,9 +92,11 @@ def get_attribute_params(kwargs, post_serializer):
 
 def check_for_double_participants(request, event_id):
     if RegistrationParticipant.objects.filter(
-            first_name=request.data.get("first_name"),
-            last_name=request.data.get("last_name"),
-            birthday=request.data.get("birthday"),
+            duplicate_key=get_duplicate_key(
+                request.data.get("first_name"),
+                request.data.get("last_name"),
+                request.data.get("birthday"),
+            ),
             registration__event=event_id,
     ).exists():
         raise ParticipantAlreadyExists()
@@ -158,9 +163,11 @@ class RegistrationSingleParticipantViewSet(viewsets.ModelViewSet):
             ] = registration.event.bookingoption_set.first().id
 
         if request.data.get("allow_permanently") and not auth_models.Person.objects.filter(
-                first_name=request.data["first_name"],
-                last_name=request.data["last_name"],
-                birthday=request.data["birthday"],
+                duplicate_key=get_duplicate_key(
+                    request.data["first_name"],
+                    request.data["last_name"],
+                    request.data["birthday"],
+                ),
                 scout_group=scout_group
         ).exists():
             person = auth_models.Person(
@@ -201,6 +208,32 @@ class RegistrationSingleParticipantViewSet(viewsets.ModelViewSet):
 
         return super().destroy(request, *args, **kwargs)
 
+    @action(detail=False, methods=["post"])
+    def bulk(self, request, *args, **kwargs) -> Response:
+        """
+        Creates many participants at once from a json array or an uploaded csv/xlsx file.
+        Nothing is created if any row is invalid, the errors are returned per row instead.
+        """
+        registration: Registration = get_registration(self.kwargs.get("registration_pk", None))
+
+        if not request.user.is_superuser and event_permissions.check_event_permission(
+                registration.event, request, admin_only=True) != event_permissions.EventRole.ADMIN_ROLE:
+            if registration.event.registration_start and registration.event.registration_start > timezone.now():
+                raise event_api_exceptions.TooEarly
+            elif registration.event.last_possible_update and registration.event.last_possible_update < timezone.now():
+                raise event_api_exceptions.TooLate
+
+        result = ParticipantImport(registration, request.user).run(read_rows(request))
+        if result.errors:
+            return Response({"errors": result.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        participants = self.get_queryset() \
+            .filter(id__in=[participant.id for participant in result.participants]) \
+            .select_related("booking_option") \
+            .prefetch_related("eat_habit")
+        serializer = registration_serializers.RegistrationParticipantShortSerializer(participants, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     def get_serializer_class(self):
         serializer = {
             "create": registration_serializers.RegistrationParticipantSerializer,
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:22
+
+from django.db import migrations, models
+
+from basic.helper.duplicate_key import get_duplicate_key
+
+
+def fill_duplicate_keys(apps, schema_editor):
+    Person = apps.get_model('authentication', 'Person')
+    objs = list(Person.objects.only('first_name', 'last_name', 'birthday'))
+    for obj in objs:
+        obj.duplicate_key = get_duplicate_key(obj.first_name, obj.last_name, obj.birthday)
+    Person.objects.bulk_update(objs, ['duplicate_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0006_alter_person_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='duplicate_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=40),
+        ),
+        migrations.RunPython(fill_duplicate_keys, migrations.RunPython.noop),
+    ]
@@ -9,6 +9,7 @@ from authentication.choices import EmailNotificationType
 from backend.timestamp_mixin import TimeStampMixin
 from basic import models as basic_models
 from basic.choices import Gender
+from basic.helper.duplicate_key import get_duplicate_key
 from keycloak_auth.models import KeycloakGroup
 
 
@@ -87,6 +88,11 @@ class Person(TimeStampMixin):
     )
     created_by = models.ManyToManyField(CustomUser, related_name='creator', blank=True)
     edited_last = models.DateTimeField(auto_now=True)
+    duplicate_key = models.CharField(max_length=40, blank=True, default='', db_index=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.duplicate_key = get_duplicate_key(self.first_name, self.last_name, self.birthday)
+        super().save(*args, **kwargs)
 
 
 class RequestGroupAccess(TimeStampMixin):
@@ -7,6 +7,7 @@ from keycloak import KeycloakPutError
 from notifications.signals import notify
 
 from backend.settings import keycloak_admin
+from keycloak_auth.helper import invalidate_groups_of_user
 from .api_exceptions import KeycloakError
 from .choices import RequestGroupAccessChoices
 from .models import CustomUser, RequestGroupAccess, Person
@@ -161,10 +162,12 @@ def move_user_into_group(instance_pk):
     if instance.status == RequestGroupAccessChoices.ACCEPTED:
         if not in_group:
             keycloak_admin.group_user_add(user_id=instance.user.keycloak_id, group_id=instance.group.keycloak_id)
+            invalidate_groups_of_user(instance.user.keycloak_id)
         decision = 'angenommen'
     elif instance.status == RequestGroupAccessChoices.DECLINED:
         if in_group:
             keycloak_admin.group_user_remove(user_id=instance.user.keycloak_id, group_id=instance.group.keycloak_id)
+            invalidate_groups_of_user(instance.user.keycloak_id)
         decision = 'abgelehnt'
 
     notify.send(
@@ -1,78 +1,160 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
 from celery import shared_task
 from celery.utils.log import get_task_logger
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction, IntegrityError
+from django.db.models import Q
 
-from authentication.models import CustomUser
+from authentication.models import CustomUser, Person
 from backend.OIDCAuthentication import MyOIDCAB
 from backend.settings import keycloak_admin
+from basic.helper.duplicate_key import get_duplicate_key
 
 User: CustomUser = get_user_model()
 
 logger = get_task_logger(__name__)
 
+USER_QUERY = {
+    'enabled': True,
+    'emailVerified': True,
+}
 
-@shared_task
-def import_keycloak_members():
-    logger.info('Starting syncing Keycloak users')
-    oicd = MyOIDCAB()
 
-    query = {
-        'max': -1,
-        'enabled': True,
-        'briefRepresentation': True,
-        'emailVerified': True,
+def get_attribute(keycloak_user: dict, name: str) -> str:
+    value = (keycloak_user.get('attributes') or {}).get(name, '')
+    if isinstance(value, list):
+        value = value[0] if value else ''
+    return value
+
+
+def get_claims(keycloak_user: dict) -> dict:
+    fahrtenname = get_attribute(keycloak_user, 'fahrtenname')
+    return {
+        'sub': keycloak_user.get('id', ''),
+        'email_verified': keycloak_user.get('firstName', ''),
+        'verband': get_attribute(keycloak_user, 'verband'),
+        'fahrtenname': fahrtenname,
+        'bund': get_attribute(keycloak_user, 'bund'),
+        'stamm': get_attribute(keycloak_user, 'stamm'),
+        'nickname': fahrtenname,
+        'preferred_username': keycloak_user.get('username', ''),
+        'given_name': keycloak_user.get('firstName', ''),
+        'family_name': keycloak_user.get('lastName', ''),
+        'email': keycloak_user.get('email', ''),
     }
-    all_keycloak_users = keycloak_admin.get_users(query)
-    all_keycloak_users_ids = [val['id'] for val in all_keycloak_users]
-    all_django_users_ids = list(User.objects.all().values_list('keycloak_id', flat=True))
-    missing_ids = list(set(all_keycloak_users_ids) - set(all_django_users_ids))
-
-    count = 0
-    for keycloak_id in missing_ids:
-        if not keycloak_id:
-            continue
-        keycloak_user = keycloak_admin.get_user(keycloak_id)
-
-        if not keycloak_user.get('email'):
-            continue
-
-        verband = ''
-        bund = ''
-        fahrtenname = ''
-        stamm = ''
-
-        attributes = keycloak_user.get('attributes')
-        if attributes:
-            verband = attributes.get('verband', '')
-            bund = attributes.get('bund', '')
-            fahrtenname = attributes.get('fahrtenname', '')
-            stamm = attributes.get('stamm', '')
-
-            if isinstance(verband, list):
-                verband = verband[0]
-
-            if isinstance(bund, list):
-                bund = bund[0]
-
-            if isinstance(fahrtenname, list):
-                fahrtenname = fahrtenname[0]
-
-            if isinstance(stamm, list):
-                stamm = stamm[0]
-        claim = {
-            'sub': keycloak_user.get('id', ''),
-            'email_verified': keycloak_user.get('firstName', ''),
-            'verband': verband,
-            'fahrtenname': fahrtenname,
-            'bund': bund,
-            'stamm': stamm,
-            'nickname': fahrtenname,
-            'preferred_username': keycloak_user.get('username', ''),
-            'given_name': keycloak_user.get('firstName', ''),
-            'family_name': keycloak_user.get('lastName', ''),
-            'email': keycloak_user.get('email', ''),
-        }
-        django_user = oicd.create_user(claim)
-        count += 1
 
+
+def fetch_pages(total: int, page_size: int, concurrency: int):
+    """
+    Yields the keycloak users page by page. At most `concurrency` page requests
+    are in flight, so neither keycloak nor the memory of the worker are flooded.
+    """
+    def fetch(offset):
+        return keycloak_admin.get_users({**USER_QUERY, 'first': offset, 'max': page_size})
+
+    offsets = iter(range(0, total, page_size))
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque(executor.submit(fetch, offset) for offset in islice(offsets, concurrency))
+        while pending:
+            page = pending.popleft().result()
+            for offset in islice(offsets, 1):
+                pending.append(executor.submit(fetch, offset))
+            yield page
+
+
+class KeycloakUserImport:
+    """
+    Imports the keycloak users which do not exist in django yet.
+
+    The keycloak admin api can neither filter nor sort users by their creation or verification
+    time, so every run pages through all verified users. The ids of every page are compared with
+    the existing users in one query and only the missing users are created.
+    """
+
+    def __init__(self):
+        self.oidc = MyOIDCAB()
+        self.page_size = settings.KEYCLOAK_USER_SYNC_PAGE_SIZE
+        self.concurrency = settings.KEYCLOAK_USER_SYNC_CONCURRENCY
+        self.scout_groups = {}
+
+    def run(self) -> int:
+        total = keycloak_admin.users_count(USER_QUERY)
+        count = 0
+        for page in fetch_pages(total, self.page_size, self.concurrency):
+            count += self.import_users(page)
+        return count
+
+    def import_users(self, keycloak_users: list) -> int:
+        claims = [get_claims(keycloak_user) for keycloak_user in keycloak_users]
+        claims = [claim for claim in claims if claim['sub'] and claim['email'] and claim['preferred_username']]
+        if not claims:
+            return 0
+
+        existing = User.objects.filter(
+            Q(keycloak_id__in=[claim['sub'] for claim in claims])
+            | Q(username__in=[claim['preferred_username'] for claim in claims])
+            | Q(email__in=[claim['email'] for claim in claims])
+        ).values_list('keycloak_id', 'username', 'email')
+        taken = {value for row in existing for value in row if value}
+
+        new_claims = {}
+        for claim in claims:
+            keys = (claim['sub'], claim['preferred_username'], claim['email'])
+            if taken.isdisjoint(keys):
+                taken.update(keys)
+                new_claims[claim['sub']] = claim
+        if not new_claims:
+            return 0
+
+        try:
+            with transaction.atomic():
+                self.bulk_create(new_claims)
+        except IntegrityError:
+            # a user logged in while the page was processed, fall back to one by one
+            return sum(self.oidc.create_user(claim) is not None for claim in new_claims.values())
+        return len(new_claims)
+
+    def bulk_create(self, claims: dict):
+        users = []
+        for claim in claims.values():
+            user = User(
+                username=claim['preferred_username'],
+                email=claim['email'],
+                keycloak_id=claim['sub'],
+                first_name=claim['given_name'],
+                last_name=claim['family_name'],
+            )
+            user.set_unusable_password()
+            users.append(user)
+        User.objects.bulk_create(users)
+
+        user_ids = dict(User.objects.filter(keycloak_id__in=claims).values_list('keycloak_id', 'id'))
+        Person.objects.bulk_create([
+            Person(
+                user_id=user_ids[keycloak_id],
+                scout_name=claim['fahrtenname'] or claim['given_name'],
+                first_name=claim['given_name'],
+                last_name=claim['family_name'],
+                email=claim['email'],
+                scout_group=self.get_scout_group(claim),
+                duplicate_key=get_duplicate_key(claim['given_name'], claim['family_name'], None),
+            )
+            for keycloak_id, claim in claims.items()
+        ])
+
+    def get_scout_group(self, claim: dict):
+        key = (claim['stamm'], claim['bund'])
+        if key not in self.scout_groups:
+            self.scout_groups[key] = self.oidc.find_scout_group(claim)
+        return self.scout_groups[key]
+
+
+@shared_task
+def import_keycloak_members():
+    logger.info('Starting syncing Keycloak users')
+    count = KeycloakUserImport().run()
     logger.info(f'{count} Users have been added')
@@ -1,5 +1,17 @@
+import base64
+import json
+import time
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from mozilla_django_oidc.auth import OIDCAuthenticationBackend
+
+from authentication import sync_keycloak_users
+from authentication.models import Person
+from backend.OIDCAuthentication import MyOIDCAB
 
 
 class UsersManagersTests(TestCase):
@@ -21,3 +33,122 @@ class UsersManagersTests(TestCase):
         self.assertTrue(admin_user.is_active)
         self.assertTrue(admin_user.is_staff)
         self.assertTrue(admin_user.is_superuser)
+
+
+def make_token(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({'exp': exp}).encode()).decode().rstrip('=')
+    return f'header.{payload}.signature'
+
+
+class OIDCBackendCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.claims = {
+            'sub': 'keycloak-user',
+            'preferred_username': 'koch',
+            'email': 'koch@example.com',
+            'given_name': 'Kim',
+            'family_name': 'Koch',
+            'roles': ['leiter'],
+        }
+        self.backend = MyOIDCAB()
+        patcher = mock.patch.object(OIDCAuthenticationBackend, 'get_userinfo', return_value=self.claims)
+        self.get_userinfo = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_userinfo_cached_per_token(self):
+        token = make_token(time.time() + 600)
+        self.backend.get_or_create_user(token, None, None)
+        self.backend.get_or_create_user(token, None, None)
+        self.assertEqual(self.get_userinfo.call_count, 1)
+
+        self.backend.get_or_create_user(make_token(time.time() + 600) + 'x', None, None)
+        self.assertEqual(self.get_userinfo.call_count, 2)
+
+    def test_expired_token_not_cached(self):
+        token = make_token(time.time() - 10)
+        self.backend.get_userinfo(token, None, None)
+        self.backend.get_userinfo(token, None, None)
+        self.assertEqual(self.get_userinfo.call_count, 2)
+
+    def test_sync_only_on_changed_claims(self):
+        user = self.backend.get_or_create_user(make_token(time.time() + 600), None, None)
+        self.assertEqual(list(user.groups.values_list('name', flat=True)), ['leiter'])
+
+        with mock.patch.object(MyOIDCAB, 'set_user_info') as set_user_info:
+            self.backend.get_or_create_user(make_token(time.time() + 601), None, None)
+            set_user_info.assert_not_called()
+
+            self.claims['roles'] = ['leiter', 'anmelde_tool_team']
+            self.backend.get_or_create_user(make_token(time.time() + 602), None, None)
+            set_user_info.assert_called_once()
+
+
+class UpdateGroupsTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='koch', password='foo')
+        self.backend = MyOIDCAB()
+
+    def test_diff(self):
+        Group.objects.create(name='leiter')
+        self.backend.update_groups(self.user, {'roles': ['leiter', 'kueche']})
+        self.assertCountEqual(self.user.groups.values_list('name', flat=True), ['leiter', 'kueche'])
+
+        self.backend.update_groups(self.user, {'roles': ['kueche', 'lager']})
+        self.assertCountEqual(self.user.groups.values_list('name', flat=True), ['kueche', 'lager'])
+        self.assertEqual(Group.objects.count(), 3)
+
+    def test_unchanged_roles_only_read(self):
+        self.backend.update_groups(self.user, {'roles': ['leiter', 'kueche']})
+        with self.assertNumQueries(1):
+            self.backend.update_groups(self.user, {'roles': ['kueche', 'leiter']})
+
+
+def keycloak_user(number):
+    return {
+        'id': f'keycloak-{number}',
+        'username': f'user{number}',
+        'email': f'user{number}@example.com',
+        'firstName': f'Vorname {number}',
+        'lastName': 'Nachname',
+        'attributes': {'fahrtenname': [f'Fahrt {number}']} if number % 2 else {},
+    }
+
+
+@override_settings(KEYCLOAK_USER_SYNC_PAGE_SIZE=2, KEYCLOAK_USER_SYNC_CONCURRENCY=2)
+class ImportKeycloakMembersTests(TestCase):
+
+    def setUp(self):
+        self.keycloak_users = [keycloak_user(number) for number in range(5)]
+        self.keycloak_users.append({**keycloak_user(5), 'email': ''})
+        get_user_model().objects.create_user(username='user0', email='user0@example.com', keycloak_id='keycloak-0')
+
+        admin = mock.patch.object(sync_keycloak_users, 'keycloak_admin')
+        self.keycloak_admin = admin.start()
+        self.addCleanup(admin.stop)
+        self.keycloak_admin.users_count.side_effect = lambda query: len(self.keycloak_users)
+        self.keycloak_admin.get_users.side_effect = \
+            lambda query: self.keycloak_users[query['first']:query['first'] + query['max']]
+
+    def test_import(self):
+        sync_keycloak_users.import_keycloak_members()
+
+        self.assertEqual(self.keycloak_admin.get_users.call_count, 3)
+        self.assertEqual(get_user_model().objects.count(), 5)
+        user = get_user_model().objects.get(keycloak_id='keycloak-3')
+        self.assertEqual((user.username, user.first_name), ('user3', 'Vorname 3'))
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(user.person.scout_name, 'Fahrt 3')
+        self.assertEqual(Person.objects.get(user__keycloak_id='keycloak-4').scout_name, 'Vorname 4')
+
+    def test_late_verified_and_replaced_users(self):
+        sync_keycloak_users.import_keycloak_members()
+
+        # listed before the imported users, and a deleted user replaced by a new one
+        self.keycloak_users.insert(0, keycloak_user(6))
+        self.keycloak_users.pop()
+        self.keycloak_users.append(keycloak_user(7))
+        sync_keycloak_users.import_keycloak_members()
+        self.assertEqual(get_user_model().objects.filter(keycloak_id__in=['keycloak-6', 'keycloak-7']).count(), 2)
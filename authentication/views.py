@@ -23,13 +23,14 @@ from backend.settings import env, keycloak_admin, keycloak_user
 from basic.api_exceptions import TooManySearchResults, NoSearchResults, ZipCodeNotFound
 from basic.choices import Gender
 from basic.helper.choice_to_json import choice_to_json
+from basic.helper.duplicate_key import get_duplicate_key
 from basic.helper.get_property_ids import get_zipcode
 from basic.models import ScoutHierarchy, ZipCode, EatHabit
 from basic.permissions import IsStaffOrReadOnly
 from keycloak_auth.helper import (
     REGEX_GROUP,
     check_group_admin_permission,
-    get_groups_of_user,
+    get_groups_of_request_user,
 )
 from keycloak_auth.models import KeycloakGroup
 from keycloak_auth.serializers import FullGroupSerializer
@@ -440,8 +441,7 @@ class UserGroupViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, SearchFilter]
 
     def get_queryset(self):
-        token = self.request.META.get("HTTP_AUTHORIZATION")
-        ids = get_groups_of_user(token, self.request.user.keycloak_id)
+        ids = get_groups_of_request_user(self.request)
         return KeycloakGroup.objects.filter(keycloak_id__in=ids)
 
     def list(self, request, *args, **kwargs) -> Response:
@@ -693,16 +693,21 @@ class MyMembersUploadViewSet(viewsets.ViewSet):
             data_count += 1
 
         for item in data:
-            if Person.objects.filter(
-                    first_name=item["first_name"],
-                    last_name=item["last_name"],
-                    birthday=item["birthday"],
-                    scout_group=scout_group
-            ).exists():
+            item["duplicate_key"] = get_duplicate_key(item["first_name"], item["last_name"], item["birthday"])
+        existing_keys = set(
+            Person.objects.filter(
+                duplicate_key__in=[item["duplicate_key"] for item in data],
+                scout_group=scout_group
+            ).values_list("duplicate_key", flat=True)
+        )
+
+        for item in data:
+            if item["duplicate_key"] in existing_keys:
                 report.append(
                     f"{item['first_name']} {item['last_name']} {item['birthday'].date()} ist bereits vorhanden"
                 )
                 continue
+            existing_keys.add(item["duplicate_key"])
 
             gender_value = None
             # handle gender
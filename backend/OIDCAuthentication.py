@@ -1,20 +1,64 @@
 from __future__ import annotations
 
+import base64
+import hashlib
+import json
+import time
 from datetime import datetime, timedelta, timezone
 
 from django.contrib.auth.models import Group
+from django.core.cache import cache
 from django.db import transaction, IntegrityError
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from mozilla_django_oidc.auth import OIDCAuthenticationBackend
 
 from authentication.models import Person, CustomUser
 from basic.models import ScoutHierarchy
 
 
+def get_token_lifetime(access_token: str) -> int | None:
+    """
+    Returns the seconds until the access token expires, read from the unverified exp claim of the JWT.
+    """
+    try:
+        payload = access_token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(payload))['exp'] - time.time())
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def hash_claims(claims: dict) -> str:
+    return hashlib.sha256(json.dumps(claims, sort_keys=True, default=str).encode()).hexdigest()
+
+
 class MyOIDCAB(OIDCAuthenticationBackend):
     def get_username(self, claims: dict) -> str:
         return claims.get('preferred_username')
 
+    def get_userinfo(self, access_token, id_token, payload):
+        """
+        Caches the userinfo per access token, so only the first request with a token
+        goes to the keycloak userinfo endpoint.
+        """
+        cache_key = f'oidc_userinfo:{hashlib.sha256(access_token.encode()).hexdigest()}'
+        user_info = cache.get(cache_key)
+        if user_info is None:
+            user_info = super(MyOIDCAB, self).get_userinfo(access_token, id_token, payload)
+            timeout = self.get_settings('OIDC_USERINFO_CACHE_TIMEOUT', 300)
+            lifetime = get_token_lifetime(access_token)
+            if lifetime is not None:
+                timeout = min(timeout, lifetime)
+            if timeout > 0:
+                cache.set(cache_key, user_info, timeout)
+        return user_info
+
+    def remember_claims(self, user: CustomUser, claims: dict):
+        cache.set(f'oidc_claims:{user.pk}', hash_claims(claims), self.get_settings('OIDC_CLAIMS_SYNC_TIMEOUT', 86400))
+
+    def claims_changed(self, user: CustomUser, claims: dict) -> bool:
+        return cache.get(f'oidc_claims:{user.pk}') != hash_claims(claims)
+
     def create_user(self, claims: dict) -> CustomUser | None:
         try:
             user: CustomUser = super(MyOIDCAB, self).create_user(claims)
@@ -24,6 +68,7 @@ class MyOIDCAB(OIDCAuthenticationBackend):
 
             self.set_user_info(user, claims)
             self.update_groups(user, claims)
+            self.remember_claims(user, claims)
 
             return user
         except IntegrityError:
@@ -32,8 +77,11 @@ class MyOIDCAB(OIDCAuthenticationBackend):
         return None
 
     def update_user(self, user: CustomUser, claims: dict) -> CustomUser:
+        if not self.claims_changed(user, claims):
+            return user
         self.set_user_info(user, claims)
         self.update_groups(user, claims)
+        self.remember_claims(user, claims)
         return user
 
     def filter_users_by_claims(self, claims: dict) -> CustomUser:
@@ -58,11 +106,43 @@ class MyOIDCAB(OIDCAuthenticationBackend):
         add them to the user. Note that any role not passed via keycloak
         will be removed from the user.
         """
+        roles = set(claims.get('roles', []))
+        is_member = Exists(self.UserModel.objects.filter(pk=user.pk, groups=OuterRef('pk')))
+        known_groups = list(Group.objects.annotate(is_member=is_member).filter(Q(name__in=roles) | Q(is_member=True)))
+        current = {group.name: group for group in known_groups if group.is_member}
+        if roles == set(current):
+            return
+
         with transaction.atomic():
-            user.groups.clear()
-            for role in claims.get('roles', []):
-                group, _ = Group.objects.get_or_create(name=role)
-                group.user_set.add(user)
+            groups = {group.name: group for group in known_groups if group.name in roles}
+            missing = roles - set(groups)
+            if missing:
+                Group.objects.bulk_create([Group(name=name) for name in missing], ignore_conflicts=True)
+                groups.update({group.name: group for group in Group.objects.filter(name__in=missing)})
+
+            removed = [group for name, group in current.items() if name not in roles]
+            if removed:
+                user.groups.remove(*removed)
+            added = [group for name, group in groups.items() if name not in current]
+            if added:
+                user.groups.add(*added)
+
+    def find_scout_group(self, claims: dict) -> ScoutHierarchy | None:
+        """
+        Returns the stamm named in the claims, if it can be found unambiguously below the given bund.
+        """
+        stamm = claims.get('stamm', '')
+        bund = claims.get('bund', '')
+        if not stamm or not bund:
+            return None
+
+        stamm = stamm.replace('stamm', '')
+        found_bund = ScoutHierarchy.objects.filter(level=3, abbreviation=bund).first()
+        found_stamm = ScoutHierarchy.objects \
+            .filter(Q(name__contains=stamm, parent=found_bund) | Q(name__contains=stamm, parent__parent=found_bund))
+        if len(found_stamm) == 1:
+            return found_stamm.first()
+        return None
 
     def set_user_info(self, user: CustomUser, claims: dict):
         edited = False
@@ -107,16 +187,10 @@ class MyOIDCAB(OIDCAuthenticationBackend):
             edited = True
             user.is_staff = False
 
-        stamm = claims.get('stamm', '')
-        bund = claims.get('bund', '')
-
-        if stamm and bund and not user.person.scout_group:
-            stamm = stamm.replace('stamm', '')
-            found_bund = ScoutHierarchy.objects.filter(level=3, abbreviation=bund).first()
-            found_stamm = ScoutHierarchy.objects \
-                .filter(Q(name__contains=stamm, parent=found_bund) | Q(name__contains=stamm, parent__parent=found_bund))
-            if len(found_stamm) == 1:
-                user.person.scout_group = found_stamm.first()
+        if not user.person.scout_group:
+            scout_group = self.find_scout_group(claims)
+            if scout_group:
+                user.person.scout_group = scout_group
                 edited = True
 
         if edited:
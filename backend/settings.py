@@ -223,6 +223,12 @@ if SEND_MAIL:
     EMAIL_HOST_USER = env('EMAIL_HOST_USER')
     FRONT_URL = env.str('FRONT_URL')
 
+# mails per second allowed by the SES sending quota and mails sent over one connection
+EMAIL_SEND_RATE = env.float('EMAIL_SEND_RATE', 14)
+EMAIL_BATCH_SIZE = env.int('EMAIL_BATCH_SIZE', 100)
+# seconds without progress after which an unfinished email job is given up, longer than all chunk retries
+EMAIL_JOB_TIMEOUT = env.int('EMAIL_JOB_TIMEOUT', 3600)
+
 REST_USE_JWT = True
 
 REST_FRAMEWORK = {
@@ -261,6 +267,36 @@ OIDC_OP_AUTHORIZATION_ENDPOINT = f'{BASE_REALM_URI}/protocol/openid-connect/auth
 OIDC_STORE_ID_TOKEN = True
 OIDC_CREATE_USER = True
 
+# the group memberships, userinfo and tree snapshot versions are invalidated across the web and celery
+# processes, so they need a cache all processes share. Without CACHE_URL the redis of the celery broker is used,
+# the in-process cache is only meant for a single process like the tests.
+CACHE_URL = env('CACHE_URL', default=env('CELERY_BROKER') if env('CELERY_BROKER').startswith('redis://') else '')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# seconds after which the in-process snapshot of the scout hierarchy and keycloak group trees is rebuilt
+TREE_SNAPSHOT_MAX_AGE = env.int('TREE_SNAPSHOT_MAX_AGE', 60)
+# seconds the keycloak group memberships of a user are cached
+KEYCLOAK_GROUP_CACHE_TIMEOUT = env.int('KEYCLOAK_GROUP_CACHE_TIMEOUT', 300)
+# seconds the userinfo of an access token is cached, at most until the token expires
+OIDC_USERINFO_CACHE_TIMEOUT = env.int('OIDC_USERINFO_CACHE_TIMEOUT', 300)
+# seconds after which user info and groups are synced again even if the claims did not change
+OIDC_CLAIMS_SYNC_TIMEOUT = env.int('OIDC_CLAIMS_SYNC_TIMEOUT', 86400)
+# page size and parallel page requests of the keycloak user import
+KEYCLOAK_USER_SYNC_PAGE_SIZE = env.int('KEYCLOAK_USER_SYNC_PAGE_SIZE', 500)
+KEYCLOAK_USER_SYNC_CONCURRENCY = env.int('KEYCLOAK_USER_SYNC_CONCURRENCY', 4)
+
 GRAPHENE = {
     "SCHEMA": "basic.schema.schema"
 }
@@ -269,6 +305,8 @@ CELERY_BROKER_URL = env('CELERY_BROKER')
 CELERY_RESULT_BACKEND = env('CELERY_BROKER')
 USE_CELERY = env('USE_CELERY')
 CELERY_TIMEZONE = 'Europe/Berlin'
+# seconds after which a file generation is stopped, the worker is killed 30 seconds later
+FILE_GENERATION_TIME_LIMIT = env.int('FILE_GENERATION_TIME_LIMIT', 600)
 CELERY_BEAT_SCHEDULE = {
     "import_keycloak_members": {
         "task": "authentication.sync_keycloak_users.import_keycloak_members",
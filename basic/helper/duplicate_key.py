@@ -0,0 +1,34 @@
+import hashlib
+import unicodedata
+from datetime import date, datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def normalise_name(name) -> str:
+    """
+    Lower cased name without accents and surplus whitespace, 'Jörg  Müller' -> 'jorg muller'.
+    """
+    decomposed = unicodedata.normalize('NFKD', str(name or ''))
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def normalise_birthday(birthday) -> str:
+    if isinstance(birthday, str):
+        try:
+            birthday = parse_datetime(birthday) or parse_date(birthday)
+        except ValueError:
+            birthday = None
+    if isinstance(birthday, datetime):
+        birthday = timezone.localtime(birthday).date() if timezone.is_aware(birthday) else birthday.date()
+    return birthday.isoformat() if isinstance(birthday, date) else ''
+
+
+def get_duplicate_key(first_name, last_name, birthday) -> str:
+    """
+    Indexed key to find the same person twice, independent of spelling details and the time of the birthday.
+    """
+    value = f'{normalise_name(first_name)}|{normalise_name(last_name)}|{normalise_birthday(birthday)}'
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()
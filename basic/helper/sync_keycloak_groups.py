@@ -1,97 +1,173 @@
-from keycloak import KeycloakGetError
+from dataclasses import dataclass, field
+
+from django.db import transaction
 
 from backend.settings import keycloak_admin
+from basic.helper.tree_snapshot import invalidate_tree_snapshot
 from basic.models import ScoutHierarchy
-from keycloak_auth.helper import get_or_create_keycloak_model
 from keycloak_auth.models import KeycloakGroup
+from keycloak_auth.signals import keycloak_group_signals_disabled
+
+
+@dataclass
+class GroupSyncPlan:
+    """
+    Changes needed to bring the django KeycloakGroups in line with the keycloak group tree.
+    """
+    creates: list[KeycloakGroup] = field(default_factory=list)
+    renames: list[tuple[KeycloakGroup, str]] = field(default_factory=list)
+    reparents: list[tuple[KeycloakGroup, KeycloakGroup | None]] = field(default_factory=list)
+    deletes: list[KeycloakGroup] = field(default_factory=list)
+    assignments: list[tuple[ScoutHierarchy, KeycloakGroup]] = field(default_factory=list)
+    memberships: list[KeycloakGroup] = field(default_factory=list)
+    paths: dict = field(default_factory=dict)
+
+    def __bool__(self):
+        return any([self.creates, self.renames, self.reparents, self.deletes, self.assignments, self.memberships])
+
+    def lines(self):
+        for group in self.creates:
+            yield f'create {self.paths[group.keycloak_id]}'
+        for group, name in self.renames:
+            yield f'rename {group.name} -> {name}'
+        for group, parent in self.reparents:
+            yield f'move {group.name} -> {self.paths[group.keycloak_id]}'
+        for group in self.deletes:
+            yield f'delete {group.name} ({group.keycloak_id})'
+        for scout_hierarchy, group in self.assignments:
+            yield f'assign {scout_hierarchy.name} -> {self.paths[group.keycloak_id]}'
+        for group in self.memberships:
+            yield f'allow membership {self.paths.get(group.keycloak_id, group.name)}'
 
 
 class SyncKeycloakGroups:
-
-    def __init__(self):
-        self.groups = {}
-        self.groups_added = []
-        self.groups_deleted = []
-
-    def run(self):
-        print('checking django groups')
-        all_django_groups = KeycloakGroup.objects.all()
-        for group in all_django_groups:
-            name = self.generate_name(group)
-            self.groups[name] = False
-
-        print('checking keycloak groups')
-        all_groups = keycloak_admin.get_groups()
-        for group in all_groups:
-            self.get_subgroup(group)
-
-        print('Checking diff')
-        for group in self.groups:
-            if not self.groups[group]:
-                self.groups_deleted.append(group)
-
-        if self.groups_added:
+    """
+    Syncs the keycloak group tree into the KeycloakGroup table and assigns the groups to
+    the ScoutHierarchies with a matching group path.
+
+    Both trees are loaded once, the differences are collected in a GroupSyncPlan and applied
+    with bulk queries in one transaction. Bulk creates and updates send no signals and the
+    delete signals are disabled, so nothing is written back to keycloak. With dry_run the plan
+    is only printed.
+
+    Deleted groups take their links, event groups and scout hierarchy assignments with them, so
+    an empty keycloak tree or more than max_deletes deletes are only applied with force. Both
+    usually mean keycloak returned an incomplete tree.
+    """
+    max_deletes = 10
+
+    def __init__(self, dry_run: bool = False, force: bool = False):
+        self.dry_run = dry_run
+        self.force = force
+
+    def run(self) -> GroupSyncPlan:
+        print('loading groups')
+        keycloak_tree = keycloak_admin.get_groups()
+        plan = self.plan(keycloak_tree)
+
+        if plan:
             print('')
-            print('added groups:')
-            for group in self.groups_added:
-                print(group)
-
-        if self.groups_deleted:
-            print('')
-            print('groups to be deleted:')
-            for group in self.groups_deleted:
-                print(group)
-
-        print('Assign KeycloakGroup to ScoutHierarchies')
-        for scout_hierarchy in ScoutHierarchy.objects.all():
-            if not scout_hierarchy.keycloak:
-                keycloak_group = None
-                try:
-                    keycloak_group: dict = keycloak_admin.get_group_by_path(
-                        path=scout_hierarchy.keycloak_group_name,
-                        search_in_subgroups=True
-                    )
-                except (KeycloakGetError, KeyError):
-                    pass
-                if keycloak_group:
-                    django_keycloak_group = KeycloakGroup.objects.get(keycloak_id=keycloak_group['id'])
-                    scout_hierarchy.keycloak = django_keycloak_group
-                    scout_hierarchy.save()
-            if scout_hierarchy.keycloak and not scout_hierarchy.keycloak.membership_allowed:
-                scout_hierarchy.keycloak.membership_allowed = True
-                scout_hierarchy.keycloak.save()
-
-        print('')
-        print('Checks finished')
-        if not self.groups_added and not self.groups_deleted:
+            for line in plan.lines():
+                print(line)
+        else:
             print('All fine')
 
-    def get_subgroup(self, group, parent: KeycloakGroup = None):
-        keycloak_group, created = get_or_create_keycloak_model(group, parent)
-        if created:
-            self.groups_added.append(self.generate_name(keycloak_group))
-
-        if keycloak_group.name != group['name']:
-            keycloak_group.name = group['name']
-            keycloak_group.save()
-
-        if keycloak_group.parent is None or keycloak_group.parent != parent:
-            keycloak_group.parent = parent
-            keycloak_group.save()
-
-        name = self.generate_name(keycloak_group)
-        self.groups[name] = True
-
-        if 'subGroups' in group:
-            for sub_group in group['subGroups']:
-                self.get_subgroup(sub_group, keycloak_group)
-
-    def generate_name(self, group: KeycloakGroup):
-        parents = []
-        iterator: KeycloakGroup = group
-        while iterator:
-            parents.append(iterator.name)
-            iterator = iterator.parent
-        parents.reverse()
-        name = '_'.join(parents)
-        return name
+        if plan and not self.dry_run and not self.force:
+            if not keycloak_tree:
+                print('')
+                print('Keycloak returned no groups, nothing applied. Use --force to apply anyway')
+                return plan
+            if len(plan.deletes) > self.max_deletes:
+                print('')
+                print(f'{len(plan.deletes)} groups would be deleted, nothing applied. Use --force to apply anyway')
+                return plan
+
+        if plan and not self.dry_run:
+            self.apply(plan)
+            print('')
+            print('Changes applied')
+        return plan
+
+    def plan(self, keycloak_tree: list[dict]) -> GroupSyncPlan:
+        plan = GroupSyncPlan()
+        django_groups = {group.keycloak_id: group for group in KeycloakGroup.objects.all()}
+        groups = {}
+
+        def walk(keycloak_groups: list[dict], parent: KeycloakGroup | None, parent_path: str):
+            for keycloak_group in keycloak_groups:
+                keycloak_id = keycloak_group['id']
+                path = keycloak_group.get('path') or f"{parent_path}/{keycloak_group['name']}"
+                plan.paths[keycloak_id] = path
+
+                group = django_groups.get(keycloak_id)
+                if group is None:
+                    group = KeycloakGroup(keycloak_id=keycloak_id, name=keycloak_group['name'], parent=parent)
+                    plan.creates.append(group)
+                else:
+                    if group.name != keycloak_group['name']:
+                        plan.renames.append((group, keycloak_group['name']))
+                    if group.parent_id != (parent and parent.id):
+                        plan.reparents.append((group, parent))
+                groups[keycloak_id] = group
+                walk(keycloak_group.get('subGroups', []), group, path)
+
+        walk(keycloak_tree, None, '')
+
+        plan.deletes = [group for keycloak_id, group in django_groups.items()
+                        if keycloak_id and keycloak_id not in groups]
+        self.plan_scout_hierarchies(plan, groups)
+        return plan
+
+    def plan_scout_hierarchies(self, plan: GroupSyncPlan, groups: dict):
+        groups_by_path = {path: groups[keycloak_id] for keycloak_id, path in plan.paths.items()}
+        deleted = {group.id for group in plan.deletes}
+        scout_hierarchies = ScoutHierarchy.objects.select_related('level').in_bulk()
+        for scout_hierarchy in scout_hierarchies.values():
+            if scout_hierarchy.path:
+                scout_hierarchy.__dict__['ancestors'] = [
+                    scout_hierarchies[obj_id] for obj_id in scout_hierarchy.path_ids if obj_id in scout_hierarchies
+                ]
+
+        assigned = {}
+        for scout_hierarchy in scout_hierarchies.values():
+            if scout_hierarchy.keycloak_id and scout_hierarchy.keycloak_id not in deleted:
+                assigned[scout_hierarchy.keycloak_id] = scout_hierarchy
+                continue
+            try:
+                group = groups_by_path.get(scout_hierarchy.keycloak_group_name)
+            except (KeyError, AttributeError):
+                continue
+            if group and group.id not in assigned:
+                plan.assignments.append((scout_hierarchy, group))
+                assigned[group.id] = scout_hierarchy
+
+        groups_by_id = {group.id: group for group in groups.values()}
+        plan.memberships = [
+            groups_by_id[group_id] for group_id in assigned
+            if group_id in groups_by_id and not groups_by_id[group_id].membership_allowed
+        ]
+
+    @transaction.atomic
+    def apply(self, plan: GroupSyncPlan):
+        KeycloakGroup.objects.bulk_create(plan.creates)
+
+        for group, name in plan.renames:
+            group.name = name
+        for group, parent in plan.reparents:
+            group.parent = parent
+        for group in plan.memberships:
+            group.membership_allowed = True
+        changed = {group.id: group for group, _ in [*plan.renames, *plan.reparents]}
+        changed.update({group.id: group for group in plan.memberships})
+        KeycloakGroup.objects.bulk_update(changed.values(), ['name', 'parent', 'membership_allowed'])
+
+        if plan.deletes:
+            # the cascade sends post_delete for every group, which would call keycloak per group
+            with keycloak_group_signals_disabled():
+                KeycloakGroup.objects.filter(id__in=[group.id for group in plan.deletes]).delete()
+
+        for scout_hierarchy, group in plan.assignments:
+            scout_hierarchy.keycloak = group
+        ScoutHierarchy.objects.bulk_update([scout_hierarchy for scout_hierarchy, _ in plan.assignments], ['keycloak'])
+
+        invalidate_tree_snapshot()
@@ -0,0 +1,207 @@
+"""
+Immutable in-memory snapshot of the ScoutHierarchy and KeycloakGroup trees.
+
+Both trees are small and change rarely, but are read on almost every request. The snapshot
+is built once per worker and rebuilt when the version stored in the shared django cache changes,
+which happens once a save or delete of a tree node or a keycloak group sync is committed. Changes
+which bypass the signals, like queryset updates, show up once the snapshot is older than
+TREE_SNAPSHOT_MAX_AGE seconds.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+TREE_SNAPSHOT_VERSION_KEY = 'tree_snapshot_version'
+
+
+@dataclass(frozen=True)
+class ScoutHierarchyNode:
+    id: int
+    name: str
+    parent_id: Optional[int]
+    level_id: Optional[int]
+    level_name: Optional[str]
+    ancestor_ids: Tuple[int, ...]
+    child_ids: Tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class KeycloakGroupNode:
+    id: str
+    keycloak_id: str
+    name: str
+    parent_id: Optional[str]
+    ancestor_ids: Tuple[str, ...]
+    child_ids: Tuple[str, ...]
+    display_name: str
+
+
+def _link(rows: dict) -> Tuple[dict, dict]:
+    """
+    Returns the ancestor ids (root first, including the node itself) and child ids of every node.
+    """
+    children = {node_id: [] for node_id in rows}
+    for node_id, row in rows.items():
+        if row['parent_id'] in children:
+            children[row['parent_id']].append(node_id)
+
+    ancestors = {}
+
+    def get_ancestors(node_id):
+        if node_id not in ancestors:
+            parent_id = rows[node_id]['parent_id']
+            parent_ancestors = get_ancestors(parent_id) if parent_id in rows else ()
+            ancestors[node_id] = parent_ancestors + (node_id,)
+        return ancestors[node_id]
+
+    for node_id in rows:
+        get_ancestors(node_id)
+    return ancestors, {node_id: tuple(child_ids) for node_id, child_ids in children.items()}
+
+
+@dataclass(frozen=True)
+class TreeSnapshot:
+    version: Optional[int]
+    scout_hierarchies: Dict[int, ScoutHierarchyNode]
+    keycloak_groups: Dict[str, KeycloakGroupNode]
+    keycloak_groups_by_keycloak_id: Dict[str, KeycloakGroupNode]
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() - self.loaded_at > settings.TREE_SNAPSHOT_MAX_AGE
+
+    @classmethod
+    def load(cls, version):
+        from basic.models import ScoutHierarchy
+        from keycloak_auth.models import KeycloakGroup
+
+        hierarchy_rows = {
+            row['id']: row for row in ScoutHierarchy.objects.values(
+                'id', 'name', 'parent_id', 'level_id', 'level__name', 'keycloak_id')
+        }
+        ancestors, children = _link(hierarchy_rows)
+        scout_hierarchies = {
+            obj_id: ScoutHierarchyNode(
+                id=obj_id,
+                name=row['name'],
+                parent_id=row['parent_id'],
+                level_id=row['level_id'],
+                level_name=row['level__name'],
+                ancestor_ids=ancestors[obj_id],
+                child_ids=children[obj_id],
+            )
+            for obj_id, row in hierarchy_rows.items()
+        }
+        hierarchy_of_group = {
+            str(row['keycloak_id']): scout_hierarchies[obj_id]
+            for obj_id, row in hierarchy_rows.items() if row['keycloak_id']
+        }
+
+        group_rows = {}
+        for row in KeycloakGroup.objects.values('id', 'keycloak_id', 'name', 'parent_id'):
+            row['id'] = str(row['id'])
+            row['parent_id'] = row['parent_id'] and str(row['parent_id'])
+            group_rows[row['id']] = row
+        ancestors, children = _link(group_rows)
+        keycloak_groups = {
+            group_id: KeycloakGroupNode(
+                id=group_id,
+                keycloak_id=row['keycloak_id'],
+                name=row['name'],
+                parent_id=row['parent_id'],
+                ancestor_ids=ancestors[group_id],
+                child_ids=children[group_id],
+                display_name=cls._group_display_name(row, group_rows, hierarchy_of_group),
+            )
+            for group_id, row in group_rows.items()
+        }
+        return cls(
+            version=version,
+            scout_hierarchies=scout_hierarchies,
+            keycloak_groups=keycloak_groups,
+            keycloak_groups_by_keycloak_id={node.keycloak_id: node for node in keycloak_groups.values()},
+        )
+
+    @staticmethod
+    def _group_display_name(row, group_rows, hierarchy_of_group) -> str:
+        scout_hierarchy = hierarchy_of_group.get(row['id'])
+        if scout_hierarchy:
+            return scout_hierarchy.name
+
+        parent = group_rows.get(row['parent_id'])
+        if parent:
+            parent_hierarchy = hierarchy_of_group.get(parent['id'])
+            if parent_hierarchy:
+                return f"{row['name']} <- {parent_hierarchy.level_name} - {parent_hierarchy.name}"
+            return f"{row['name']} <- {parent['name']}"
+
+        return row['name']
+
+    def get_scout_hierarchy_ancestor(self, obj_id: int, level_id: int = None,
+                                     level_name: str = None) -> Optional[ScoutHierarchyNode]:
+        """
+        Returns the nearest organisation above or equal to the given one with the given level.
+        """
+        node = self.scout_hierarchies.get(obj_id)
+        if node is None:
+            return None
+        for ancestor_id in reversed(node.ancestor_ids):
+            ancestor = self.scout_hierarchies[ancestor_id]
+            if (level_id is not None and ancestor.level_id == level_id) \
+                    or (level_name is not None and ancestor.level_name == level_name):
+                return ancestor
+        return None
+
+    def get_keycloak_group_ancestor_ids(self, keycloak_ids) -> set:
+        """
+        Returns the django ids of the groups with the given keycloak ids and of all their parents.
+        """
+        ancestor_ids = set()
+        for keycloak_id in keycloak_ids:
+            node = self.keycloak_groups_by_keycloak_id.get(keycloak_id)
+            if node:
+                ancestor_ids.update(node.ancestor_ids)
+        return ancestor_ids
+
+    def get_keycloak_group_children(self, group_id) -> list[KeycloakGroupNode]:
+        node = self.keycloak_groups.get(str(group_id))
+        if node is None:
+            return []
+        return [self.keycloak_groups[child_id] for child_id in node.child_ids]
+
+
+_snapshot: Optional[TreeSnapshot] = None
+
+
+def get_tree_snapshot() -> TreeSnapshot:
+    global _snapshot
+    version = cache.get(TREE_SNAPSHOT_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(TREE_SNAPSHOT_VERSION_KEY, version, None):
+            version = cache.get(TREE_SNAPSHOT_VERSION_KEY)
+
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version or snapshot.expired:
+        snapshot = TreeSnapshot.load(version)
+        _snapshot = snapshot
+    return snapshot
+
+
+def invalidate_tree_snapshot():
+    """
+    Bumps the version once the current transaction is committed, so no process loads the
+    snapshot from the old rows under the new version.
+    """
+    transaction.on_commit(_bump_tree_snapshot_version)
+
+
+def _bump_tree_snapshot_version():
+    global _snapshot
+    _snapshot = None
+    cache.set(TREE_SNAPSHOT_VERSION_KEY, time.time_ns(), None)
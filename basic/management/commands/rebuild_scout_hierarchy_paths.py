@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from basic.helper.tree_snapshot import invalidate_tree_snapshot
+from basic.models import ScoutHierarchy
+
+
+class Command(BaseCommand):
+    help = 'rebuild the paths of all scout hierarchies, e.g. after loaddata'
+
+    def handle(self, *args, **options):
+        count = ScoutHierarchy.rebuild_paths()
+        invalidate_tree_snapshot()
+        self.stdout.write(f'{count} paths rebuilt')
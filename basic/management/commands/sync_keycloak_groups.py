@@ -6,5 +6,11 @@ from basic.helper.sync_keycloak_groups import SyncKeycloakGroups
 class Command(BaseCommand):
     help = 'check keycloak groups'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', dest='dry_run',
+                            help='Only print the changes without applying them')
+        parser.add_argument('--force', action='store_true', dest='force',
+                            help='Apply the changes even if keycloak returned no groups or many groups are deleted')
+
     def handle(self, *args, **options):
-        SyncKeycloakGroups().run()
+        SyncKeycloakGroups(options['dry_run'], options['force']).run()
@@ -1,13 +1,12 @@
 # Generated by Django 4.1.9 on 2023-08-18 17:27
 
 from django.db import migrations
-from basic.helper.initialize_keycloak_scout_hierarchies import InitKeycloakScoutHierarchies
-from basic.helper.sync_keycloak_groups import SyncKeycloakGroups
 
-def init_scout_hierarchies(apps, schema_editor):
-    InitKeycloakScoutHierarchies().run()
-    SyncKeycloakGroups().run()
 
+# The keycloak groups used to be deployed here. The helpers use the live ScoutHierarchy model, which breaks
+# as soon as a later migration adds a column, so the deploy step now runs on its own after migrate:
+#   python manage.py initialize_scout_hierarchies_in_keycloak
+#   python manage.py sync_keycloak_groups
 class Migration(migrations.Migration):
 
     dependencies = [
@@ -15,5 +14,5 @@ class Migration(migrations.Migration):
     ]
 
     operations = [
-        migrations.RunPython(init_scout_hierarchies)
+        migrations.RunPython(migrations.RunPython.noop, migrations.RunPython.noop)
     ]
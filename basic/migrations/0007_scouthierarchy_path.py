@@ -0,0 +1,34 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:04
+
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    ScoutHierarchy = apps.get_model('basic', 'ScoutHierarchy')
+    parents = dict(ScoutHierarchy.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def get_path(obj_id):
+        if obj_id not in paths:
+            parent_id = parents.get(obj_id)
+            paths[obj_id] = f'{get_path(parent_id) if parent_id else "/"}{obj_id}/'
+        return paths[obj_id]
+
+    for obj_id in parents:
+        ScoutHierarchy.objects.filter(id=obj_id).update(path=get_path(obj_id))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0006_alter_frontendtheme_accent_alter_frontendtheme_error_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scouthierarchy',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
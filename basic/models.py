@@ -1,8 +1,18 @@
+from __future__ import annotations
+
+from functools import cached_property, reduce
+from operator import or_
+
 from colorfield.fields import ColorField
 from django.db import models
+from django.db.models import Q, Value
+from django.db.models.functions import Concat, Substr
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 from backend.timestamp_mixin import TimeStampMixin
 from basic.choices import DescriptionType, StateChoices, ScoutOrganisationLevelChoices
+from basic.helper.tree_snapshot import invalidate_tree_snapshot
 from keycloak_auth.models import KeycloakGroup
 
 
@@ -64,19 +74,124 @@ class ScoutHierarchy(TimeStampMixin):
     abbreviation = models.CharField(max_length=5, blank=True, null=True)
     full_name = models.CharField(max_length=200, blank=True, null=True)
     keycloak = models.OneToOneField(KeycloakGroup, on_delete=models.SET_NULL, null=True, blank=True)
+    # readonly, ids from the root down to this organisation, e.g. /1/4/23/, maintained on save
+    path = models.CharField(max_length=255, blank=True, default='', db_index=True, editable=False)
 
-    def __generate_tree_name(self, lower: bool = True) -> str:
-        if lower:
-            name = self.name.lower()
-            seperator = '_'
+    @property
+    def path_ids(self) -> list[int]:
+        return [int(obj_id) for obj_id in self.path.strip('/').split('/') if obj_id]
+
+    @cached_property
+    def ancestors(self) -> list[ScoutHierarchy]:
+        """
+        All organisations from the root down to this one (including itself), loaded with one query.
+        """
+        if not self.path:
+            ancestors = []
+            iterator: ScoutHierarchy = self
+            while iterator is not None:
+                ancestors.insert(0, iterator)
+                iterator = iterator.parent
+            return ancestors
+        by_id = ScoutHierarchy.objects.filter(id__in=self.path_ids).select_related('level').in_bulk()
+        return [by_id[obj_id] for obj_id in self.path_ids if obj_id in by_id]
+
+    def get_ancestor(self, level_id: int = None, level_name: str = None) -> ScoutHierarchy | None:
+        """
+        Returns the nearest organisation above or equal to this one with the given level.
+        """
+        for ancestor in reversed(self.ancestors):
+            if ancestor.level and (ancestor.level.id == level_id or ancestor.level.name == level_name):
+                return ancestor
+        return None
+
+    @staticmethod
+    def subtree_filter(organisations, lookup: str = '') -> Q:
+        """
+        Q object matching every object whose organisation (reached via lookup, e.g.
+        'scout_organisation__') is one of the given organisations or lies below them.
+        """
+        conditions = [
+            Q(**{f'{lookup}path__startswith': organisation.path})
+            if organisation.path else Q(**{f'{lookup}id': organisation.id})
+            for organisation in organisations
+        ]
+        return reduce(or_, conditions, Q(**{f'{lookup}id__in': []}))
+
+    def update_path(self):
+        """
+        Sets the path after a save and moves the paths of all organisations below along.
+        """
+        path = f'{self.get_parent_path()}{self.id}/'
+        old_path = ScoutHierarchy.objects.filter(id=self.id).values_list('path', flat=True).first()
+        self.path = path
+        if path == old_path:
+            return
+
+        ScoutHierarchy.objects.filter(id=self.id).update(path=path)
+        if old_path:
+            ScoutHierarchy.objects.filter(path__startswith=old_path).exclude(id=self.id).update(
+                path=Concat(Value(path), Substr('path', len(old_path) + 1))
+            )
         else:
-            name = self.name
-            seperator = '/'
+            # children saved before this organisation, e.g. by loaddata, have no path prefix to replace
+            self.update_descendant_paths()
+        self.__dict__.pop('ancestors', None)
+
+    def get_parent_path(self) -> str:
+        """
+        Path of the parent, built from the parent chain as long as the parents have no path yet.
+        """
+        ids = []
+        parent_id = self.parent_id
+        while parent_id and parent_id not in ids and parent_id != self.id:
+            parent_path, next_parent_id = ScoutHierarchy.objects.filter(id=parent_id) \
+                .values_list('path', 'parent_id').first() or ('', None)
+            if parent_path:
+                return f'{parent_path}{"".join(f"{obj_id}/" for obj_id in ids)}'
+            ids.insert(0, parent_id)
+            parent_id = next_parent_id
+        return f'/{"".join(f"{obj_id}/" for obj_id in ids)}'
+
+    def update_descendant_paths(self):
+        """
+        Sets the paths of all organisations below, found by their parent.
+        """
+        paths = {self.id: self.path}
+        parent_ids = [self.id]
+        while parent_ids:
+            children = ScoutHierarchy.objects.filter(parent_id__in=parent_ids) \
+                .exclude(id__in=paths.keys()).values_list('id', 'parent_id')
+            parent_ids = []
+            for obj_id, parent_id in children:
+                paths[obj_id] = f'{paths[parent_id]}{obj_id}/'
+                ScoutHierarchy.objects.filter(id=obj_id).update(path=paths[obj_id])
+                parent_ids.append(obj_id)
+
+    @staticmethod
+    def rebuild_paths():
+        """
+        Sets the paths of all organisations from their parents, like migration 0007.
+        """
+        parents = dict(ScoutHierarchy.objects.values_list('id', 'parent_id'))
+        paths = {}
+
+        def get_path(obj_id):
+            if obj_id not in paths:
+                paths[obj_id] = ''
+                parent_id = parents.get(obj_id)
+                paths[obj_id] = f'{get_path(parent_id) if parent_id else "/"}{obj_id}/'
+            return paths[obj_id]
+
+        for obj_id in parents:
+            ScoutHierarchy.objects.filter(id=obj_id).update(path=get_path(obj_id))
+        return len(paths)
 
-        if self.parent:
-            return f'{self.parent.__generate_tree_name(lower)}{seperator}{name}'
+    def __generate_tree_name(self, lower: bool = True) -> str:
+        if lower:
+            return '_'.join(ancestor.name.lower() for ancestor in self.ancestors)
         else:
-            return name
+            return '/'.join(ancestor.name for ancestor in self.ancestors)
 
     @property
     def keycloak_role_name(self) -> str:
@@ -88,10 +203,8 @@ class ScoutHierarchy(TimeStampMixin):
             4: 'Ringe',
             5: 'Stämme'
         }
-        if self.parent:
-            return f'{self.parent.generate_group_tree()}/{level_dict[self.level.id]}/{self.name}'
-        else:
-            return self.name
+        root, *ancestors = self.ancestors
+        return '/'.join([root.name, *(f'{level_dict[ancestor.level.id]}/{ancestor.name}' for ancestor in ancestors)])
 
     @property
     def keycloak_group_name(self) -> str:
@@ -103,19 +216,13 @@ class ScoutHierarchy(TimeStampMixin):
 
     @property
     def bund(self):
-        iterator: ScoutHierarchy = self
-        while iterator is not None:
-            if iterator.level.name == 'Bund':
-                return iterator.name
-            iterator = iterator.parent
+        bund = self.get_ancestor(level_name='Bund')
+        return bund and bund.name
 
     @property
     def verband(self):
-        iterator: ScoutHierarchy = self
-        while iterator is not None:
-            if iterator.level.name == 'Verband':
-                return iterator.name
-            iterator = iterator.parent
+        verband = self.get_ancestor(level_name='Verband')
+        return verband and verband.name
 
     def __str__(self):
         return f"{self.level} - {self.name}"
@@ -154,3 +261,18 @@ class FrontendTheme(models.Model):
 
     def __str__(self):
         return self.name
+
+
+# pylint: disable=unused-argument
+@receiver(post_save, sender=ScoutHierarchy)
+def update_scout_hierarchy_path(sender, instance: ScoutHierarchy, **kwargs):
+    instance.update_path()
+    invalidate_tree_snapshot()
+
+
+# pylint: disable=unused-argument
+@receiver(post_delete, sender=ScoutHierarchy)
+@receiver(post_save, sender=ScoutOrgaLevel)
+@receiver(post_delete, sender=ScoutOrgaLevel)
+def invalidate_scout_hierarchy_snapshot(sender, **kwargs):
+    invalidate_tree_snapshot()
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from basic import models as basic_models
+from basic.helper.tree_snapshot import get_tree_snapshot
 
 """
 # noqa turn off pycharm warnings about missing abstract methods, which is a bug of pycharm
@@ -8,21 +9,16 @@ from basic import models as basic_models
 
 def get_parent_scout_organisation(obj: basic_models.ScoutHierarchy, filter_level: str) -> str:
     if isinstance(obj, basic_models.ScoutHierarchy):
-        iterator: basic_models.ScoutHierarchy = obj
-        while iterator is not None:
-            if iterator.level.name == filter_level:
-                return iterator.name
-            iterator = iterator.parent
-
+        parent = get_tree_snapshot().get_scout_hierarchy_ancestor(obj.id, level_name=filter_level)
+        if parent:
+            return parent.name
     return ''
 
 def get_parent_scout_organisation_by_id(obj: basic_models.ScoutHierarchy, filter_id: int) -> str:
     if isinstance(obj, basic_models.ScoutHierarchy):
-        iterator: basic_models.ScoutHierarchy = obj
-        while iterator is not None:
-            if iterator.level.id == filter_id:
-                return iterator.name
-            iterator = iterator.parent
+        parent = get_tree_snapshot().get_scout_hierarchy_ancestor(obj.id, level_id=filter_id)
+        if parent:
+            return parent.name
     return ''
 
 
@@ -137,7 +133,7 @@ class ScoutHierarchyDetailedSerializer(serializers.ModelSerializer):
         return get_parent_scout_organisation(obj, 'Stamm')
 
     def get_display_name(self, obj: basic_models.ScoutHierarchy) -> str:
-        display_parent_id = obj.level.id - 1
+        display_parent_id = obj.level_id - 1
 
         # handle Ringe as Bund
         display_parent_id_2 = display_parent_id if display_parent_id != 4 else 3
@@ -59,6 +59,7 @@ class IngredientAdmin(admin.ModelAdmin):
         "nutri_points_fibre_g",
         "nutri_points_fat_sat_g",
         "nutri_points_protein_g",
+        "price_per_kg",
     )
     search_fields = ["name"]
     ordering = ["name"]
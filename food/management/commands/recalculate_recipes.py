@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from food.service.recipe_logic import RecipeModule
+from food.tasks import recalculate_recipes_of_ingredients
+
+
+class Command(BaseCommand):
+    help = 'recalculate the nutrients and nutri points of all recipes using the given ingredients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ingredient', type=int, action='append', dest='ingredient_ids',
+                            help='id of a changed ingredient, all recipes are recalculated if omitted')
+        parser.add_argument('--celery', action='store_true',
+                            help='run the recalculation as celery task')
+
+    def handle(self, *args, **options):
+        ingredient_ids = options['ingredient_ids']
+        if options['celery']:
+            recalculate_recipes_of_ingredients.delay(ingredient_ids)
+            self.stdout.write('Recalculation queued')
+            return
+        count = RecipeModule().recalculate_recipes_of_ingredients(ingredient_ids)
+        self.stdout.write(f'Recalculated {count} recipes')
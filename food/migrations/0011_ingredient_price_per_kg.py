@@ -0,0 +1,31 @@
+# Generated by Django 4.2.11 on 2026-10-18 07:56
+
+from django.db import migrations, models
+from django.db.models import Avg
+
+
+def fill_ingredient_prices(apps, schema_editor):
+    Ingredient = apps.get_model('food', 'Ingredient')
+    Price = apps.get_model('food', 'Price')
+    averages = Price.objects \
+        .values_list('package__portion__ingredient_id') \
+        .annotate(avg=Avg('price_per_kg')) \
+        .order_by()
+    for ingredient_id, avg in averages:
+        Ingredient.objects.filter(id=ingredient_id).update(price_per_kg=avg or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0010_alter_meal_meal_type_alter_recipe_meal_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='price_per_kg',
+            field=models.FloatField(blank=True, default=0),
+        ),
+        migrations.RunPython(fill_ingredient_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,141 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:01
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+ROLLUP_FIELDS = ['energy_kj', 'weight_g', 'price_eur', 'nutri_points_weight_g']
+
+
+def fill_rollups(apps, schema_editor):
+    Recipe = apps.get_model('food', 'Recipe')
+    RecipeItem = apps.get_model('food', 'RecipeItem')
+    MealItem = apps.get_model('food', 'MealItem')
+    Meal = apps.get_model('food', 'Meal')
+    MealDay = apps.get_model('food', 'MealDay')
+    MealEvent = apps.get_model('food', 'MealEvent')
+
+    totals = {}
+    recipe_items = RecipeItem.objects.values_list(
+        'recipe_id', 'weight_g', 'nutri_points', 'portion__ingredient__price_per_kg')
+    for recipe_id, weight_g, nutri_points, price_per_kg in recipe_items:
+        weight_g = weight_g or 0
+        price_eur, nutri_points_weight_g = totals.get(recipe_id, (0, 0))
+        totals[recipe_id] = (
+            price_eur + round((price_per_kg or 0) * (weight_g / 1000), 2),
+            nutri_points_weight_g + weight_g * (nutri_points or 0),
+        )
+    for recipe_id, (price_eur, nutri_points_weight_g) in totals.items():
+        Recipe.objects.filter(id=recipe_id).update(price_eur=price_eur, nutri_points_weight_g=nutri_points_weight_g)
+
+    # the stored energy and weight of a recipe are rounded, meals sum the recipe items instead
+    recipe_sums = {
+        row['recipe_id']: row
+        for row in RecipeItem.objects.values('recipe_id')
+        .annotate(energy_kj=Sum('energy_kj'), weight_g=Sum('weight_g')).order_by()
+    }
+    meal_totals = {}
+    meal_items = MealItem.objects.values_list('meal_id', 'recipe_id', 'factor')
+    for meal_id, recipe_id, factor in meal_items:
+        recipe = recipe_sums.get(recipe_id, {})
+        price_eur, nutri_points_weight_g = totals.get(recipe_id, (0, 0))
+        values = {
+            'energy_kj': recipe.get('energy_kj') or 0,
+            'weight_g': recipe.get('weight_g') or 0,
+            'price_eur': price_eur,
+            'nutri_points_weight_g': nutri_points_weight_g,
+        }
+        meal = meal_totals.setdefault(meal_id, dict.fromkeys(ROLLUP_FIELDS, 0))
+        for field, value in values.items():
+            meal[field] += value * (factor or 0)
+    for meal_id, meal in meal_totals.items():
+        Meal.objects.filter(id=meal_id).update(**meal)
+
+    levels = [
+        (MealDay, Meal, 'meal_day_id'),
+        (MealEvent, MealDay, 'meal_event_id'),
+    ]
+    for model, children, parent_field in levels:
+        aggregates = {field: Sum(field) for field in ROLLUP_FIELDS}
+        for row in children.objects.values(parent_field).annotate(**aggregates).order_by():
+            model.objects.filter(id=row[parent_field]).update(
+                **{field: row[field] or 0 for field in ROLLUP_FIELDS})
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0011_ingredient_price_per_kg'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meal',
+            name='energy_kj',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='nutri_points_weight_g',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='price_eur',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='weight_g',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mealday',
+            name='energy_kj',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mealday',
+            name='nutri_points_weight_g',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mealday',
+            name='price_eur',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mealday',
+            name='weight_g',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mealevent',
+            name='energy_kj',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mealevent',
+            name='nutri_points_weight_g',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mealevent',
+            name='price_eur',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mealevent',
+            name='weight_g',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='nutri_points_weight_g',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='price_eur',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,7 @@ import datetime
 
 from django.db import models
 from django.db.models import Sum
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 
@@ -10,6 +10,7 @@ from food.service.nutri_lib import Nutri
 from food.service.recipe_logic import RecipeModule
 from food.service.hint import HintModule
 from food.service.price_logic import PriceModule
+from food.service.rollup_logic import RollupModule
 from anmelde_tool.event import models as event_models
 
 User = get_user_model()
@@ -75,6 +76,21 @@ class NutriPointsMixin(models.Model):
         abstract = True
 
 
+class RollupMixin(models.Model):
+    # readonly, totals of all meal items below, maintained by RollupModule
+    energy_kj = models.FloatField(default=0, editable=False)
+    weight_g = models.FloatField(default=0, editable=False)
+    price_eur = models.FloatField(default=0, editable=False)
+    nutri_points_weight_g = models.FloatField(default=0, editable=False)
+
+    @property
+    def rollup_nutri_points(self):
+        return self.nutri_points_weight_g / self.weight_g if self.weight_g else 0
+
+    class Meta:
+        abstract = True
+
+
 class MeasuringUnit(TimeStampMixin):
     class Units(models.TextChoices):
         VOLUME = "ml", "Millilitter"
@@ -148,6 +164,7 @@ class Ingredient(TimeStampMixin, NutrientsMixin, NutriPointsMixin):
     nutri_points = models.IntegerField(null=True, blank=True)
     nutri_class = models.FloatField(null=True, blank=True)
     ndb_number = models.IntegerField(null=True, blank=True)
+    price_per_kg = models.FloatField(default=0, blank=True)
 
     def __str__(self):
         return f"{self.name} - {self.description}"
@@ -285,6 +302,8 @@ class Recipe(TimeStampMixin, NutrientsMixin):
     nutri_class = models.FloatField(null=True, blank=True)
     nutri_points = models.FloatField(null=True, blank=True)
     weight_g = models.FloatField(default=1)
+    price_eur = models.FloatField(default=0, editable=False)
+    nutri_points_weight_g = models.FloatField(default=0, editable=False)
     hints = models.ManyToManyField(Hint, blank=True)
     created_by = models.ManyToManyField(
         User, related_name="recipe_created_by", blank=True
@@ -307,6 +326,7 @@ class Recipe(TimeStampMixin, NutrientsMixin):
         super(Recipe, self).save(*args, **kwargs)
 
         HintClass.add_hints(self)
+        RollupModule().update_recipes([self.id])
 
 
 class RecipeItem(TimeStampMixin, NutrientsMixin, NutriPointsMixin):
@@ -345,6 +365,7 @@ class RecipeItem(TimeStampMixin, NutrientsMixin, NutriPointsMixin):
         RecipeClass.recipe_nutri(self.recipe)
 
         HintClass.add_hints(self.recipe)
+        RollupModule().update_recipes([self.recipe_id])
 
     def delete(self, *args, **kwargs):
         RecipeClass = RecipeModule()
@@ -358,6 +379,7 @@ class RecipeItem(TimeStampMixin, NutrientsMixin, NutriPointsMixin):
         RecipeClass.recipe_nutri(self.recipe)
 
         HintClass.add_hints(self.recipe)
+        RollupModule().update_recipes([self.recipe_id])
 
 
 class Retailer(TimeStampMixin):
@@ -436,7 +458,7 @@ class PhysicalActivityLevel(TimeStampMixin):
         return self.__str__()
 
 
-class MealEvent(TimeStampMixin):
+class MealEvent(TimeStampMixin, RollupMixin):
     event = models.ForeignKey(
         event_models.Event, on_delete=models.PROTECT, null=True, blank=True
     )
@@ -459,7 +481,7 @@ class MealEvent(TimeStampMixin):
         return self.__str__()
 
 
-class MealDay(TimeStampMixin):
+class MealDay(TimeStampMixin, RollupMixin):
     meal_event = models.ForeignKey(MealEvent, on_delete=models.CASCADE, null=True)
     date = models.DateField(null=True)
     max_day_part_factor = models.FloatField(default=1)
@@ -472,7 +494,7 @@ class MealDay(TimeStampMixin):
         return self.__str__()
 
 
-class Meal(TimeStampMixin):
+class Meal(TimeStampMixin, RollupMixin):
     name = models.CharField(default="Hauptessen", max_length=255, null=True, blank=True)
     meal_day = models.ForeignKey(MealDay, on_delete=models.CASCADE, null=True)
     day_part_factor = models.FloatField(default=0.33)
@@ -620,3 +642,123 @@ def post_save_recipe(sender, instance, created, **kwargs):
 
         if created:
             Portion.objects.create(ingredient=instance, name=f"{instance.name} in g")
+
+
+
+# pylint: disable=unused-argument
+@receiver(post_save, sender=Price)
+@receiver(post_delete, sender=Price)
+def update_price_index_of_price(sender, instance: Price, **kwargs):
+    PriceModule().update_ingredient_prices(
+        Portion.objects.filter(package__id=instance.package_id).values_list("ingredient_id", flat=True)
+    )
+
+
+# pylint: disable=unused-argument
+@receiver(pre_save, sender=Package)
+def remember_package_portion(sender, instance: Package, **kwargs):
+    instance.previous_portion_id = (
+        Package.objects.filter(id=instance.pk).values_list("portion_id", flat=True).first()
+        if instance.pk
+        else None
+    )
+
+
+# pylint: disable=unused-argument
+@receiver(post_save, sender=Package)
+def update_price_index_of_package(sender, instance: Package, created, **kwargs):
+    if created or instance.previous_portion_id == instance.portion_id:
+        return
+    PriceModule().update_ingredient_prices(
+        Portion.objects.filter(
+            id__in=[instance.previous_portion_id, instance.portion_id]
+        ).values_list("ingredient_id", flat=True)
+    )
+
+
+# pylint: disable=unused-argument
+@receiver(pre_save, sender=Portion)
+def remember_portion_ingredient(sender, instance: Portion, **kwargs):
+    instance.previous_ingredient_id = (
+        Portion.objects.filter(id=instance.pk).values_list("ingredient_id", flat=True).first()
+        if instance.pk
+        else None
+    )
+
+
+# pylint: disable=unused-argument
+@receiver(post_save, sender=Portion)
+def update_price_index_of_portion(sender, instance: Portion, created, **kwargs):
+    if created or instance.previous_ingredient_id == instance.ingredient_id:
+        return
+    PriceModule().update_ingredient_prices([instance.previous_ingredient_id, instance.ingredient_id])
+
+
+# pylint: disable=unused-argument
+@receiver(pre_save, sender=MealItem)
+def remember_meal_item_meal(sender, instance: MealItem, **kwargs):
+    instance.previous_meal_id = (
+        MealItem.objects.filter(id=instance.pk).values_list("meal_id", flat=True).first()
+        if instance.pk
+        else None
+    )
+
+
+# pylint: disable=unused-argument
+@receiver(post_save, sender=MealItem)
+def update_rollup_of_meal_item(sender, instance: MealItem, **kwargs):
+    RollupModule().update_meals([instance.previous_meal_id, instance.meal_id])
+
+
+# pylint: disable=unused-argument
+@receiver(post_delete, sender=MealItem)
+def update_rollup_of_deleted_meal_item(sender, instance: MealItem, **kwargs):
+    RollupModule().update_meals([instance.meal_id])
+
+
+# pylint: disable=unused-argument
+@receiver(pre_save, sender=Meal)
+def remember_meal_day(sender, instance: Meal, **kwargs):
+    instance.previous_meal_day_id = (
+        Meal.objects.filter(id=instance.pk).values_list("meal_day_id", flat=True).first()
+        if instance.pk
+        else None
+    )
+
+
+# pylint: disable=unused-argument
+@receiver(post_save, sender=Meal)
+def update_rollup_of_meal(sender, instance: Meal, created, **kwargs):
+    if created or instance.previous_meal_day_id == instance.meal_day_id:
+        return
+    RollupModule().update_meal_days([instance.previous_meal_day_id, instance.meal_day_id])
+
+
+# pylint: disable=unused-argument
+@receiver(post_delete, sender=Meal)
+def update_rollup_of_deleted_meal(sender, instance: Meal, **kwargs):
+    RollupModule().update_meal_days([instance.meal_day_id])
+
+
+# pylint: disable=unused-argument
+@receiver(pre_save, sender=MealDay)
+def remember_meal_event(sender, instance: MealDay, **kwargs):
+    instance.previous_meal_event_id = (
+        MealDay.objects.filter(id=instance.pk).values_list("meal_event_id", flat=True).first()
+        if instance.pk
+        else None
+    )
+
+
+# pylint: disable=unused-argument
+@receiver(post_save, sender=MealDay)
+def update_rollup_of_meal_day(sender, instance: MealDay, created, **kwargs):
+    if created or instance.previous_meal_event_id == instance.meal_event_id:
+        return
+    RollupModule().update_meal_events([instance.previous_meal_event_id, instance.meal_event_id])
+
+
+# pylint: disable=unused-argument
+@receiver(post_delete, sender=MealDay)
+def update_rollup_of_deleted_meal_day(sender, instance: MealDay, **kwargs):
+    RollupModule().update_meal_events([instance.meal_event_id])
@@ -2,15 +2,86 @@ from rest_framework import serializers
 from food import models as food_models
 from food.service.nutri_lib import Nutri
 from food.service.agg_lib import AggLib
-from keycloak_auth.helper import get_groups_of_user
+from keycloak_auth.api_exceptions import NotAuthorized
+from keycloak_auth.helper import get_groups_of_request_user
 from keycloak_auth.models import KeycloakGroup
-from django.db.models import Sum, Count
+from django.db.models import Sum, Count, Manager, Prefetch
 
 from food import serializers as food_serializers
 from anmelde_tool.event import serializers as event_serializers
 from anmelde_tool.registration import serializers as registration_serializers
 
 
+FOOD_ADMIN_GROUP_NAMES = ["DPV AK Digitales", "FoodInspi"]
+
+
+def is_food_admin(request) -> bool:
+    """
+    Checks once per request whether the user is member of one of the food admin groups.
+    """
+    is_admin = getattr(request, "_is_food_admin", None)
+    if is_admin is None:
+        try:
+            child_ids = get_groups_of_request_user(request)
+        except NotAuthorized:
+            child_ids = []
+        is_admin = KeycloakGroup.objects.filter(
+            keycloak_id__in=child_ids, name__in=FOOD_ADMIN_GROUP_NAMES
+        ).exists()
+        request._is_food_admin = is_admin
+    return is_admin
+
+
+def related_objects(obj, accessor, *ordering):
+    """
+    Returns the objects of a reverse relation, taken from the prefetch cache when
+    the parent was loaded with prefetch_related, otherwise queried in the given order.
+    """
+    if accessor in getattr(obj, "_prefetched_objects_cache", {}):
+        return getattr(obj, accessor).all()
+    return getattr(obj, accessor).order_by(*ordering)
+
+
+class AllowEditListSerializer(serializers.ListSerializer):
+    """
+    Resolves allow_edit for all objects of a list with a single query and stores
+    the result in the serializer context, where AllowEditMixin picks it up.
+    """
+
+    def to_representation(self, data):
+        objects = list(data.all() if isinstance(data, Manager) else data)
+        self.child.resolve_allow_edit([obj.id for obj in objects])
+        return super().to_representation(objects)
+
+
+class AllowEditMixin:
+    allow_edit_lookup = "created_by"
+
+    def resolve_allow_edit(self, ids):
+        model = self.Meta.model
+        allow_edit = self.context.setdefault("allow_edit", {}).setdefault(model, {})
+        ids = [obj_id for obj_id in ids if obj_id not in allow_edit]
+        if not ids:
+            return allow_edit
+
+        request = self.context.get("request")
+        if not request or not request.user.is_authenticated:
+            editable_ids = set()
+        elif is_food_admin(request):
+            editable_ids = set(ids)
+        else:
+            editable_ids = set(
+                model.objects.filter(
+                    id__in=ids, **{self.allow_edit_lookup: request.user}
+                ).values_list("id", flat=True)
+            )
+        allow_edit.update({obj_id: obj_id in editable_ids for obj_id in ids})
+        return allow_edit
+
+    def get_allow_edit(self, obj) -> bool:
+        return self.resolve_allow_edit([obj.id])[obj.id]
+
+
 class MeasuringUnitSerializer(serializers.ModelSerializer):
     class Meta:
         model = food_models.MeasuringUnit
@@ -78,8 +149,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         )
 
     def get_portions(self, obj):
-        jjj = food_models.Portion.objects.filter(ingredient=obj.id)
-        return PortionSerializer(jjj, many=True).data
+        return PortionSerializer(obj.portion_set.all(), many=True).data
 
 
 class PortionReadSerializer(serializers.ModelSerializer):
@@ -142,30 +212,10 @@ class RecipeItemReadSerializer(serializers.ModelSerializer):
         )
 
     def get_price_per_kg(self, obj):
-        portions = food_models.Portion.objects.filter(
-            ingredient=obj.portion.ingredient.id
-        )
-        packages = food_models.Package.objects.filter(portion__in=portions)
-        data = food_models.Price.objects.filter(package__in=packages)
-        sum_value = 0
-        count = 0.000000000001
-        for item in PriceSerializer(data, many=True).data:
-            count = count + 1
-            sum_value = sum_value + item.get("price_per_kg")
-        return round(sum_value / count, 2)
+        return round(obj.portion.ingredient.price_per_kg, 2)
 
     def get_price(self, obj):
-        portions = food_models.Portion.objects.filter(
-            ingredient=obj.portion.ingredient.id
-        )
-        packages = food_models.Package.objects.filter(portion__in=portions)
-        data = food_models.Price.objects.filter(package__in=packages)
-        sum_value = 0
-        count = 0.000000000001
-        for item in PriceSerializer(data, many=True).data:
-            count = count + 1
-            sum_value = sum_value + (item.get("price_per_kg") * (obj.weight_g / 1000))
-        return round(sum_value / count, 2)
+        return round(obj.portion.ingredient.price_per_kg * (obj.weight_g / 1000), 2)
 
     def to_representation(self, instance):
         data = super(RecipeItemReadSerializer, self).to_representation(instance)
@@ -191,7 +241,7 @@ class RecipeItemCookingPlanReadSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(AllowEditMixin, serializers.ModelSerializer):
     hints = food_serializers.HintSerializer(many=True, required=False)
     tags = food_serializers.TagSerializer(many=True, required=False)
     recipe_items = RecipeItemReadSerializer(many=True, read_only=True)
@@ -199,6 +249,7 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = food_models.Recipe
+        list_serializer_class = AllowEditListSerializer
         fields = (
             "id",
             "name",
@@ -232,29 +283,10 @@ class RecipeSerializer(serializers.ModelSerializer):
             "allow_edit",
         )
 
-    def get_allow_edit(self, obj):
-        try:
-            request = self.context.get("request")
-            token = request.META.get("HTTP_AUTHORIZATION")
-            child_ids = get_groups_of_user(token, request.user.keycloak_id)
-            status_group = (
-                KeycloakGroup.objects.filter(keycloak_id__in=child_ids)
-                .filter(name__in=["DPV AK Digitales", "FoodInspi"])
-                .exists()
-            )
-            status_user = (
-                food_models.Recipe.objects.filter(id=obj.id)
-                .filter(created_by__id=request.user.id)
-                .exists()
-            )
-            return status_user or status_group
-        except:
-            return False
-
     def to_representation(self, instance):
         data = super(RecipeSerializer, self).to_representation(instance)
 
-        data["price_eur"] = AggLib.agg_recipe_sum(self, data, "price")
+        data["price_eur"] = instance.price_eur
         return data
 
 
@@ -419,7 +451,7 @@ class MealItemReadSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         data = super(MealItemReadSerializer, self).to_representation(instance)
-        data["price_eur"] = AggLib.agg_meal_items_sum(self, data, "price")
+        data["price_eur"] = instance.recipe.price_eur * instance.factor
         return data
 
 
@@ -482,29 +514,22 @@ class MealReadSerializer(serializers.ModelSerializer):
         )
 
     def get_meal_items(self, obj):
-        data = food_models.MealItem.objects.filter(meal=obj)
-        return MealItemReadSerializer(data, many=True).data
+        data = related_objects(obj, "mealitem_set")
+        return MealItemReadSerializer(data, many=True, context=self.context).data
 
     def to_representation(self, instance):
         NutriClass = Nutri()
         data = super(MealReadSerializer, self).to_representation(instance)
-        data["price_eur"] = AggLib.agg_meal_sum(self, data, "price")
+        data["price_eur"] = instance.price_eur
 
-        data["energy_kj"] = AggLib.agg_meal_sum(self, data, "energy_kj")
+        data["energy_kj"] = instance.energy_kj
 
         data["day_part_energy_kj"] = instance.day_part_factor and round(
             data["energy_kj"] / (11500 * instance.day_part_factor), 2
         )
 
-        data["weight_g"] = AggLib.agg_meal_sum(self, data, "weight_g")
-
-        if data["weight_g"] == 0:
-            data["nutri_points"] = 0
-        else:
-            data["nutri_points"] = (
-                AggLib.agg_meal_sum(self, data, ["weight_g", "nutri_points"])
-                / data["weight_g"]
-            )
+        data["weight_g"] = instance.weight_g
+        data["nutri_points"] = instance.rollup_nutri_points
 
         data["nutri_class"] = NutriClass.get_nutri_class("solid", data["nutri_points"])
         return data
@@ -528,57 +553,33 @@ class MealSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class MealDayReadSerializer(serializers.ModelSerializer):
+class MealDayReadSerializer(AllowEditMixin, serializers.ModelSerializer):
     meals = serializers.SerializerMethodField()
     allow_edit = serializers.SerializerMethodField()
+    allow_edit_lookup = "meal_event__created_by"
 
     class Meta:
         model = food_models.MealDay
+        list_serializer_class = AllowEditListSerializer
         fields = "__all__"
 
-    def get_allow_edit(self, obj):
-        try:
-            request = self.context.get("request")
-            token = request.META.get("HTTP_AUTHORIZATION")
-            child_ids = get_groups_of_user(token, request.user.keycloak_id)
-            status_group = (
-                KeycloakGroup.objects.filter(keycloak_id__in=child_ids)
-                .filter(name__in=["DPV AK Digitales", "FoodInspi"])
-                .exists()
-            )
-            status_user = (
-                food_models.Recipe.objects.filter(id=obj.id)
-                .filter(created_by__id=request.user.id)
-                .exists()
-            )
-            return status_user or status_group
-        except:
-            return False
-
     def get_meals(self, obj):
-        data = food_models.Meal.objects.filter(meal_day=obj).order_by("time_start")
-        return MealReadSerializer(data, many=True).data
+        data = related_objects(obj, "meal_set", "time_start")
+        return MealReadSerializer(data, many=True, context=self.context).data
 
     def to_representation(self, instance):
         NutriClass = Nutri()
         data = super(MealDayReadSerializer, self).to_representation(instance)
-        data["price_eur"] = AggLib.agg_meal_day_sum(self, data, "price")
+        data["price_eur"] = instance.price_eur
 
-        data["energy_kj"] = AggLib.agg_meal_day_sum(self, data, "energy_kj")
+        data["energy_kj"] = instance.energy_kj
 
         data["day_factors"] = AggLib.agg_day_factors(self, data)
 
         data["energy_kj_sum"] = round(float(data["max_day_part_factor"]) * 11595.15, 0)
 
-        data["weight_g"] = AggLib.agg_meal_day_sum(self, data, "weight_g")
-
-        if data["weight_g"] == 0:
-            data["nutri_points"] = 0
-        else:
-            data["nutri_points"] = (
-                AggLib.agg_meal_day_sum(self, data, ["weight_g", "nutri_points"])
-                / data["weight_g"]
-            )
+        data["weight_g"] = instance.weight_g
+        data["nutri_points"] = instance.rollup_nutri_points
 
         data["nutri_class"] = NutriClass.get_nutri_class("solid", data["nutri_points"])
         return data
@@ -598,19 +599,12 @@ class MealDayReadExtendedSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         NutriClass = Nutri()
         data = super(MealDayReadExtendedSerializer, self).to_representation(instance)
-        data["price_eur"] = AggLib.agg_meal_day_sum(self, data, "price")
+        data["price_eur"] = instance.price_eur
 
-        data["energy_kj"] = AggLib.agg_meal_day_sum(self, data, "energy_kj")
+        data["energy_kj"] = instance.energy_kj
 
-        data["weight_g"] = AggLib.agg_meal_day_sum(self, data, "weight_g")
-
-        if data["weight_g"] == 0:
-            data["nutri_points"] = 0
-        else:
-            data["nutri_points"] = (
-                AggLib.agg_meal_day_sum(self, data, ["weight_g", "nutri_points"])
-                / data["weight_g"]
-            )
+        data["weight_g"] = instance.weight_g
+        data["nutri_points"] = instance.rollup_nutri_points
 
         data["nutri_class"] = NutriClass.get_nutri_class("solid", data["nutri_points"])
         return data
@@ -622,7 +616,43 @@ class MealEventSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class MealEventReadSerializer(serializers.ModelSerializer):
+def prefetch_meal_event_tree(queryset):
+    """
+    Loads the whole tree rendered by MealEventReadSerializer (days, meals, meal items,
+    recipes, recipe items, portions and ingredients) with a fixed number of queries,
+    independent of the size of the event.
+    """
+    recipe_items = food_models.RecipeItem.objects.select_related(
+        "portion__ingredient", "portion__measuring_unit"
+    ).prefetch_related("portion__ingredient__tags", "portion__ingredient__portion_set")
+    meal_items = food_models.MealItem.objects.select_related("recipe").prefetch_related(
+        "recipe__hints",
+        "recipe__tags",
+        "recipe__created_by",
+        Prefetch("recipe__recipe_items", queryset=recipe_items),
+    )
+    meals = food_models.Meal.objects.order_by("time_start").prefetch_related(
+        Prefetch("mealitem_set", queryset=meal_items)
+    )
+    meal_days = food_models.MealDay.objects.order_by("date").prefetch_related(
+        Prefetch("meal_set", queryset=meals)
+    )
+    return queryset.select_related("event", "activity_factor").prefetch_related(
+        "created_by",
+        "event__responsible_persons",
+        "event__invited_groups",
+        Prefetch("mealday_set", queryset=meal_days),
+    )
+
+
+class MealEventListSerializer(AllowEditListSerializer):
+    def to_representation(self, data):
+        objects = list(data.all() if isinstance(data, Manager) else data)
+        self.child.resolve_tree_allow_edit(objects)
+        return super().to_representation(objects)
+
+
+class MealEventReadSerializer(AllowEditMixin, serializers.ModelSerializer):
     event = event_serializers.EventFoodSerializer(many=False, read_only=True)
     activity_factor = food_serializers.PhysicalActivityLevelSerializer(
         many=False, read_only=True
@@ -632,6 +662,7 @@ class MealEventReadSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = food_models.MealEvent
+        list_serializer_class = MealEventListSerializer
         fields = (
             "id",
             "event",
@@ -647,46 +678,44 @@ class MealEventReadSerializer(serializers.ModelSerializer):
             "event",
         )
 
-    def get_meal_days(self, obj):
-        jjj = food_models.MealDay.objects.filter(meal_event=obj).order_by("date")
-        return MealDayReadSerializer(jjj, many=True).data
+    def resolve_tree_allow_edit(self, meal_events):
+        """
+        Resolves allow_edit of all meal days and recipes below the given events at once,
+        so the nested serializers only read it from the shared context.
+        """
+        if not self.context.get("request"):
+            return
+        meal_days = [
+            meal_day
+            for meal_event in meal_events
+            for meal_day in related_objects(meal_event, "mealday_set", "date")
+        ]
+        recipe_ids = {
+            meal_item.recipe_id
+            for meal_day in meal_days
+            for meal in related_objects(meal_day, "meal_set", "time_start")
+            for meal_item in related_objects(meal, "mealitem_set")
+        }
+        MealDayReadSerializer(context=self.context).resolve_allow_edit(
+            [meal_day.id for meal_day in meal_days]
+        )
+        RecipeSerializer(context=self.context).resolve_allow_edit(recipe_ids)
 
-    def get_allow_edit(self, obj):
-        try:
-            request = self.context.get("request")
-            token = request.META.get("HTTP_AUTHORIZATION")
-            child_ids = get_groups_of_user(token, request.user.keycloak_id)
-            status_group = (
-                KeycloakGroup.objects.filter(keycloak_id__in=child_ids)
-                .filter(name__in=["DPV AK Digitales", "FoodInspi"])
-                .exists()
-            )
-            status_user = (
-                food_models.MealEvent.objects.filter(id=obj.id)
-                .filter(created_by__id=request.user.id)
-                .exists()
-            )
-            return status_user or status_group
-        except:
-            return False
+    def get_meal_days(self, obj):
+        data = related_objects(obj, "mealday_set", "date")
+        return MealDayReadSerializer(data, many=True, context=self.context).data
 
     def to_representation(self, instance):
         NutriClass = Nutri()
+        self.resolve_tree_allow_edit([instance])
         data = super(MealEventReadSerializer, self).to_representation(instance)
-        data["price_eur"] = AggLib.agg_meal_event_sum(self, data, "price")
+        data["price_eur"] = instance.price_eur
 
-        data["energy_kj"] = AggLib.agg_meal_event_sum(self, data, "energy_kj")
+        data["energy_kj"] = instance.energy_kj
         data["energy_kj_sum"] = AggLib.agg_meal_event_energy_kj(self, data)
 
-        data["weight_g"] = AggLib.agg_meal_event_sum(self, data, "weight_g")
-
-        if data["weight_g"] == 0:
-            data["nutri_points"] = 0
-        else:
-            data["nutri_points"] = (
-                AggLib.agg_meal_event_sum(self, data, ["weight_g", "nutri_points"])
-                / data["weight_g"]
-            )
+        data["weight_g"] = instance.weight_g
+        data["nutri_points"] = instance.rollup_nutri_points
 
         data["nutri_class"] = NutriClass.get_nutri_class("solid", data["nutri_points"])
         return data
@@ -1,31 +1,33 @@
 from food import models as food_models
-from django.db.models import Sum
-from food.service.nutri_lib import Nutri
+from django.db.models import Avg
+from food.service.rollup_logic import RollupModule
 
 
 class PriceModule:
 
-    def setPriceInPackage(self, price):
-        packages_set = food_models.Package.objects.filter(id=price.package.id)
-        print('setPriceInPackage')
-        for package in packages_set:
-            package.price_per_kg=price.price_per_kg
-            package.save()
+    def update_ingredient_prices(self, ingredient_ids):
+        """
+        Refreshes Ingredient.price_per_kg, the mean price per kg over all prices of all packages
+        of all portions of an ingredient. Called whenever a Price, Package or Portion changes,
+        so serializers can read the price of an ingredient without walking the price tables.
+        """
+        ingredient_ids = {ingredient_id for ingredient_id in ingredient_ids if ingredient_id is not None}
+        if not ingredient_ids:
+            return
 
-            portions_set = food_models.Portion.objects.filter(ingredient=package.portion.ingredient)
-            print('setPriceInPortion')
-            for portion in portions_set:
-                print(portion)
-                portion.price_per_kg=package.price_per_kg
-                portion.save()
+        averages = dict(
+            food_models.Price.objects.filter(package__portion__ingredient_id__in=ingredient_ids)
+            .values_list('package__portion__ingredient_id')
+            .annotate(avg=Avg('price_per_kg'))
+            .order_by()
+        )
+        ingredients = list(food_models.Ingredient.objects.filter(id__in=ingredient_ids).only('id', 'price_per_kg'))
+        for ingredient in ingredients:
+            ingredient.price_per_kg = averages.get(ingredient.id) or 0
+        food_models.Ingredient.objects.bulk_update(ingredients, ['price_per_kg'])
 
-                recipe_item_set = food_models.RecipeItem.objects.all()
-
-                for recipe_item in recipe_item_set:
-                    if (recipe_item.portion == portion):
-                        recipe_item.price_per_kg=portion.price_per_kg
-                        recipe_item.save()
-            print('setIngredientPrice')
-            ingredient = food_models.Ingredient.objects.filter(id=package.portion.ingredient.id).first()
-            ingredient.price_per_kg=price.price_per_kg
-            ingredient.save()
\ No newline at end of file
+        RollupModule().update_recipes(
+            food_models.RecipeItem.objects.filter(portion__ingredient_id__in=ingredient_ids).values_list(
+                'recipe_id', flat=True
+            )
+        )
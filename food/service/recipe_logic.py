@@ -1,6 +1,9 @@
+from collections import defaultdict
+
 from food import models as food_models
 from django.db.models import Sum
 from food.service.nutri_lib import Nutri
+from food.service.rollup_logic import RollupModule
 
 
 class RecipeModule:
@@ -8,40 +11,92 @@ class RecipeModule:
     def _get_nutri_items(self):
         return ['energy_kj', 'sugar_g', 'fibre_g', 'protein_g', 'sodium_mg','salt_g', 'fat_sat_g']
 
-    def recalculate_recipe_items(self, recipe):
-        NutriClass = Nutri()
+    def _get_recipe_item_fields(self):
+        return ['nutri_class', 'nutri_points', 'weight_recipe_factor'] + [
+            f'nutri_points_{nutri_item}' for nutri_item in self._get_nutri_items()]
 
-        recipe_item_set = food_models.RecipeItem.objects.filter(
-            recipe=recipe)
+    def _calculate_recipe_items(self, recipe_items):
+        NutriClass = Nutri()
+        nutri_fields = [f'nutri_points_{nutri_item}' for nutri_item in self._get_nutri_items()]
 
-        recipe_weight_g = recipe_item_set.aggregate(
-            sum=Sum('weight_g'))['sum'] or 0
+        recipe_weights = defaultdict(float)
+        for recipe_item in recipe_items:
+            recipe_weights[recipe_item.recipe_id] += recipe_item.weight_g or 0
 
-        for recipe_item in recipe_item_set:
+        for recipe_item in recipe_items:
+            ingredient = recipe_item.portion.ingredient
+            recipe_weight_g = recipe_weights[recipe_item.recipe_id]
             weight_recipe_factor = round(
-                recipe_item.weight_g / recipe_weight_g, 3)
-            nutri_points = round(
-                recipe_item.portion.ingredient.nutri_points * weight_recipe_factor, 1)
-            nutri_class = NutriClass.get_nutri_class(
-                'solid', recipe_item.portion.ingredient.nutri_points)
-
-            for nutri_item in self._get_nutri_items():
-                temp_nutri_value = recipe_item.portion.ingredient._meta.get_field(f"nutri_points_{nutri_item}").value_from_object(recipe_item.portion.ingredient)
-                setattr(recipe_item, f"nutri_points_{nutri_item}", round(
-                    temp_nutri_value * weight_recipe_factor, 1))
-
-            food_models.RecipeItem.objects.filter(
-                id=recipe_item.id).update(
-                    nutri_class=nutri_class,
-                    nutri_points=nutri_points,
-                    weight_recipe_factor=weight_recipe_factor,
-                    nutri_points_energy_kj=recipe_item.nutri_points_energy_kj,
-                    nutri_points_protein_g=recipe_item.nutri_points_protein_g,
-                    nutri_points_fat_sat_g=recipe_item.nutri_points_fat_sat_g,
-                    nutri_points_sugar_g=recipe_item.nutri_points_sugar_g,
-                    nutri_points_salt_g=recipe_item.nutri_points_salt_g,
-                    nutri_points_fibre_g=recipe_item.nutri_points_fibre_g,
-                )
+                recipe_item.weight_g / recipe_weight_g, 3) if recipe_weight_g else 0
+            recipe_item.weight_recipe_factor = weight_recipe_factor
+            recipe_item.nutri_points = round(
+                ingredient.nutri_points * weight_recipe_factor, 1)
+            recipe_item.nutri_class = NutriClass.get_nutri_class(
+                'solid', ingredient.nutri_points)
+
+            for nutri_field in nutri_fields:
+                setattr(recipe_item, nutri_field, round(
+                    getattr(ingredient, nutri_field) * weight_recipe_factor, 1))
+
+    def recalculate_recipe_items(self, recipe):
+        recipe_items = list(food_models.RecipeItem.objects.filter(
+            recipe=recipe).select_related('portion__ingredient'))
+        self._calculate_recipe_items(recipe_items)
+        food_models.RecipeItem.objects.bulk_update(
+            recipe_items, self._get_recipe_item_fields())
+
+    def recalculate_recipes(self, recipe_ids, batch_size=500):
+        """
+        Bulk variant of update_recipe_item_nutritons, recalculate_recipe_items, recipe_sums and
+        recipe_nutri for many recipes at once, e.g. after the nutrients of ingredients changed.
+        """
+        recipe_ids = set(recipe_ids)
+        if not recipe_ids:
+            return
+
+        recipe_items = list(food_models.RecipeItem.objects.filter(
+            recipe_id__in=recipe_ids).select_related('portion__ingredient'))
+        for recipe_item in recipe_items:
+            self.update_recipe_item_nutritons(recipe_item)
+        self._calculate_recipe_items(recipe_items)
+        food_models.RecipeItem.objects.bulk_update(
+            recipe_items, self._get_nutrient_fields() + self._get_recipe_item_fields(),
+            batch_size=batch_size)
+
+        NutriClass = Nutri()
+        sums = {
+            row['recipe_id']: row
+            for row in food_models.RecipeItem.objects.filter(recipe_id__in=recipe_ids)
+            .values('recipe_id')
+            .annotate(*[Sum(field) for field in self._get_nutrient_fields() + ['nutri_points']])
+            .order_by()
+        }
+        recipes = list(food_models.Recipe.objects.filter(id__in=recipe_ids))
+        for recipe in recipes:
+            items = sums.get(recipe.id)
+            if not items:
+                continue
+            for field in self._get_nutrient_fields():
+                setattr(recipe, field, self.get_sum(field, items))
+            recipe.nutri_points = self.get_sum('nutri_points', items)
+            recipe.nutri_class = NutriClass.get_nutri_class('solid', recipe.nutri_points)
+        food_models.Recipe.objects.bulk_update(
+            recipes, self._get_nutrient_fields() + ['nutri_points', 'nutri_class'],
+            batch_size=batch_size)
+
+        RollupModule().update_recipes(recipe_ids)
+
+    def recalculate_recipes_of_ingredients(self, ingredient_ids=None):
+        """
+        Recalculates all recipes using one of the given ingredients, or all recipes
+        if no ingredients are given. Returns the number of recalculated recipes.
+        """
+        recipe_items = food_models.RecipeItem.objects.exclude(recipe=None)
+        if ingredient_ids is not None:
+            recipe_items = recipe_items.filter(portion__ingredient_id__in=ingredient_ids)
+        recipe_ids = set(recipe_items.values_list('recipe_id', flat=True))
+        self.recalculate_recipes(recipe_ids)
+        return len(recipe_ids)
 
     def update_recipe_item_nutritons(self, instance):
         instance.weight_g = round(
@@ -67,6 +122,10 @@ class RecipeModule:
             return round(items[f'{name}__sum'], round_digit)
         return 0.1
 
+    def _get_nutrient_fields(self):
+        return ['weight_g', 'energy_kj', 'protein_g', 'fat_g', 'fat_sat_g', 'sugar_g',
+                'sodium_mg', 'carbohydrate_g', 'fibre_g']
+
     def recipe_sums(self, instance):
         items = food_models.RecipeItem.objects.filter(recipe=instance.id).aggregate(
             Sum('weight_g'),
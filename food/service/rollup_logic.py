@@ -0,0 +1,118 @@
+from collections import defaultdict
+
+from django.db.models import Sum
+
+from food import models as food_models
+
+ROLLUP_FIELDS = ["energy_kj", "weight_g", "price_eur", "nutri_points_weight_g"]
+
+
+class RollupModule:
+    """
+    Keeps the stored totals of recipes, meals, meal days and meal events up to date.
+    Every level is recomputed from the stored totals of the level below, so a change
+    only touches the path from the changed object up to its meal events.
+    """
+
+    def update_recipes(self, recipe_ids):
+        recipe_ids = {recipe_id for recipe_id in recipe_ids if recipe_id is not None}
+        if not recipe_ids:
+            return
+
+        totals = defaultdict(lambda: {"price_eur": 0, "nutri_points_weight_g": 0})
+        recipe_items = food_models.RecipeItem.objects.filter(recipe_id__in=recipe_ids).values_list(
+            "recipe_id", "weight_g", "nutri_points", "portion__ingredient__price_per_kg"
+        )
+        for recipe_id, weight_g, nutri_points, price_per_kg in recipe_items:
+            weight_g = weight_g or 0
+            totals[recipe_id]["price_eur"] += round((price_per_kg or 0) * (weight_g / 1000), 2)
+            totals[recipe_id]["nutri_points_weight_g"] += weight_g * (nutri_points or 0)
+
+        recipes = list(
+            food_models.Recipe.objects.filter(id__in=recipe_ids).only(
+                "id", "price_eur", "nutri_points_weight_g"
+            )
+        )
+        for recipe in recipes:
+            recipe.price_eur = totals[recipe.id]["price_eur"]
+            recipe.nutri_points_weight_g = totals[recipe.id]["nutri_points_weight_g"]
+        food_models.Recipe.objects.bulk_update(recipes, ["price_eur", "nutri_points_weight_g"])
+
+        self.update_meals(
+            food_models.MealItem.objects.filter(recipe_id__in=recipe_ids).values_list("meal_id", flat=True)
+        )
+
+    def update_meals(self, meal_ids):
+        meal_ids = {meal_id for meal_id in meal_ids if meal_id is not None}
+        if not meal_ids:
+            return
+
+        meal_items = list(
+            food_models.MealItem.objects.filter(meal_id__in=meal_ids).values_list(
+                "meal_id", "recipe_id", "factor", "recipe__price_eur", "recipe__nutri_points_weight_g"
+            )
+        )
+        # the stored energy and weight of a recipe are rounded, sum its items like AggLib did
+        recipe_sums = {
+            row["recipe_id"]: row
+            for row in food_models.RecipeItem.objects.filter(
+                recipe_id__in={recipe_id for _, recipe_id, _, _, _ in meal_items}
+            )
+            .values("recipe_id")
+            .annotate(energy_kj=Sum("energy_kj"), weight_g=Sum("weight_g"))
+            .order_by()
+        }
+        totals = defaultdict(lambda: dict.fromkeys(ROLLUP_FIELDS, 0))
+        for meal_id, recipe_id, factor, price_eur, nutri_points_weight_g in meal_items:
+            recipe = recipe_sums.get(recipe_id, {})
+            values = {
+                "energy_kj": recipe.get("energy_kj"),
+                "weight_g": recipe.get("weight_g"),
+                "price_eur": price_eur,
+                "nutri_points_weight_g": nutri_points_weight_g,
+            }
+            for field, value in values.items():
+                totals[meal_id][field] += (value or 0) * (factor or 0)
+
+        meals = list(food_models.Meal.objects.filter(id__in=meal_ids))
+        for meal in meals:
+            for field in ROLLUP_FIELDS:
+                setattr(meal, field, totals[meal.id][field])
+        food_models.Meal.objects.bulk_update(meals, ROLLUP_FIELDS)
+        self.update_meal_days(meal.meal_day_id for meal in meals)
+
+    def update_meal_days(self, meal_day_ids):
+        meal_days = self._update(
+            food_models.MealDay,
+            meal_day_ids,
+            food_models.Meal.objects.values("meal_day_id"),
+            "meal_day_id",
+            {field: Sum(field) for field in ROLLUP_FIELDS},
+        )
+        self.update_meal_events(meal_day.meal_event_id for meal_day in meal_days)
+
+    def update_meal_events(self, meal_event_ids):
+        self._update(
+            food_models.MealEvent,
+            meal_event_ids,
+            food_models.MealDay.objects.values("meal_event_id"),
+            "meal_event_id",
+            {field: Sum(field) for field in ROLLUP_FIELDS},
+        )
+
+    def _update(self, model, ids, children, parent_field, aggregates):
+        ids = {obj_id for obj_id in ids if obj_id is not None}
+        if not ids:
+            return []
+
+        sums = {
+            row[parent_field]: row
+            for row in children.filter(**{f"{parent_field}__in": ids}).annotate(**aggregates).order_by()
+        }
+        objects = list(model.objects.filter(id__in=ids))
+        for obj in objects:
+            row = sums.get(obj.id, {})
+            for field in ROLLUP_FIELDS:
+                setattr(obj, field, row.get(field) or 0)
+        model.objects.bulk_update(objects, ROLLUP_FIELDS)
+        return objects
@@ -0,0 +1,120 @@
+import csv
+from io import BytesIO, StringIO
+
+from openpyxl import Workbook
+
+from food import models as food_models
+
+MAJOR_CLASS_LABELS = dict(food_models.FoodMajorClasses.choices)
+
+EXPORT_HEADER = ["Kategorie", "Zutat", "Menge (g)", "Preis (EUR)", "Rezepte"]
+
+
+def weight_show(weight_g, weight_kg):
+    return f"{weight_kg} Kg" if weight_g >= 1000 else f"{weight_g} g"
+
+
+def add_agg_to_list(items):
+    weight_g = round(sum(item["weight_g"] for item in items), 0)
+    weight_kg = round(sum(item["weight_kg"] for item in items), 2)
+    sum_dict = {
+        "weight_g": weight_g,
+        "weight_kg": weight_kg,
+        "price": round(sum(item["price"] for item in items), 2),
+        "recipe_name": ", ".join(str(item["recipe_name"]) for item in items),
+        "weight_show": weight_show(weight_g, weight_kg),
+    }
+    return [sum_dict, *items]
+
+
+class ShoppingList:
+    """
+    Ingredient totals of a meal event, computed from one flat query over
+    RecipeItem x MealItem instead of the serialized meal event tree.
+    """
+
+    def __init__(self, meal_event: food_models.MealEvent):
+        self.meal_event = meal_event
+
+    def rows(self):
+        norm_portions = self.meal_event.norm_portions
+        rows = (
+            food_models.RecipeItem.objects.filter(
+                recipe__mealitem__meal__meal_day__meal_event=self.meal_event
+            )
+            .order_by(
+                "recipe__mealitem__meal__meal_day__date",
+                "recipe__mealitem__meal__time_start",
+                "recipe__mealitem__id",
+                "id",
+            )
+            .values_list(
+                "portion__ingredient__name",
+                "portion__ingredient__major_class",
+                "portion__ingredient__price_per_kg",
+                "recipe__name",
+                "weight_g",
+                "recipe__mealitem__factor",
+            )
+        )
+        for name, major_class, price_per_kg, recipe_name, weight_g, factor in rows.iterator():
+            weight_g = weight_g or 0
+            factor = 1.0 if factor is None else factor
+            item_price = round(price_per_kg * (weight_g / 1000), 2)
+            row_weight_g = round(weight_g * factor * norm_portions, 1)
+            row_weight_kg = round(weight_g * factor * norm_portions / 1000, 3)
+            yield {
+                "ingredient_name": name,
+                "ingredient_class": MAJOR_CLASS_LABELS.get(major_class, major_class),
+                "recipe_name": recipe_name,
+                "price": round(item_price * factor * norm_portions, 2),
+                "weight_g": row_weight_g,
+                "weight_kg": row_weight_kg,
+                "weight_show": weight_show(row_weight_g, row_weight_kg),
+            }
+
+    def by_major_class(self) -> dict:
+        """
+        Groups the rows by major class and ingredient in a single pass. Each ingredient
+        holds its sum entry first, followed by the single rows.
+        """
+        groups = {}
+        for row in self.rows():
+            ingredients = groups.setdefault(row["ingredient_class"], {})
+            ingredients.setdefault(row["ingredient_name"], []).append(row)
+
+        return {
+            major_class: {
+                name: add_agg_to_list(groups[major_class][name])
+                for name in sorted(groups[major_class])
+            }
+            for major_class in sorted(groups)
+        }
+
+    def export_rows(self):
+        yield EXPORT_HEADER
+        for major_class, ingredients in self.by_major_class().items():
+            for name, items in ingredients.items():
+                total = items[0]
+                yield [major_class, name, total["weight_g"], total["price"], total["recipe_name"]]
+
+    def export_csv(self):
+        """
+        Yields the shopping list as csv lines, one line per ingredient.
+        """
+        buffer = StringIO()
+        writer = csv.writer(buffer, delimiter=";")
+        for row in self.export_rows():
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    def export_xlsx(self) -> bytes:
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet("Einkaufsliste")
+        for row in self.export_rows():
+            worksheet.append(row)
+        stream = BytesIO()
+        workbook.save(stream)
+        return stream.getvalue()
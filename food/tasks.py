@@ -0,0 +1,13 @@
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+from food.service.recipe_logic import RecipeModule
+
+logger = get_task_logger(__name__)
+
+
+@shared_task
+def recalculate_recipes_of_ingredients(ingredient_ids=None):
+    count = RecipeModule().recalculate_recipes_of_ingredients(ingredient_ids)
+    logger.info(f'Recalculated {count} recipes')
+    return count
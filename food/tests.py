@@ -1,3 +1,285 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from food import models as food_models
+from food.serializers import MealEventReadSerializer, RecipeSerializer, prefetch_meal_event_tree
+from food.service.norm_person import NormPerson
+from food.service.recipe_logic import RecipeModule
+from food.service.shopping_list import ShoppingList
+
+
+class NormPersonTests(SimpleTestCase):
+
+    def test_reference_person_is_one(self):
+        self.assertEqual(NormPerson().get_norm_person("M", 15, 1.5), 1.0)
+
+    def test_out_of_table_ages_use_default_weight_and_height(self):
+        norm_person = NormPerson()
+        self.assertEqual(norm_person.getWeightByAgeAndGender(120, "F"), 73.0)
+        self.assertEqual(norm_person.getHeigthByAgeAndGender(-1, "M"), 178.0)
+
+    def test_unknown_gender_uses_mean_weight(self):
+        norm_person = NormPerson()
+        self.assertEqual(norm_person.getWeightByAgeAndGender(10, "D"), 31.5)
+
+    def test_sum_matches_single_values(self):
+        norm_person = NormPerson()
+        genders = ["M", "F", "D", "M", "F", "F"]
+        ages = [15, 12, 30, 15, 45, 8]
+        expected = sum(norm_person.get_norm_person(gender, age, 1.3) for gender, age in zip(genders, ages))
+        self.assertAlmostEqual(norm_person.get_norm_person_sum(genders, ages, 1.3), expected)
+
+    def test_sum_of_empty_group(self):
+        self.assertEqual(NormPerson().get_norm_person_sum([], [], 1.7), 0)
+
+
+@mock.patch("food.serializers.get_groups_of_request_user", return_value=[])
+class AllowEditTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="koch", password="foo")
+        self.recipes = food_models.Recipe.objects.bulk_create(
+            [food_models.Recipe(name=f"Rezept {i}") for i in range(5)]
+        )
+        self.recipes[1].created_by.add(self.user)
+        self.recipes[3].created_by.add(self.user)
+        self.request = Request(APIRequestFactory().get("/"))
+        self.request.user = self.user
+
+    def test_allow_edit_of_list(self, get_groups):
+        recipes = food_models.Recipe.objects.filter(id__in=[recipe.id for recipe in self.recipes]).order_by("id")
+        data = RecipeSerializer(recipes, many=True, context={"request": self.request}).data
+        self.assertEqual([recipe["allow_edit"] for recipe in data], [False, True, False, True, False])
+        self.assertEqual(get_groups.call_count, 1)
+
+    def test_allow_edit_single_object(self, get_groups):
+        context = {"request": self.request}
+        self.assertTrue(RecipeSerializer(context=context).get_allow_edit(self.recipes[1]))
+        self.assertFalse(RecipeSerializer(context=context).get_allow_edit(self.recipes[0]))
+
+    def test_allow_edit_without_request(self, get_groups):
+        self.assertFalse(RecipeSerializer().get_allow_edit(self.recipes[1]))
+        get_groups.assert_not_called()
+
+
+class IngredientPriceIndexTests(TestCase):
+
+    def setUp(self):
+        food_models.MeasuringUnit.objects.create(id=3, name="Gramm", quantity=1)
+        self.retailer = food_models.Retailer.objects.create(name="Markt")
+        self.ingredient = food_models.Ingredient.objects.create(name="Reis")
+        self.portion = food_models.Portion.objects.get(ingredient=self.ingredient)
+        self.package = food_models.Package.objects.create(name="Beutel", portion=self.portion, quantity=500)
+
+    def add_price(self, price_eur):
+        return food_models.Price.objects.create(price_eur=price_eur, retailer=self.retailer, package=self.package)
+
+    def test_average_follows_price_changes(self):
+        self.add_price(1.0)
+        price = self.add_price(2.0)
+        self.ingredient.refresh_from_db()
+        self.assertAlmostEqual(self.ingredient.price_per_kg, 3.0)
+
+        price.delete()
+        self.ingredient.refresh_from_db()
+        self.assertAlmostEqual(self.ingredient.price_per_kg, 2.0)
+
+    def test_moving_portion_to_other_ingredient(self):
+        self.add_price(1.0)
+        other = food_models.Ingredient.objects.create(name="Nudeln")
+        self.portion.ingredient = other
+        self.portion.save()
+        self.ingredient.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.ingredient.price_per_kg, 0)
+        self.assertAlmostEqual(other.price_per_kg, 2.0)
+
+
+@mock.patch("food.serializers.get_groups_of_request_user", return_value=[])
+class MealEventTreeTests(TestCase):
+
+    def setUp(self):
+        food_models.MeasuringUnit.objects.create(id=3, name="Gramm", quantity=1)
+        self.meal_event = food_models.MealEvent.objects.create(norm_portions=10)
+        self.request = Request(APIRequestFactory().get("/"))
+        self.request.user = get_user_model().objects.create_user(username="koch", password="foo")
+
+    def add_day(self, day):
+        ingredient = food_models.Ingredient.objects.create(name=f"Zutat {day}")
+        recipe = food_models.Recipe.objects.create(name=f"Rezept {day}")
+        food_models.RecipeItem.objects.create(
+            recipe=recipe, portion=food_models.Portion.objects.get(ingredient=ingredient), quantity=100
+        )
+        meal_day = food_models.MealDay.objects.create(
+            meal_event=self.meal_event, date=datetime.date(2024, 7, day)
+        )
+        for hour in (8, 13):
+            meal = food_models.Meal.objects.create(meal_day=meal_day, time_start=datetime.time(hour))
+            food_models.MealItem.objects.create(meal=meal, recipe=recipe, factor=2)
+
+    def serialize(self):
+        queryset = prefetch_meal_event_tree(food_models.MealEvent.objects.all())
+        with CaptureQueriesContext(connection) as queries:
+            data = MealEventReadSerializer(queryset, many=True, context={"request": self.request}).data
+        return data, len(queries)
+
+    def test_query_count_is_independent_of_tree_size(self, get_groups):
+        self.add_day(20)
+        _, small_count = self.serialize()
+        self.add_day(21)
+        self.add_day(22)
+        data, large_count = self.serialize()
+        self.assertEqual(small_count, large_count)
+        self.assertEqual([day["date"] for day in data[0]["meal_days"]], ["2024-07-20", "2024-07-21", "2024-07-22"])
+
+    def test_matches_unprefetched_serialization(self, get_groups):
+        self.add_day(20)
+        self.add_day(21)
+        data, _ = self.serialize()
+        context = {"request": self.request}
+        self.meal_event.refresh_from_db()
+        self.assertEqual(data[0], MealEventReadSerializer(self.meal_event, context=context).data)
+
+
+class ShoppingListTests(TestCase):
+
+    def setUp(self):
+        food_models.MeasuringUnit.objects.create(id=3, name="Gramm", quantity=1)
+        self.meal_event = food_models.MealEvent.objects.create(norm_portions=10)
+        rice = food_models.Ingredient.objects.create(name="Reis", major_class="Cereal Grains and Pasta")
+        apple = food_models.Ingredient.objects.create(name="Apfel", major_class="Fruits and Fruit Juices")
+        rice.price_per_kg = 2.0
+        rice.save()
+
+        def recipe(name, *portions):
+            recipe = food_models.Recipe.objects.create(name=name)
+            for ingredient, quantity in portions:
+                food_models.RecipeItem.objects.create(
+                    recipe=recipe, portion=food_models.Portion.objects.get(ingredient=ingredient), quantity=quantity
+                )
+            return recipe
+
+        risotto = recipe("Risotto", (rice, 80))
+        pudding = recipe("Milchreis", (rice, 50), (apple, 100))
+        meal_day = food_models.MealDay.objects.create(meal_event=self.meal_event, date=datetime.date(2024, 7, 20))
+        lunch = food_models.Meal.objects.create(meal_day=meal_day, time_start=datetime.time(13))
+        dinner = food_models.Meal.objects.create(meal_day=meal_day, time_start=datetime.time(19))
+        food_models.MealItem.objects.create(meal=lunch, recipe=risotto, factor=1.5)
+        food_models.MealItem.objects.create(meal=dinner, recipe=pudding, factor=1)
+
+    def test_grouped_by_major_class_and_ingredient(self):
+        with self.assertNumQueries(1):
+            data = ShoppingList(self.meal_event).by_major_class()
+        self.assertEqual(list(data), ["Früchte", "Nudeln und Getreide "])
+        rice = data["Nudeln und Getreide "]["Reis"]
+        self.assertEqual([item["recipe_name"] for item in rice], ["Risotto, Milchreis", "Risotto", "Milchreis"])
+        self.assertEqual(rice[0]["weight_g"], 1700)
+        self.assertEqual(rice[0]["weight_show"], "1.7 Kg")
+        self.assertEqual(rice[0]["price"], 3.4)
+        self.assertEqual(data["Früchte"]["Apfel"][0]["weight_show"], "1.0 Kg")
+
+    def test_csv_export(self):
+        lines = list(ShoppingList(self.meal_event).export_csv())
+        self.assertEqual(lines[0], "Kategorie;Zutat;Menge (g);Preis (EUR);Rezepte\r\n")
+        self.assertEqual(lines[2], "Nudeln und Getreide ;Reis;1700.0;3.4;Risotto, Milchreis\r\n")
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        food_models.MeasuringUnit.objects.create(id=3, name="Gramm", quantity=1)
+        self.retailer = food_models.Retailer.objects.create(name="Markt")
+        self.ingredient = food_models.Ingredient.objects.create(name="Reis", energy_kj=1500)
+        self.portion = food_models.Portion.objects.get(ingredient=self.ingredient)
+        self.recipe = food_models.Recipe.objects.create(name="Risotto")
+        food_models.RecipeItem.objects.create(recipe=self.recipe, portion=self.portion, quantity=200)
+        self.meal_event = food_models.MealEvent.objects.create(norm_portions=10)
+        meal_day = food_models.MealDay.objects.create(meal_event=self.meal_event, date=datetime.date(2024, 7, 20))
+        self.lunch = food_models.Meal.objects.create(meal_day=meal_day)
+        self.dinner = food_models.Meal.objects.create(meal_day=meal_day)
+        food_models.MealItem.objects.create(meal=self.lunch, recipe=self.recipe, factor=1)
+        self.dinner_item = food_models.MealItem.objects.create(meal=self.dinner, recipe=self.recipe, factor=0.5)
+
+    def test_totals_follow_meal_items(self):
+        self.meal_event.refresh_from_db()
+        self.assertAlmostEqual(self.meal_event.weight_g, 300)
+        self.assertAlmostEqual(self.meal_event.energy_kj, 4500)
+
+        self.dinner_item.delete()
+        self.meal_event.refresh_from_db()
+        self.assertAlmostEqual(self.meal_event.weight_g, 200)
+
+    def test_totals_follow_recipe_items_and_prices(self):
+        food_models.RecipeItem.objects.create(recipe=self.recipe, portion=self.portion, quantity=100)
+        package = food_models.Package.objects.create(name="Beutel", portion=self.portion, quantity=1000)
+        food_models.Price.objects.create(price_eur=2.0, retailer=self.retailer, package=package)
+
+        self.lunch.refresh_from_db()
+        self.meal_event.refresh_from_db()
+        self.assertAlmostEqual(self.lunch.weight_g, 300)
+        self.assertAlmostEqual(self.lunch.price_eur, 0.6)
+        self.assertAlmostEqual(self.meal_event.price_eur, 0.9)
+
+    def test_moved_meal_day_updates_both_meal_events(self):
+        other_event = food_models.MealEvent.objects.create(norm_portions=10)
+        meal_day = food_models.MealDay.objects.get(id=self.lunch.meal_day_id)
+        meal_day.meal_event = other_event
+        meal_day.save()
+
+        self.meal_event.refresh_from_db()
+        other_event.refresh_from_db()
+        self.assertAlmostEqual(self.meal_event.weight_g, 0)
+        self.assertAlmostEqual(other_event.weight_g, 300)
+
+    def test_meal_totals_are_not_rounded(self):
+        food_models.RecipeItem.objects.create(recipe=self.recipe, portion=self.portion, quantity=0.3)
+        empty_recipe = food_models.Recipe.objects.create(name="Leer")
+        food_models.MealItem.objects.create(meal=self.lunch, recipe=empty_recipe, factor=1)
+
+        self.lunch.refresh_from_db()
+        self.assertAlmostEqual(self.lunch.weight_g, 200.3)
+        self.assertAlmostEqual(self.lunch.energy_kj, 3004.5)
+
+
+class RecalculateRecipesTests(TestCase):
+
+    def setUp(self):
+        food_models.MeasuringUnit.objects.create(id=3, name="Gramm", quantity=1)
+        self.rice = food_models.Ingredient.objects.create(name="Reis")
+        self.apple = food_models.Ingredient.objects.create(name="Apfel")
+        self.recipes = []
+        for i in range(3):
+            recipe = food_models.Recipe.objects.create(name=f"Rezept {i}")
+            for ingredient, quantity in [(self.rice, 300), (self.apple, 100)]:
+                food_models.RecipeItem.objects.create(
+                    recipe=recipe, portion=food_models.Portion.objects.get(ingredient=ingredient), quantity=quantity
+                )
+            self.recipes.append(recipe)
+
+    def test_recalculates_recipes_of_changed_ingredient(self):
+        food_models.Ingredient.objects.filter(id=self.rice.id).update(nutri_points=8, nutri_points_sugar_g=4)
+        count = RecipeModule().recalculate_recipes_of_ingredients([self.rice.id])
+
+        self.assertEqual(count, 3)
+        recipe_item = food_models.RecipeItem.objects.get(recipe=self.recipes[0], portion__ingredient=self.rice)
+        self.assertEqual(recipe_item.weight_recipe_factor, 0.75)
+        self.assertEqual(recipe_item.nutri_points, 6)
+        self.assertEqual(recipe_item.nutri_points_sugar_g, 3)
+        self.recipes[0].refresh_from_db()
+        self.assertEqual(self.recipes[0].nutri_points, 6)
+
+    def test_matches_single_recipe_calculation(self):
+        food_models.Ingredient.objects.filter(id=self.apple.id).update(nutri_points=5)
+        RecipeModule().recalculate_recipes_of_ingredients()
+        bulk = list(food_models.RecipeItem.objects.filter(recipe=self.recipes[1]).values().order_by("id"))
+
+        RecipeModule().recalculate_recipe_items(self.recipes[1])
+        single = list(food_models.RecipeItem.objects.filter(recipe=self.recipes[1]).values().order_by("id"))
+        self.assertEqual(bulk, single)
@@ -1,4 +1,5 @@
 from django.db.models import Q, QuerySet
+from django.http import HttpResponse, StreamingHttpResponse
 from django_filters import CharFilter, NumberFilter
 from django_filters.rest_framework import DjangoFilterBackend, FilterSet
 from rest_framework import viewsets, status
@@ -13,12 +14,12 @@ from rest_framework.views import APIView
 from rest_framework.mixins import RetrieveModelMixin
 
 from copy import deepcopy
-from itertools import groupby
 from datetime import date, timedelta
 import datetime
 
 from food import models as food_models
 from food import serializers as food_serializers
+from food.service.shopping_list import ShoppingList
 from anmelde_tool.event import models as event_models
 
 
@@ -477,7 +478,7 @@ class MealEventViewSet(viewsets.ModelViewSet):
 
 
 class MealEventReadViewSet(viewsets.ModelViewSet):
-    queryset = food_models.MealEvent.objects.all()
+    queryset = food_serializers.prefetch_meal_event_tree(food_models.MealEvent.objects.all())
     serializer_class = food_serializers.MealEventReadSerializer
 
 
@@ -490,9 +491,11 @@ class MyMealEventReadViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = food_serializers.MealEventReadSerializer
 
     def get_queryset(self) -> QuerySet:
-        return food_models.MealEvent.objects.filter(
-            created_by__id=self.request.user.id
-        ).exclude(created_by=None)
+        return food_serializers.prefetch_meal_event_tree(
+            food_models.MealEvent.objects.filter(
+                created_by__id=self.request.user.id
+            ).exclude(created_by=None)
+        )
 
 
 class MyMealEventSmallReadViewSet(viewsets.ReadOnlyModelViewSet):
@@ -508,8 +511,10 @@ class PublicMealEventReadViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = food_serializers.MealEventReadSerializer
 
     def get_queryset(self) -> QuerySet:
-        return food_models.MealEvent.objects.filter(
-            Q(is_public=True) | Q(created_by__id=self.request.user.id)
+        return food_serializers.prefetch_meal_event_tree(
+            food_models.MealEvent.objects.filter(
+                Q(is_public=True) | Q(created_by__id=self.request.user.id)
+            )
         )
 
 
@@ -526,7 +531,9 @@ class ApprovedMealEventReadViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = food_serializers.MealEventReadSerializer
 
     def get_queryset(self) -> QuerySet:
-        return food_models.MealEvent.objects.filter(is_approved=True, is_public=True)
+        return food_serializers.prefetch_meal_event_tree(
+            food_models.MealEvent.objects.filter(is_approved=True, is_public=True)
+        )
 
 
 class ApprovedMealEventSmallReadViewSet(viewsets.ReadOnlyModelViewSet):
@@ -592,104 +599,33 @@ class MajorClassViewSet(viewsets.ViewSet):
         return Response(result, status=status.HTTP_200_OK)
 
 
-def add_agg_to_list(items):
-    my_list = []
-    sum_dict = {}
-    weight_g = round(sum(item["weight_g"] for item in items), 0)
-    weight_kg = round(sum(item["weight_kg"] for item in items), 2)
-    price = round(sum(item["price"] for item in items), 2)
-    sum_dict["weight_g"] = weight_g
-    sum_dict["weight_kg"] = weight_kg
-    sum_dict["price"] = price
-    sum_dict["recipe_name"] = ", ".join(str(x["recipe_name"]) for x in items)
-    sum_dict["weight_show"] = f"{weight_kg} Kg" if weight_g >= 1000 else f"{weight_g} g"
-
-    dict_copy = sum_dict.copy()  # 👈️ create copy
-    my_list.append(dict_copy)
-    my_list.extend(items)
-
-    return my_list
-
-
-def stack_items(input_items):
-    return_dict = {}
-
-    for group, items in groupby(
-        sorted(input_items, key=lambda x: x["ingredient_name"]),
-        lambda x: x["ingredient_name"],
-    ):
-        return_dict[group] = add_agg_to_list(list(items))
-    return return_dict
-
-
 class ShoppingListViewSet(viewsets.ViewSet):
     # pylint: disable=no-self-use
     def list(self, request) -> Response:
         """
-        @param request: request information
-        @return: Response with serialized UserExtended instance of the user requesting the personal data
+        @param request: request information, the meal event as id and an optional export (csv or xlsx)
+        @return: Response with the ingredients of the meal event grouped by major class
         """
-        event_id = request.query_params["id"]
-        queryset = food_models.MealEvent.objects.get(id=event_id)
-        serializer = food_serializers.EventReadExtendedSerializer(queryset, many=False)
-
-        return_list = []
-        return_dict_class = {}
-
-        for meal_day in serializer.data["meal_days"]:
-            for meal in meal_day["meals"]:
-                for meal_item in meal["meal_items"]:
-                    if meal_item["recipe"] and meal_item["recipe"].get("recipe_items"):
-                        for recipe_item in meal_item["recipe"].get("recipe_items"):
-                            weight_g = round(
-                                recipe_item.get("weight_g")
-                                * meal_item.get("factor", 1.0)
-                                * serializer.data.get("norm_portions"),
-                                1,
-                            )
-                            weight_kg = round(
-                                recipe_item.get("weight_g")
-                                * meal_item.get("factor", 1.0)
-                                * serializer.data.get("norm_portions")
-                                / 1000,
-                                3,
-                            )
-                            price = round(
-                                recipe_item.get("price", 0)
-                                * meal_item.get("factor", 1.0)
-                                * serializer.data.get("norm_portions"),
-                                2
-                            )
-                            return_list.append(
-                                {
-                                    "ingredient_name": recipe_item.get("portion")
-                                    .get("ingredient")
-                                    .get("name"),
-                                    "ingredient_class": recipe_item.get("portion")
-                                    .get("ingredient")
-                                    .get("get_major_class_display"),
-                                    "recipe_name": meal_item["recipe"].get("name"),
-                                    "price": price,
-                                    "weight_g": weight_g,
-                                    "weight_kg": weight_kg,
-                                    "weight_show": (
-                                        f"{weight_kg} Kg"
-                                        if weight_g >= 1000
-                                        else f"{weight_g} g"
-                                    ),
-                                }
-                            )
-
-        # sort by ingredient name
-        return_list = sorted(
-            return_list, key=lambda x: x["ingredient_name"], reverse=False
-        )
+        meal_event = get_object_or_404(food_models.MealEvent, id=request.query_params["id"])
+        shopping_list = ShoppingList(meal_event)
+        export = request.query_params.get("export")
 
-        # group by major class
-        for group, items in groupby(
-            sorted(return_list, key=lambda x: x["ingredient_class"]),
-            lambda x: x["ingredient_class"],
-        ):
-            return_dict_class[group] = stack_items(list(items))
+        if export == "csv":
+            response = StreamingHttpResponse(
+                shopping_list.export_csv(), content_type="text/csv; charset=utf-8"
+            )
+            response["Content-Disposition"] = 'attachment; filename="Einkaufsliste.csv"'
+            return response
+        if export == "xlsx":
+            response = HttpResponse(
+                shopping_list.export_xlsx(),
+                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+            response["Content-Disposition"] = 'attachment; filename="Einkaufsliste.xlsx"'
+            return response
+        if export:
+            return Response(
+                f"Unbekanntes Exportformat: {export}", status=status.HTTP_400_BAD_REQUEST
+            )
 
-        return Response(return_dict_class)
+        return Response(shopping_list.by_major_class())
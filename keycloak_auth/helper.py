@@ -1,6 +1,8 @@
 import re
 import logging
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import QuerySet
 from keycloak import KeycloakGetError, KeycloakAuthenticationError
 
@@ -51,7 +53,21 @@ def check_group_admin_permission(group_id: str) -> bool:
     return False
 
 
-def get_groups_of_user(token, keycloak_id):
+def _groups_cache_key(keycloak_id: str) -> str:
+    return f'keycloak_groups_{keycloak_id}'
+
+
+def get_groups_of_user(token, keycloak_id) -> list[str]:
+    """
+    Returns the keycloak ids of all groups the user is a direct member of.
+    The result is kept in the cache shared by all web and celery processes for KEYCLOAK_GROUP_CACHE_TIMEOUT
+    seconds, use invalidate_groups_of_user after changing the membership of a user.
+    """
+    cache_key = _groups_cache_key(keycloak_id)
+    ids = cache.get(cache_key)
+    if ids is not None:
+        return ids
+
     # TODO: Replace back to keycloak_user
     try:
         keycloak_groups = keycloak_admin.get_user_groups(
@@ -65,4 +81,22 @@ def get_groups_of_user(token, keycloak_id):
         raise NotAuthorized()
 
     ids = [val['id'] for val in keycloak_groups]
+    cache.set(cache_key, ids, timeout=settings.KEYCLOAK_GROUP_CACHE_TIMEOUT)
     return ids
+
+
+def get_groups_of_request_user(request) -> list[str]:
+    """
+    Same as get_groups_of_user for the user of the request, but memoised on the request object,
+    so all permission checks and serializers of one request share a single lookup.
+    """
+    ids = getattr(request, '_keycloak_group_ids', None)
+    if ids is None:
+        token = request.META.get('HTTP_AUTHORIZATION')
+        ids = tuple(get_groups_of_user(token, request.user.keycloak_id))
+        request._keycloak_group_ids = ids
+    return list(ids)
+
+
+def invalidate_groups_of_user(keycloak_id: str):
+    cache.delete(_groups_cache_key(keycloak_id))
@@ -5,11 +5,12 @@ from rest_framework import serializers
 from authentication.models import CustomUser, Person
 from authentication.serializers import UserScoutHierarchySerializer
 from backend.settings import keycloak_user, keycloak_admin
+from basic.helper.tree_snapshot import get_tree_snapshot
 from basic.serializers import ScoutHierarchySerializer
 from keycloak_auth.api_exceptions import NotAuthorized
 from keycloak_auth.choices import CreateGroupChoices
 from keycloak_auth.enums import PermissionType
-from keycloak_auth.helper import get_groups_of_user
+from keycloak_auth.helper import get_groups_of_request_user
 from keycloak_auth.models import KeycloakGroup, ExternalLinks
 from keycloak_auth.permissions import request_group_access
 
@@ -28,16 +29,22 @@ def get_display_name_user(obj: User):
 
 
 def get_display_name_group(obj: KeycloakGroup):
-    if hasattr(obj, 'scouthierarchy') and obj.scouthierarchy:
-        return obj.scouthierarchy.name
+    node = get_tree_snapshot().keycloak_groups.get(str(obj.id))
+    if node:
+        return node.display_name
+    return obj.name
 
-    if obj.parent:
-        if hasattr(obj.parent, 'scouthierarchy') and obj.parent.scouthierarchy:
-            return f'{obj.name} <- {obj.parent.scouthierarchy}'
-        else:
-            return f'{obj.name} <- {obj.parent.name}'
 
-    return obj.name
+def get_group_parent_data(group_id):
+    snapshot = get_tree_snapshot()
+    node = snapshot.keycloak_groups.get(str(group_id)) if group_id else None
+    if node is None:
+        return None
+    return {
+        'name': node.name,
+        'id': node.keycloak_id,
+        'parent': get_group_parent_data(node.parent_id)
+    }
 
 
 class PersonSerializer(serializers.ModelSerializer):
@@ -98,10 +105,7 @@ class GroupParentSerializer(serializers.ModelSerializer):
         )
 
     def get_parent(self, obj: KeycloakGroup):
-        if obj.parent is not None:
-            return GroupParentSerializer(obj.parent).data
-        else:
-            return None
+        return get_group_parent_data(obj.parent_id)
 
     def get_id(self, obj: KeycloakGroup):
         return obj.keycloak_id
@@ -157,17 +161,15 @@ class FullGroupSerializer(serializers.ModelSerializer):
         )
 
     def get_parent(self, obj: KeycloakGroup):
-        if obj.parent is not None:
-            return GroupParentSerializer(obj.parent).data
-        else:
-            return None
+        return get_group_parent_data(obj.parent_id)
 
     def get_id(self, obj: KeycloakGroup):
         return obj.keycloak_id
 
     def get_children(self, obj: KeycloakGroup):
-        if obj.children:
-            serializer = GroupChildrenSerializer(obj.children, many=True)
+        children = get_tree_snapshot().get_keycloak_group_children(obj.id)
+        if children:
+            serializer = GroupChildrenSerializer(children, many=True)
             return serializer.data
         else:
             return None
@@ -188,8 +190,7 @@ class FullGroupSerializer(serializers.ModelSerializer):
     def get_is_member(self, obj: KeycloakGroup) -> bool:
         request = self.context.get('request')
         if request and request.META:
-            token = request.META.get('HTTP_AUTHORIZATION')
-            ids = get_groups_of_user(token, request.user.keycloak_id)
+            ids = get_groups_of_request_user(request)
 
             if any(obj.keycloak_id == group_id for group_id in ids):
                 return True
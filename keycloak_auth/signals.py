@@ -1,11 +1,34 @@
+import threading
+from contextlib import contextmanager
+
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from keycloak import KeycloakGetError
 
 from backend.settings import keycloak_admin
+from basic.helper.tree_snapshot import invalidate_tree_snapshot
 from keycloak_auth.api_exceptions import NoKeycloakId
 from keycloak_auth.models import KeycloakGroup
 
+_state = threading.local()
+
+
+@contextmanager
+def keycloak_group_signals_disabled():
+    """
+    Deletes within the block are not written back to keycloak and do not invalidate the tree snapshot,
+    for syncs which take the groups from keycloak and invalidate the snapshot once afterwards.
+    """
+    _state.disabled = True
+    try:
+        yield
+    finally:
+        _state.disabled = False
+
+
+def signals_disabled() -> bool:
+    return getattr(_state, 'disabled', False)
+
 
 @receiver(post_save, sender=KeycloakGroup, dispatch_uid='post_save_keycloak_group')
 def post_save_keycloak_group(sender: KeycloakGroup, instance: KeycloakGroup, created: bool, **kwargs):
@@ -39,10 +62,17 @@ def post_save_keycloak_group(sender: KeycloakGroup, instance: KeycloakGroup, cre
 
 @receiver(post_delete, sender=KeycloakGroup, dispatch_uid='post_delete_keycloak_group')
 def post_delete_keycloak_group(sender: KeycloakGroup, instance: KeycloakGroup, **kwargs):
-    if instance.keycloak_id:
+    if instance.keycloak_id and not signals_disabled():
         try:
             group = keycloak_admin.get_group(instance.keycloak_id)
             if group['name'] == instance.name:
                 keycloak_admin.delete_group(instance.keycloak_id)
         except KeycloakGetError:
             pass
+
+
+@receiver(post_save, sender=KeycloakGroup, dispatch_uid='post_save_keycloak_group_snapshot')
+@receiver(post_delete, sender=KeycloakGroup, dispatch_uid='post_delete_keycloak_group_snapshot')
+def invalidate_keycloak_group_snapshot(sender: KeycloakGroup, **kwargs):
+    if not signals_disabled():
+        invalidate_tree_snapshot()
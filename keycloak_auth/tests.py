@@ -1,3 +1,164 @@
-from django.test import TestCase
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from basic.helper.sync_keycloak_groups import SyncKeycloakGroups
+from basic.helper.tree_snapshot import get_tree_snapshot, invalidate_tree_snapshot
+from basic.models import ScoutHierarchy, ScoutOrgaLevel
+from keycloak_auth import helper
+from keycloak_auth.models import KeycloakGroup
+from keycloak_auth.serializers import FullGroupSerializer
+
+
+class GroupsOfUserCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(
+            helper.keycloak_admin,
+            'get_user_groups',
+            return_value=[{'id': 'group-a'}, {'id': 'group-b'}]
+        )
+        self.get_user_groups = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_shared_cache(self):
+        self.assertEqual(helper.get_groups_of_user(None, 'user-1'), ['group-a', 'group-b'])
+        self.assertEqual(helper.get_groups_of_user(None, 'user-1'), ['group-a', 'group-b'])
+        self.assertEqual(self.get_user_groups.call_count, 1)
+
+    def test_invalidate(self):
+        helper.get_groups_of_user(None, 'user-1')
+        helper.invalidate_groups_of_user('user-1')
+        helper.get_groups_of_user(None, 'user-1')
+        self.assertEqual(self.get_user_groups.call_count, 2)
+
+    def test_request_memoisation(self):
+        request = SimpleNamespace(META={}, user=SimpleNamespace(keycloak_id='user-1'))
+        ids = helper.get_groups_of_request_user(request)
+        ids.append('group-c')
+        cache.clear()
+        self.assertEqual(helper.get_groups_of_request_user(request), ['group-a', 'group-b'])
+        self.assertEqual(self.get_user_groups.call_count, 1)
+
+
+class GroupTreeSnapshotTests(TestCase):
+
+    def setUp(self):
+        root, bund, stamm, sub = KeycloakGroup.objects.bulk_create([
+            KeycloakGroup(keycloak_id='root', name='DPV'),
+            KeycloakGroup(keycloak_id='bund', name='Bund'),
+            KeycloakGroup(keycloak_id='stamm', name='Stamm'),
+            KeycloakGroup(keycloak_id='sub', name='Leitung'),
+        ])
+        bund.parent, stamm.parent, sub.parent = root, bund, stamm
+        KeycloakGroup.objects.bulk_update([bund, stamm, sub], ['parent'])
+        ScoutHierarchy.objects.bulk_create([
+            ScoutHierarchy(name='Stamm Adler', level=ScoutOrgaLevel.objects.create(id=5, name='Stamm'), keycloak=stamm)
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_tree_snapshot()
+        self.root, self.bund, self.stamm, self.sub = root, bund, stamm, sub
+
+    def test_ancestors_and_display_names(self):
+        snapshot = get_tree_snapshot()
+        self.assertEqual(snapshot.get_keycloak_group_ancestor_ids(['stamm']),
+                         {str(self.root.id), str(self.bund.id), str(self.stamm.id)})
+        self.assertEqual(snapshot.keycloak_groups[str(self.stamm.id)].display_name, 'Stamm Adler')
+        self.assertEqual(snapshot.keycloak_groups[str(self.sub.id)].display_name, 'Leitung <- Stamm - Stamm Adler')
+        self.assertEqual(snapshot.keycloak_groups[str(self.bund.id)].display_name, 'Bund <- DPV')
+
+    def test_serializer_reads_the_snapshot(self):
+        get_tree_snapshot()
+        group = KeycloakGroup.objects.get(id=self.stamm.id)
+        with self.assertNumQueries(2):
+            data = FullGroupSerializer(group).data
+        self.assertEqual(data['parent'], {'name': 'Bund', 'id': 'bund', 'parent': {'name': 'DPV', 'id': 'root', 'parent': None}})
+        self.assertEqual([child['id'] for child in data['children']], ['sub'])
+
+    def test_snapshot_is_reused_until_invalidated(self):
+        snapshot = get_tree_snapshot()
+        self.assertIs(get_tree_snapshot(), snapshot)
+        KeycloakGroup.objects.filter(id=self.bund.id).update(name='Neuer Bund')
+        self.assertIs(get_tree_snapshot(), snapshot)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_tree_snapshot()
+            self.assertIs(get_tree_snapshot(), snapshot)
+        self.assertEqual(get_tree_snapshot().keycloak_groups[str(self.bund.id)].name, 'Neuer Bund')
+
+    def test_snapshot_expires(self):
+        snapshot = get_tree_snapshot()
+        KeycloakGroup.objects.filter(id=self.bund.id).update(name='Neuer Bund')
+        with override_settings(TREE_SNAPSHOT_MAX_AGE=-1):
+            self.assertIsNot(get_tree_snapshot(), snapshot)
+        self.assertEqual(get_tree_snapshot().keycloak_groups[str(self.bund.id)].name, 'Neuer Bund')
+
+
+class SyncKeycloakGroupsTests(TestCase):
+
+    def setUp(self):
+        self.root, self.bund, self.old = KeycloakGroup.objects.bulk_create([
+            KeycloakGroup(keycloak_id='root', name='DPV'),
+            KeycloakGroup(keycloak_id='bund', name='Bund'),
+            KeycloakGroup(keycloak_id='old', name='Alt', membership_allowed=False),
+        ])
+        self.verband = ScoutHierarchy.objects.create(
+            name='DPV', level=ScoutOrgaLevel.objects.create(id=2, name='Verband'))
+        self.bund_hierarchy = ScoutHierarchy.objects.create(
+            name='Bund A', level=ScoutOrgaLevel.objects.create(id=3, name='Bund'), parent=self.verband,
+            keycloak=self.old)
+        self.keycloak_tree = [{
+            'id': 'root', 'name': 'DPV', 'path': '/DPV', 'subGroups': [{
+                'id': 'buende', 'name': 'Bünde', 'path': '/DPV/Bünde', 'subGroups': [
+                    {'id': 'bund', 'name': 'Bund A', 'path': '/DPV/Bünde/Bund A', 'subGroups': []},
+                ]}],
+        }]
+
+    def test_dry_run(self):
+        with mock.patch('basic.helper.sync_keycloak_groups.keycloak_admin') as keycloak_admin, \
+                mock.patch('builtins.print'):
+            keycloak_admin.get_groups.return_value = self.keycloak_tree
+            plan = SyncKeycloakGroups(dry_run=True).run()
+        self.assertEqual(list(plan.lines()), [
+            'create /DPV/Bünde',
+            'rename Bund -> Bund A',
+            'move Bund -> /DPV/Bünde/Bund A',
+            'delete Alt (old)',
+            'assign DPV -> /DPV',
+            'assign Bund A -> /DPV/Bünde/Bund A',
+        ])
+        self.assertEqual(KeycloakGroup.objects.count(), 3)
+
+    def test_apply(self):
+        with mock.patch('basic.helper.sync_keycloak_groups.keycloak_admin') as keycloak_admin, \
+                mock.patch('keycloak_auth.signals.keycloak_admin') as signal_keycloak_admin, \
+                mock.patch('basic.helper.sync_keycloak_groups.invalidate_tree_snapshot') as invalidate, \
+                mock.patch('builtins.print'):
+            keycloak_admin.get_groups.return_value = self.keycloak_tree
+            SyncKeycloakGroups().run()
+            self.assertFalse(SyncKeycloakGroups().plan(self.keycloak_tree))
+        self.assertEqual(signal_keycloak_admin.mock_calls, [])
+        invalidate.assert_called_once()
+
+        bund = KeycloakGroup.objects.get(keycloak_id='bund')
+        self.assertEqual((bund.name, bund.parent.keycloak_id, bund.parent.parent_id), ('Bund A', 'buende', self.root.id))
+        self.assertFalse(KeycloakGroup.objects.filter(keycloak_id='old').exists())
+        self.bund_hierarchy.refresh_from_db()
+        self.assertEqual(self.bund_hierarchy.keycloak, bund)
+
+    def test_incomplete_tree_needs_force(self):
+        with mock.patch('basic.helper.sync_keycloak_groups.keycloak_admin') as keycloak_admin, \
+                mock.patch('keycloak_auth.signals.keycloak_admin'), \
+                mock.patch('builtins.print'):
+            keycloak_admin.get_groups.return_value = []
+            self.assertEqual(len(SyncKeycloakGroups().run().deletes), 3)
+            self.assertEqual(KeycloakGroup.objects.count(), 3)
+
+            keycloak_admin.get_groups.return_value = self.keycloak_tree
+            with mock.patch.object(SyncKeycloakGroups, 'max_deletes', 0):
+                SyncKeycloakGroups().run()
+                self.assertTrue(KeycloakGroup.objects.filter(keycloak_id='old').exists())
+                SyncKeycloakGroups(force=True).run()
+        self.assertFalse(KeycloakGroup.objects.filter(keycloak_id='old').exists())
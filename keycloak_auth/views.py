@@ -24,7 +24,7 @@ from keycloak_auth.api_exceptions import NoGroupId, AlreadyInGroup, AlreadyAcces
     NotAuthorized, GroupAlreadyExists
 from keycloak_auth.choices import CreateGroupChoices
 from keycloak_auth.enums import PermissionType
-from keycloak_auth.helper import check_group_id, get_or_create_keycloak_model
+from keycloak_auth.helper import check_group_id, get_or_create_keycloak_model, invalidate_groups_of_user
 from keycloak_auth.models import KeycloakGroup
 from keycloak_auth.permissions import request_group_access
 from keycloak_auth.serializers import UserListSerializer, CreateGroupSerializer, UpdateGroupSerializer, \
@@ -126,6 +126,7 @@ class AllGroupsViewSet(viewsets.ViewSet):
 
         user_id = request.user.keycloak_id
         keycloak_admin.group_user_add(user_id, admin_group_id)
+        invalidate_groups_of_user(user_id)
 
         realm_role_payload = {'name': created_group.keycloak_role_name, 'description': group_name}
         realm_role_name = keycloak_admin.create_realm_role(realm_role_payload, skip_exists=True)
@@ -335,6 +336,7 @@ class InviteMemberViewSet(mixins.CreateModelMixin, GenericViewSet):
         # try:
         # keycloak_user.group_user_add(token, user_id, group_id)
         keycloak_admin.group_user_add(user_id, group_id)
+        invalidate_groups_of_user(user_id)
         # except KeycloakGetError:
         #     raise NotAuthorized()
 
@@ -361,6 +363,7 @@ class LeaveGroupViewSet(mixins.CreateModelMixin, GenericViewSet):
         # try:
         # keycloak_user.group_user_add(token, user_id, group_id)
         keycloak_admin.group_user_remove(user_id, group_id)
+        invalidate_groups_of_user(user_id)
         # except KeycloakGetError:
         #     raise NotAuthorized()
         return Response('ok', status=status.HTTP_200_OK)
@@ -380,6 +383,7 @@ class KickMemberViewSet(mixins.CreateModelMixin, GenericViewSet):
         # try:
         # keycloak_user.group_user_add(token, user_id, group_id)
         keycloak_admin.group_user_remove(user_id, group_id)
+        invalidate_groups_of_user(user_id)
         # except KeycloakGetError:
         #     raise NotAuthorized()
 
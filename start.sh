@@ -5,6 +5,10 @@ set -o nounset
 
 echo "Apply database migrations"
 python manage.py migrate
+echo "Deploy scout hierarchies to keycloak"
+python manage.py initialize_scout_hierarchies_in_keycloak
+echo "Sync keycloak groups"
+python manage.py sync_keycloak_groups
 echo "Apply test user"
 python manage.py add_users
 echo "Load main data"
@@ -13,6 +17,7 @@ echo "Load test data"
 #python manage.py loaddata data/test/*.json
 echo "Load food inspi data"
 #python manage.py loaddata data/food-init/*.json
+#python manage.py rebuild_scout_hierarchy_paths
 
 echo "Collect static data"
 python manage.py collectstatic --noinput